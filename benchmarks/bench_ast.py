@@ -0,0 +1,54 @@
+"""
+AST memory benchmark.
+
+Parses a generated corpus of rules which share many subtrees, and reports the
+memory held by the parsed expressions with and without an `Interner`.
+
+Run from the repository root with ``python -m benchmarks.bench_ast``.
+"""
+import tracemalloc
+from typing import List, Optional
+
+from ratus.parse import Expression, Interner, Parser
+from ratus.token import Tokeniser
+
+N_RULES = 50_000
+
+
+def corpus(n_rules: int) -> List[str]:
+    """Generate `n_rules` rules built from a small set of shared fragments."""
+    return [
+        f"if(score({i % 100}) * 2 > {i % 7}, "
+        f"tier('{'gold' if i % 3 else 'silver'}') + 60 * 60 * 24, "
+        f"lookup({i % 1000}, 'PG') - 1.5)"
+        for i in range(n_rules)
+    ]
+
+
+def parsed_size(sources: List[str], interner: Optional[Interner]) -> int:
+    """Return the bytes held by the expressions parsed from `sources`."""
+    tokeniser = Tokeniser()
+    parser = Parser(interner=interner)
+    tokens = [tokeniser.tokenise_compact(source) for source in sources]
+    tracemalloc.start()
+    expressions: List[Expression] = [parser.parse(t) for t in tokens]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del expressions
+    return size
+
+
+def main() -> None:
+    sources = corpus(N_RULES)
+    plain = parsed_size(sources, None)
+    interned = parsed_size(sources, Interner())
+    print(f"{N_RULES} rules")
+    print(f"{'without interning':<20} {plain / 2 ** 20:>8.1f} MiB")
+    print(
+        f"{'with interning':<20} {interned / 2 ** 20:>8.1f} MiB "
+        f"({1 - interned / plain:.0%} saved)"
+    )
+
+
+if __name__ == "__main__":
+    main()
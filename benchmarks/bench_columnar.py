@@ -0,0 +1,60 @@
+"""
+Columnar evaluation benchmark.
+
+Evaluates one rule over columns held in ``array`` buffers, through
+`Evaluator.evaluate_columnar` with each compiler backend, and compares it to
+evaluating the rule for each row with `Evaluator.evaluate`.
+
+Run from the repository root with ``python -m benchmarks.bench_columnar``.
+"""
+import random
+import time
+from array import array
+from typing import Any, Callable
+
+from ratus import Evaluator
+
+RULE = "if(age >= 18 and score > 0.5, price * quantity, price * quantity / 2)"
+
+N_ROWS = 100_000
+
+
+def _time(function: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    rng = random.Random(0)
+    columns = {
+        "age": array("q", (rng.randint(10, 80) for _ in range(N_ROWS))),
+        "score": array("d", (rng.random() for _ in range(N_ROWS))),
+        "price": array("d", (rng.random() * 100 for _ in range(N_ROWS))),
+        "quantity": array("q", (rng.randint(1, 5) for _ in range(N_ROWS))),
+    }
+    evaluator = Evaluator()
+    names = list(columns)
+
+    def per_row() -> None:
+        for row in zip(*columns.values()):
+            evaluator.evaluate(RULE, dict(zip(names, row)))
+
+    runners = {"evaluate": per_row}
+    out = array("d", [0.0]) * N_ROWS
+    for backend in ("closures", "python", "vm"):
+        runners[f"columnar {backend}"] = (
+            lambda backend=backend: evaluator.evaluate_columnar(
+                RULE, columns, out, backend
+            )
+        )
+    baseline = None
+    print(f"{'runner':<17} {'rows/s':>12} {'speedup':>8}")
+    for name, runner in runners.items():
+        elapsed = _time(runner)
+        baseline = baseline or elapsed
+        print(f"{name:<17} {N_ROWS / elapsed:>12,.0f} {baseline / elapsed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
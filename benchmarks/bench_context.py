@@ -0,0 +1,60 @@
+"""
+Context benchmark.
+
+Evaluates one rule against a batch of records, by re-evaluating its source for
+each record, by compiling it once and calling it with each record as a context,
+and by calling it with each record as a row of slot values.
+
+Run from the repository root with ``python -m benchmarks.bench_context``.
+"""
+import random
+import time
+from typing import Any, Callable, List
+
+from ratus import Evaluator
+
+RULE = "if(age >= 18 and country = 'AU', price * quantity, price * quantity / 2)"
+
+N_RECORDS = 100_000
+
+
+def _time(function: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def _map(function: Callable[[Any], Any], items: List[Any]) -> Callable[[], Any]:
+    return lambda: [function(item) for item in items]
+
+
+def main() -> None:
+    rng = random.Random(0)
+    records = [
+        {
+            "age": rng.randint(10, 80),
+            "country": rng.choice(["AU", "NZ"]),
+            "price": rng.random() * 100,
+            "quantity": rng.randint(1, 5),
+        }
+        for _ in range(N_RECORDS)
+    ]
+    evaluator = Evaluator()
+    runners = {
+        "evaluate": lambda: [evaluator.evaluate(RULE, record) for record in records]
+    }
+    for backend in ("closures", "python", "vm"):
+        compiled = evaluator.compile(RULE, backend)
+        rows: List[List[Any]] = [
+            [record[name] for name in compiled.variables] for record in records
+        ]
+        runners[f"{backend} context"] = _map(compiled, records)
+        runners[f"{backend} slots"] = _map(compiled.evaluate_slots, rows)
+    print(f"{'runner':<17} {'records/s':>12}")
+    for name, runner in runners.items():
+        elapsed = _time(runner)
+        print(f"{name:<17} {N_RECORDS / elapsed:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
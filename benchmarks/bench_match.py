@@ -0,0 +1,89 @@
+"""
+Rule matching benchmark.
+
+Finds the rules matching each of a batch of records, out of 1k, 10k and 100k
+rules of the shape ``amount > 500 and country = 'c12'``, by executing every
+compiled rule and by matching with a predicate index.
+
+Run from the repository root with ``python -m benchmarks.bench_match``.
+"""
+import random
+import time
+from typing import Any, Callable, Dict, List
+
+from ratus import Evaluator
+
+N_COUNTRIES = 200
+
+N_RECORDS = 50
+
+
+def _time(function: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def _rules(rng: random.Random, n_rules: int) -> Dict[str, str]:
+    rules = {}
+    for i in range(n_rules):
+        amount = f"amount > {rng.randint(0, 1000)}"
+        if i % 4 == 0:
+            # Some rules only have order predicates
+            rules[f"rule{i}"] = f"{amount} and age <= {rng.randint(18, 80)}"
+        else:
+            country = f"country = 'c{rng.randrange(N_COUNTRIES)}'"
+            rules[f"rule{i}"] = f"{amount} and {country}"
+    return rules
+
+
+def main() -> None:
+    rng = random.Random(0)
+    records = [
+        {
+            "amount": rng.randint(0, 1000),
+            "country": f"c{rng.randrange(N_COUNTRIES)}",
+            "age": rng.randint(18, 80),
+        }
+        for _ in range(N_RECORDS)
+    ]
+    evaluator = Evaluator()
+    print(f"{'rules':>7} {'runner':<8} {'build s':>8} {'records/s':>10} {'matches':>8}")
+    for n_rules in (1_000, 10_000, 100_000):
+        sources = _rules(rng, n_rules)
+        results: Dict[str, List[List[str]]] = {}
+
+        start = time.perf_counter()
+        compiled = {name: evaluator.compile(source) for name, source in sources.items()}
+        build = time.perf_counter() - start
+
+        def execute_all() -> None:
+            results["execute"] = [
+                [name for name, rule in compiled.items() if rule(record)]
+                for record in records
+            ]
+
+        elapsed = _time(execute_all)
+        matches = sum(map(len, results["execute"])) / N_RECORDS
+        print(
+            f"{n_rules:>7} {'execute':<8} {build:>8.2f} "
+            f"{N_RECORDS / elapsed:>10,.1f} {matches:>8.0f}"
+        )
+
+        start = time.perf_counter()
+        index = evaluator.index_rules(sources)
+        build = time.perf_counter() - start
+
+        def match() -> None:
+            results["index"] = [index.match(record) for record in records]
+
+        elapsed = _time(match)
+        assert results["index"] == results["execute"]
+        print(
+            f"{n_rules:>7} {'index':<8} {build:>8.2f} "
+            f"{N_RECORDS / elapsed:>10,.1f} {matches:>8.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
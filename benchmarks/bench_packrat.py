@@ -0,0 +1,59 @@
+"""
+Packrat versus recursive descent benchmark.
+
+Compares the time taken and the peak memory allocated by the "descent" and
+"packrat" parser engines on deeply nested ``if(...)`` calls and on long
+addition chains. The packrat engine trades memory for its memo table against a
+guarantee of linear time parsing.
+
+Run from the repository root with ``python -m benchmarks.bench_packrat``.
+"""
+import sys
+import timeit
+import tracemalloc
+from typing import List, Tuple
+
+from ratus.parse import Parser
+from ratus.token import Token, Tokeniser
+
+ENGINES = ("descent", "packrat")
+
+
+def nested_if(depth: int) -> List[Token]:
+    """Build a token list for `depth` nested ``if`` calls."""
+    return Tokeniser().tokenise("if(1 < 2, " * depth + "0" + ", 1)" * depth)
+
+
+def addition_chain(terms: int) -> List[Token]:
+    """Build a token list for an addition chain with `terms` terms."""
+    return Tokeniser().tokenise(" + ".join(["1"] * terms))
+
+
+def measure(parser: Parser, tokens: List[Token]) -> Tuple[float, int]:
+    """Return the best time per parse in seconds and the peak bytes allocated."""
+    number = max(1, 20_000 // len(tokens))
+    elapsed = min(timeit.repeat(lambda: parser.parse(tokens), number=number, repeat=3))
+    tracemalloc.start()
+    parser.parse(tokens)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed / number, peak
+
+
+def main() -> None:
+    # The descent engine recurses once per nesting level
+    sys.setrecursionlimit(20_000)
+    workloads = [(f"nested if x{d}", nested_if(d)) for d in (10, 100, 500)]
+    workloads += [(f"addition x{n}", addition_chain(n)) for n in (10, 1_000, 10_000)]
+    print(f"{'workload':<18} {'tokens':>7} {'engine':>8} {'ms':>10} {'peak KiB':>10}")
+    for name, tokens in workloads:
+        for engine in ENGINES:
+            elapsed, peak = measure(Parser(engine), tokens)
+            print(
+                f"{name:<18} {len(tokens):>7} {engine:>8} "
+                f"{elapsed * 1e3:>10.3f} {peak / 1024:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
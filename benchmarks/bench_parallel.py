@@ -0,0 +1,50 @@
+"""
+Parallel evaluation benchmark.
+
+Evaluates a rule over a batch of records with a compiled expression in this
+process, and with `Evaluator.evaluate_many` over increasing numbers of worker
+processes.
+
+Run from the repository root with ``python -m benchmarks.bench_parallel``.
+"""
+import os
+import random
+import time
+
+from ratus import Evaluator
+
+RULE = "if(age >= 18 and country = 'AU', price * quantity, price * quantity / 2)"
+
+N_RECORDS = 200_000
+
+
+def main() -> None:
+    rng = random.Random(0)
+    records = [
+        {
+            "age": rng.randint(10, 80),
+            "country": rng.choice(["AU", "NZ"]),
+            "price": rng.random() * 100,
+            "quantity": rng.randint(1, 5),
+        }
+        for _ in range(N_RECORDS)
+    ]
+    evaluator = Evaluator()
+    compiled = evaluator.compile(RULE)
+    start = time.perf_counter()
+    expected = [compiled(record) for record in records]
+    elapsed = time.perf_counter() - start
+    print(f"{'runner':<12} {'records/s':>12}")
+    print(f"{'in process':<12} {N_RECORDS / elapsed:>12,.0f}")
+    n_workers = 1
+    while n_workers <= (os.cpu_count() or 1):
+        start = time.perf_counter()
+        results = list(evaluator.evaluate_many(RULE, records, workers=n_workers))
+        elapsed = time.perf_counter() - start
+        assert results == expected
+        print(f"{f'{n_workers} workers':<12} {N_RECORDS / elapsed:>12,.0f}")
+        n_workers *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Parser scaling benchmark.
+
+Parses ``1 + 1 + ... + 1`` chains from 10 to 100k tokens and ``f(-(...))``
+nesting from 10 to 10k levels deep with the "descent" and "iterative" engines,
+and reports the time taken per token. A linear parser keeps the per-token time
+roughly constant as the input grows. The recursive descent parser can't parse
+the deepest nesting, which is reported as "recursion".
+
+Run from the repository root with ``python -m benchmarks.bench_parse``.
+"""
+import timeit
+from typing import List
+
+from ratus.parse import Parser
+from ratus.token import Token, Tokeniser
+
+SIZES = (10, 100, 1_000, 10_000, 100_000)
+DEPTHS = (10, 100, 1_000, 10_000)
+ENGINES = ("descent", "iterative")
+
+
+def addition_chain(n_tokens: int) -> List[Token]:
+    """Build a token list for an addition chain with about `n_tokens` tokens."""
+    terms = max(1, (n_tokens + 1) // 2)
+    return Tokeniser().tokenise(" + ".join(["1"] * terms))
+
+
+def nested(depth: int) -> List[Token]:
+    """Build a token list for function calls and groups nested `depth` deep."""
+    return Tokeniser().tokenise("f(-(" * depth + "1" + ") * 2)" * depth)
+
+
+def report(workload: str, parser: Parser, tokens: List[Token]) -> None:
+    number = max(1, 100_000 // len(tokens))
+    try:
+        elapsed = min(
+            timeit.repeat(lambda: parser.parse(tokens), number=number, repeat=3)
+        )
+    except RecursionError:
+        print(f"{workload:<16} {len(tokens):>8} {parser.engine:>10} {'recursion':>12}")
+        return
+    per_call = elapsed / number
+    print(
+        f"{workload:<16} {len(tokens):>8} {parser.engine:>10} "
+        f"{per_call * 1e3:>12.3f} {per_call / len(tokens) * 1e6:>16.3f}"
+    )
+
+
+def main() -> None:
+    print(
+        f"{'workload':<16} {'tokens':>8} {'engine':>10} {'total (ms)':>12} "
+        f"{'per token (us)':>16}"
+    )
+    for engine in ENGINES:
+        parser = Parser(engine)
+        for size in SIZES:
+            report("addition chain", parser, addition_chain(size))
+        for depth in DEPTHS:
+            report(f"nested x{depth}", parser, nested(depth))
+
+
+if __name__ == "__main__":
+    main()
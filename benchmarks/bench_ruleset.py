@@ -0,0 +1,105 @@
+"""
+Rule set benchmark.
+
+Evaluates a family of rules which share subexpressions against a batch of
+records, compiling each rule on its own and compiling them together into a rule
+set which evaluates the shared subexpressions once per record. Then streams
+updates of one field at a time, evaluating the rule set from scratch for each
+one and updating a reactive rule set which only re-evaluates what the field
+affects.
+
+Run from the repository root with ``python -m benchmarks.bench_ruleset``.
+"""
+import random
+import time
+from typing import Any, Callable, Dict
+
+from ratus import Evaluator
+from ratus.execer import pure
+
+TOTAL = "(price * quantity * (1 - discount))"
+RISK = "risk(country, total_orders)"
+
+RULES = {
+    "free_shipping": f"{TOTAL} > 100",
+    "large_order": f"{TOTAL} > 500 and {RISK} < 0.5",
+    "review": f"{RISK} > 0.8 or {TOTAL} > 1000 and {RISK} > 0.3",
+    "points": f"if({RISK} < 0.5, {TOTAL} / 10, 0)",
+    "tax": f"{TOTAL} * if(country = 'AU', 0.1, 0.15)",
+}
+
+N_RECORDS = 20_000
+
+
+def _risk(country: str, total_orders: int) -> float:
+    return sum(ord(c) for c in country) % 10 / 10 + 1 / (1 + total_orders)
+
+
+def _time(function: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    rng = random.Random(0)
+    records = [
+        {
+            "price": rng.random() * 200,
+            "quantity": rng.randint(1, 10),
+            "discount": rng.choice([0, 0.1, 0.25]),
+            "country": rng.choice(["AU", "NZ", "US"]),
+            "total_orders": rng.randint(0, 50),
+        }
+        for _ in range(N_RECORDS)
+    ]
+    evaluator = Evaluator({"risk": pure(_risk, max_size=0)})
+    compiled = {name: evaluator.compile(rule) for name, rule in RULES.items()}
+    rule_set = evaluator.compile_rules(RULES)
+
+    def separately() -> None:
+        for record in records:
+            results: Dict[str, Any] = {}
+            for name, rule in compiled.items():
+                results[name] = rule(record)
+
+    def together() -> None:
+        for record in records:
+            rule_set.evaluate(record)
+
+    print(
+        f"{len(RULES)} rules, {rule_set.distinct_nodes} distinct nodes, "
+        f"{rule_set.shared_nodes} shared"
+    )
+    print(f"{'runner':<10} {'records/s':>12}")
+    for name, runner in (("separate", separately), ("rule set", together)):
+        elapsed = _time(runner)
+        print(f"{name:<10} {N_RECORDS / elapsed:>12,.0f}")
+
+    fields = ["quantity", "total_orders", "discount"]
+    updates = [
+        {fields[i % len(fields)]: record[fields[i % len(fields)]]}
+        for i, record in enumerate(records)
+    ]
+    context = dict(records[0])
+    reactive = evaluator.compile_reactive_rules(RULES, context)
+
+    def from_scratch() -> None:
+        for update in updates:
+            context.update(update)
+            rule_set.evaluate(context)
+
+    def incrementally() -> None:
+        for update in updates:
+            reactive.update(update)
+
+    print(f"{'runner':<10} {'updates/s':>12}")
+    for name, runner in (("rule set", from_scratch), ("reactive", incrementally)):
+        elapsed = _time(runner)
+        print(f"{name:<10} {N_RECORDS / elapsed:>12,.0f}")
+    info = reactive.info()
+    print(f"reactive: {info.evaluated:,} nodes evaluated, {info.skipped:,} skipped")
+
+
+if __name__ == "__main__":
+    main()
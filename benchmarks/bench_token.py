@@ -0,0 +1,176 @@
+"""
+Tokeniser throughput benchmark.
+
+Tokenises long inputs of different shapes with the character by character
+tokeniser ratus had before its master pattern, and with the current tokeniser
+into a list of tokens and into a compact token stream. Reports the time taken
+per character of source and the memory held by the result.
+
+Run from the repository root with ``python -m benchmarks.bench_token``.
+"""
+import timeit
+import tracemalloc
+from typing import List
+
+from ratus.token import Token, Tokeniser, TokeniserError, TokenLiteral, TokenType
+
+WORKLOADS = {
+    "addition chain": " + ".join(["12345"] * 20_000),
+    "nested calls": "if(value_1 >= 2.5, " * 2_000 + "'x'" + ", 0)" * 2_000,
+    "long string": '"' + "a" * 100_000 + '"',
+    "whitespace": "1" + " " * 100_000 + "+ 1",
+}
+
+
+class PreviousTokeniser:
+    """
+    Tokeniser scanning the source one character at a time.
+
+    This is the tokeniser replaced by the master pattern, kept as it was apart
+    from type annotations so the two can be compared.
+    """
+
+    def __init__(self) -> None:
+        self.start: int = 0
+        self.current: int = 0
+        self.source: str = ""
+        self.tokens: List[Token] = []
+
+    def tokenise(self, source: str) -> List[Token]:
+        """Tokenise an input in a list of tokens."""
+        self.source = source
+        self.current = 0
+        self.start = 0
+        while self.current < len(self.source):
+            self.start = self.current
+            self.scan_token()
+        return self.tokens
+
+    def scan_token(self) -> None:
+        c = self.source[self.current]
+        self.current += 1
+        if c.strip() == "":
+            # Skip whitespace
+            return
+        if c in ("(", ")", ",", "+", "-", "*", "=", "/"):
+            # Match characters that are unambiguously only single characters
+            self.add_token(TokenType(c))
+        elif c == "!":
+            if self.source[self.current] == "=":
+                self.add_token(TokenType.BANG_EQUAL)
+                self.current += 1
+            else:
+                self.add_token(TokenType.BANG)
+        elif c == "<":
+            if self.source[self.current] == "=":
+                self.current += 1
+                self.add_token(TokenType.LESS_EQUAL)
+            else:
+                self.add_token(TokenType.LESS)
+        elif c == ">":
+            if self.source[self.current] == "=":
+                self.current += 1
+                self.add_token(TokenType.GREATER_EQUAL)
+            else:
+                self.add_token(TokenType.GREATER)
+        elif c in ("'", '"'):
+            self.string()
+        elif c.isdigit():
+            self.numeric()
+        elif c.isalpha():
+            self.identifier()
+        else:
+            raise TokeniserError(f"Unexpected character: '{c}'")
+
+    def add_token(self, token_type: TokenType) -> None:
+        lexeme = self.source[self.start : self.current]
+        token = Token(token_type, lexeme)
+        self.tokens.append(token)
+
+    def string(self) -> None:
+        while self.current < len(self.source) and self.source[self.current] not in (
+            "'",
+            '"',
+        ):
+            self.current += 1
+        if self.current >= len(self.source):
+            raise TokeniserError("Unterminated string")
+        self.current += 1  # Consume closing quote
+        lexeme = self.source[self.start : self.current]
+        string = self.source[self.start + 1 : self.current - 1]
+        token = TokenLiteral(TokenType.STRING, lexeme, string)
+        self.tokens.append(token)
+
+    def numeric(self) -> None:
+        while self.current < len(self.source) and self.source[self.current].isdigit():
+            self.current += 1
+
+        # Invalid to finish expression with "."
+        if self.current == len(self.source) - 1 and self.source[self.current] == ".":
+            raise TokeniserError("Expression cannot finish with '.'")
+
+        if self.current < len(self.source) and self.source[self.current] == ".":
+            # Consume the "." so we can start consuming digits again
+            self.current += 1
+            if not self.source[self.current].isdigit():
+                raise TokeniserError(
+                    f"Expected digit after '.', found '{self.source[self.current]}'"
+                )
+
+            # Match a float
+            while (
+                self.current < len(self.source) and self.source[self.current].isdigit()
+            ):
+                self.current += 1
+            float_ = self.source[self.start : self.current]
+            token = TokenLiteral(TokenType.FLOAT, float_, float(float_))
+            self.tokens.append(token)
+        else:
+            int_ = self.source[self.start : self.current]
+            token = TokenLiteral(TokenType.INT, int_, int(int_))
+            self.tokens.append(token)
+
+    def identifier(self) -> None:
+        #  Identifiers can be made up of letters, numbers and '_'
+        while self.current < len(self.source) and (
+            self.source[self.current].isalpha()
+            or self.source[self.current].isdigit()
+            or self.source[self.current] == "_"
+        ):
+            self.current += 1
+        ident = self.source[self.start : self.current]
+        token = TokenLiteral(TokenType.IDENT, ident, ident)
+        self.tokens.append(token)
+
+
+def main() -> None:
+    tokeniser = Tokeniser()
+    methods = {
+        # The previous tokeniser accumulates tokens, so each call needs its own
+        "previous": lambda source: PreviousTokeniser().tokenise(source),
+        "list": tokeniser.tokenise,
+        "compact": tokeniser.tokenise_compact,
+    }
+    print(
+        f"{'workload':<16} {'chars':>8} {'tokens':>7} {'method':>8} {'ms':>9} "
+        f"{'ns/char':>9} {'KiB':>9}"
+    )
+    for name, source in WORKLOADS.items():
+        n_tokens = len(tokeniser.tokenise(source))
+        for method_name, method in methods.items():
+            elapsed = min(timeit.repeat(lambda: method(source), number=5, repeat=3))
+            per_call = elapsed / 5
+            tracemalloc.start()
+            tokens = method(source)
+            size, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del tokens
+            print(
+                f"{name:<16} {len(source):>8} {n_tokens:>7} {method_name:>8} "
+                f"{per_call * 1e3:>9.2f} {per_call / len(source) * 1e9:>9.1f} "
+                f"{size / 1024:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Executor benchmark.
+
+Runs a suite of expressions through the tree walking `Executor.execute` and
+through each compiler backend, and reports the time per evaluation.
+
+Run from the repository root with ``python -m benchmarks.bench_vm``.
+"""
+import sys
+import timeit
+from typing import Callable, Dict
+
+from ratus.execer import Executor
+from ratus.parse import Parser
+from ratus.token import Tokeniser
+
+SUITE = {
+    "arithmetic": "1 + 2 * 3 - 4 / 5 + 6 * (7 - 8)",
+    "comparison": "1 < 2 and 3 >= 4 or 5 != 6",
+    "calls": "f(1, 2) + f(3, f(4, 5)) * g(6)",
+    "nested if": "if(1 < 2, " * 50 + "0" + ", 1)" * 50,
+    "long chain": " + ".join(["1"] * 500),
+}
+
+FUNCTIONS: Dict[str, Callable[..., int]] = {
+    "f": lambda x, y: x + y,
+    "g": lambda x: -x,
+}
+
+
+def main() -> None:
+    sys.setrecursionlimit(10_000)
+    executor = Executor(FUNCTIONS)
+    tokeniser = Tokeniser()
+    parser = Parser()
+    print(f"{'expression':<12} {'runner':>9} {'us':>10} {'speedup':>8}")
+    for name, source in SUITE.items():
+        expression = parser.parse(tokeniser.tokenise(source))
+        runners = {"execute": lambda: executor.execute(expression)}
+        for backend in ("closures", "python", "vm"):
+            runners[backend] = executor.compile(expression, backend)
+        baseline = None
+        for runner_name, runner in runners.items():
+            number = 2_000
+            elapsed = min(timeit.repeat(runner, number=number, repeat=3)) / number
+            baseline = baseline or elapsed
+            print(
+                f"{name:<12} {runner_name:>9} {elapsed * 1e6:>10.2f} "
+                f"{baseline / elapsed:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Generators of expressions for benchmarks.
+
+Realistic expressions look like the business rules ratus is used for. The
+adversarial ones stress a single dimension of the tokeniser, parser or
+executor, while staying shallow enough for the recursive stages to handle.
+"""
+import random
+from typing import Any, Callable, Dict, List, NamedTuple
+
+FIELDS = ("age", "price", "quantity", "score", "discount")
+
+COUNTRIES = ("AU", "NZ", "US", "GB", "FR")
+
+
+class Workload(NamedTuple):
+    """Sources to evaluate with the functions and context they need."""
+
+    sources: List[str]
+    functions: Dict[str, Callable[..., Any]]
+    context: Dict[str, Any]
+
+
+def _count_args(*args: Any) -> int:
+    return len(args)
+
+
+FUNCTIONS: Dict[str, Callable[..., Any]] = {
+    "max": max,
+    "min": min,
+    "abs": abs,
+    "count": _count_args,
+}
+
+CONTEXT: Dict[str, Any] = {
+    "age": 42,
+    "price": 19.99,
+    "quantity": 3,
+    "score": 0.75,
+    "discount": 0.1,
+    "country": "AU",
+    "name": "a" * 1_000,
+}
+
+
+def _comparison(rng: random.Random) -> str:
+    if rng.random() < 0.3:
+        return f"country = '{rng.choice(COUNTRIES)}'"
+    operator = rng.choice((">", ">=", "<", "<=", "!="))
+    return f"{rng.choice(FIELDS)} {operator} {rng.randint(0, 100)}"
+
+
+def _condition(rng: random.Random) -> str:
+    terms = [_comparison(rng) for _ in range(rng.randint(1, 4))]
+    condition = terms[0]
+    for term in terms[1:]:
+        condition = f"{condition} {rng.choice(('and', 'or'))} {term}"
+    return condition
+
+
+def _amount(rng: random.Random) -> str:
+    choice = rng.random()
+    if choice < 0.4:
+        return "price * quantity"
+    if choice < 0.7:
+        return "price * quantity * (1 - discount)"
+    if choice < 0.9:
+        return f"max(price * quantity - {rng.randint(1, 20)}, 0)"
+    return f"min(abs(score - {rng.random():.2f}), 1) * price"
+
+
+def realistic(n_rules: int, seed: int = 0) -> List[str]:
+    """Generate business rules mixing conditions, arithmetic and functions."""
+    rng = random.Random(seed)
+    rules = []
+    for _ in range(n_rules):
+        if rng.random() < 0.5:
+            rules.append(_condition(rng))
+        else:
+            rules.append(
+                f"if({_condition(rng)}, {_amount(rng)}, {_amount(rng)})"
+            )
+    return rules
+
+
+def addition_chain(n_terms: int) -> str:
+    """Generate ``price + price + ...`` with `n_terms` terms."""
+    return " + ".join(["price"] * n_terms)
+
+
+def nested_if(depth: int) -> str:
+    """Generate ``if`` nested `depth` deep in its first branch."""
+    return "if(age > 18, " * depth + "price" + ", 0)" * depth
+
+
+def many_arguments(n_args: int) -> str:
+    """Generate a call of ``count`` with `n_args` arguments."""
+    return "count(" + ", ".join(str(i) for i in range(n_args)) + ")"
+
+
+def large_string(length: int) -> str:
+    """Generate a comparison of a variable with a string of `length` chars."""
+    return 'name = "' + "a" * length + '"'
+
+
+def workloads() -> Dict[str, Workload]:
+    """Return the benchmark workloads by name."""
+    sources = {
+        "realistic": realistic(200),
+        "addition chain": [addition_chain(300)],
+        "nested if": [nested_if(100)],
+        "many arguments": [many_arguments(1_000)],
+        "large string": [large_string(100_000)],
+    }
+    return {
+        name: Workload(workload, FUNCTIONS, CONTEXT)
+        for name, workload in sources.items()
+    }
@@ -0,0 +1,205 @@
+"""
+Benchmark suite of every stage of evaluation.
+
+Runs each workload of `benchmarks.generators` through each stage:
+
+``tokenise``
+    ``Tokeniser.tokenise`` of the sources.
+``parse``
+    ``Parser.parse`` of their tokens.
+``execute``
+    ``Executor.execute`` of the parsed expressions.
+``evaluate``
+    ``Evaluator.evaluate`` of the sources with the parse cache disabled, so
+    every stage runs each time.
+``evaluate cached``
+    ``Evaluator.evaluate`` of the sources with the parse cache warm.
+
+and reports the throughput, in sources per second, and the peak memory
+allocated while processing the workload once.
+
+The results can be saved as a baseline and later runs compared against it.
+Any throughput lower or peak memory higher than the baseline by more than the
+threshold is flagged as a regression, and the suite then exits with status 1.
+Baselines depend on the machine, so compare runs on the same one.
+
+Run from the repository root with ``python -m benchmarks.suite``, passing
+``--save`` to store the results as the baseline, or ``--help`` for the other
+options.
+"""
+import argparse
+import gc
+import json
+import sys
+import timeit
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.generators import Workload, workloads
+from ratus import Evaluator
+from ratus.execer import Executor
+from ratus.parse import Parser
+from ratus.token import Tokeniser
+
+DEFAULT_BASELINE = Path(__file__).with_name("baseline.json")
+
+# Peak memory varies by a few KiB between runs, so smaller increases aren't
+# flagged whatever the threshold
+MEMORY_TOLERANCE_KIB = 4.0
+
+# Results of a run by "workload/stage", each with its throughput and memory
+Results = Dict[str, Dict[str, float]]
+
+
+def _stages(workload: Workload) -> Dict[str, Callable[[], Any]]:
+    tokeniser = Tokeniser()
+    parser = Parser()
+    executor = Executor(workload.functions)
+    sources = workload.sources
+    context = workload.context
+    tokens = [tokeniser.tokenise(source) for source in sources]
+    expressions = [parser.parse(source_tokens) for source_tokens in tokens]
+    cold = Evaluator(workload.functions, cache_size=0)
+    cached = Evaluator(workload.functions, cache_size=len(sources))
+    for source in sources:
+        cached.evaluate(source, context)
+    return {
+        "tokenise": lambda: [tokeniser.tokenise(source) for source in sources],
+        "parse": lambda: [parser.parse(source_tokens) for source_tokens in tokens],
+        "execute": lambda: [
+            executor.execute(expression, context) for expression in expressions
+        ],
+        "evaluate": lambda: [cold.evaluate(source, context) for source in sources],
+        "evaluate cached": lambda: [
+            cached.evaluate(source, context) for source in sources
+        ],
+    }
+
+
+def _peak_memory(function: Callable[[], Any]) -> int:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def run(repeat: int = 5) -> Results:
+    """Run every stage of every workload and return the results."""
+    results: Results = {}
+    for name, workload in workloads().items():
+        for stage, function in _stages(workload).items():
+            timer = timeit.Timer(function)
+            number, _ = timer.autorange()
+            elapsed = min(timer.repeat(repeat=repeat, number=number)) / number
+            results[f"{name}/{stage}"] = {
+                "sources_per_second": len(workload.sources) / elapsed,
+                "peak_kib": _peak_memory(function) / 1024,
+            }
+    return results
+
+
+def compare(
+    results: Results, baseline: Results, threshold: float
+) -> Dict[str, List[str]]:
+    """
+    Return the regressions of each benchmark against a baseline.
+
+    A benchmark regresses if its throughput is lower or its peak memory higher
+    than the baseline by more than the fraction `threshold`. Peak memory must
+    also be higher by more than `MEMORY_TOLERANCE_KIB`.
+    """
+    regressions: Dict[str, List[str]] = {}
+    for key, result in results.items():
+        before = baseline.get(key)
+        if before is None:
+            continue
+        flagged = []
+        speed = before["sources_per_second"]
+        if result["sources_per_second"] < speed * (1 - threshold):
+            flagged.append("throughput")
+        memory = before["peak_kib"]
+        if result["peak_kib"] > max(
+            memory * (1 + threshold), memory + MEMORY_TOLERANCE_KIB
+        ):
+            flagged.append("memory")
+        if flagged:
+            regressions[key] = flagged
+    return regressions
+
+
+def _change(current: float, before: Optional[float]) -> str:
+    if not before:
+        return ""
+    return f"{(current - before) / before:+.1%}"
+
+
+def report(
+    results: Results, baseline: Results, regressions: Dict[str, List[str]]
+) -> str:
+    """Return a table of the results and their changes from the baseline."""
+    lines = [
+        f"{'benchmark':<32} {'sources/s':>12} {'change':>8} "
+        f"{'peak KiB':>10} {'change':>8}"
+    ]
+    for key, result in results.items():
+        before = baseline.get(key, {})
+        speed = result["sources_per_second"]
+        memory = result["peak_kib"]
+        line = (
+            f"{key:<32} {speed:>12,.1f} "
+            f"{_change(speed, before.get('sources_per_second')):>8} "
+            f"{memory:>10,.1f} {_change(memory, before.get('peak_kib')):>8}"
+        )
+        if key in regressions:
+            line += f"  REGRESSION ({', '.join(regressions[key])})"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        default=DEFAULT_BASELINE,
+        help="baseline file to compare against or save to (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--save", action="store_true", help="save the results as the baseline"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="fraction beyond which a change is a regression (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="timings to take the best of (default: %(default)s)",
+    )
+    args = parser.parse_args(argv)
+
+    results = run(args.repeat)
+    baseline: Results = {}
+    if args.baseline.exists() and not args.save:
+        baseline = json.loads(args.baseline.read_text())
+    regressions = compare(results, baseline, args.threshold)
+    print(report(results, baseline, regressions))
+    if args.save:
+        args.baseline.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+        print(f"Saved baseline to {args.baseline}")
+    if regressions:
+        print(f"{len(regressions)} regressions above {args.threshold:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -27,37 +27,310 @@ extend applications in a controllable way. It provides the following features:
   - Less than (``<``)
   - Less than or equal (``<=``)
 
+- Variables
+
+  - Names which aren't followed by a call are looked up in the context the
+    expression is evaluated with
+
 - Literals
 
   - String (double and single quotes)
   - Integer (positive and negative)
   - Float (positive and negative)
 """
-from typing import Any, Callable, Dict, Optional
+import time
+from array import array
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    Mapping,
+    Optional,
+    Sequence,
+    Union,
+)
 
-from ratus.execer import Executor
-from ratus.parse import Parser
+from ratus.cache import LRUCache
+from ratus.execer import CompiledExpression, Executor
+from ratus.match import PredicateIndex
+from ratus.metrics import MetricsCollector
+from ratus.optimise import Optimiser, count_nodes
+from ratus.parallel import evaluate_many
+from ratus.parse import Expression, Parser
+from ratus.profiling import Profiler, ProfilingExecutor
+from ratus.ruleset import ReactiveRuleSet, RuleSet
 from ratus.token import Tokeniser
 
 __version__ = "0.0.1"
 
-__all__ = ["Evaluator", "token", "parse", "execer"]
+__all__ = [
+    "Evaluator",
+    "cache",
+    "token",
+    "parse",
+    "execer",
+    "optimise",
+    "parallel",
+    "ruleset",
+    "match",
+    "profiling",
+    "metrics",
+]
 
 
 class Evaluator:
-    "Expression evaluator."
+    """
+    Expression evaluator.
+
+    An evaluator can be shared between threads. Tokenising, parsing and
+    executing keep all their state local to each call, and the cache of parsed
+    expressions is locked. Two threads evaluating the same new source at once
+    may both parse it, but each gets a complete expression. Injected functions
+    must be thread-safe themselves to be called from several threads.
+    """
 
     def __init__(
-        self, injected_functions: Optional[Dict[str, Callable[..., Any]]] = None
+        self,
+        injected_functions: Optional[Dict[str, Callable[..., Any]]] = None,
+        optimise: bool = False,
+        cache_size: int = 1024,
+        profile: bool = False,
+        metrics: Optional[MetricsCollector] = None,
     ) -> None:
+        """
+        Instantiate an Evaluator object.
+
+        `injected_functions` are the functions callable from expressions in
+        addition to the defaults (see `ratus.execer.Executor`).
+
+        If `optimise` is set, expressions are passed through
+        `ratus.optimise.Optimiser` after being parsed. This makes them cheaper
+        to execute at the expense of more work up front, so it is best used with
+        `compile`.
+
+        Parsed expressions are cached by their source in an LRU cache holding up
+        to `cache_size` expressions, so evaluating the same source again skips
+        tokenising and parsing. The cache is available as `cache` to inspect its
+        statistics or clear it. A `cache_size` of 0 disables caching.
+
+        If `profile` is set, the time spent tokenising, parsing and optimising
+        sources and in each node and function of the expressions evaluated is
+        recorded in `profiler`, see `ratus.profiling` for details. Otherwise
+        `profiler` is None and evaluation does no profiling at all.
+
+        If a `metrics` collector is given, the time spent in each stage of
+        evaluation, the sizes of the sources parsed and the hits and misses of
+        the parse cache are reported to it, see `ratus.metrics` for details.
+        """
         self.tokeniser = Tokeniser()
         self.parser = Parser()
-        self.executor = Executor(injected_functions)
+        self.profiler: Optional[Profiler] = None
+        self.executor: Executor
+        if profile:
+            self.profiler = Profiler()
+            self.executor = ProfilingExecutor(
+                injected_functions, profiler=self.profiler
+            )
+        else:
+            self.executor = Executor(injected_functions)
+        self.optimiser: Optional[Optimiser] = None
+        if optimise:
+            self.optimiser = Optimiser(self.executor)
+        self.cache: LRUCache[str, Expression] = LRUCache(cache_size)
+        self.metrics = metrics
+
+    def evaluate(self, source: str, context: Optional[Mapping[str, Any]] = None) -> Any:
+        """
+        Evaluate an input as a ratus expression.
+
+        Variables in the expression are looked up by name in `context`.
+        """
+        expression = self._parse(source)
+
+        if self.metrics is None:
+            return self.executor.execute(expression, context)
+        start = time.perf_counter()
+        try:
+            return self.executor.execute(expression, context)
+        finally:
+            self.metrics.observe("execute.seconds", time.perf_counter() - start)
+
+    async def evaluate_async(
+        self, source: str, context: Optional[Mapping[str, Any]] = None
+    ) -> Any:
+        """
+        Evaluate an input as a ratus expression, awaiting async functions.
+
+        Injected functions can be coroutine functions. Independent arguments
+        are awaited concurrently, see `ratus.execer.Executor.execute_async`.
+        """
+        expression = self._parse(source)
+
+        if self.metrics is None:
+            return await self.executor.execute_async(expression, context)
+        start = time.perf_counter()
+        try:
+            return await self.executor.execute_async(expression, context)
+        finally:
+            self.metrics.observe("execute.seconds", time.perf_counter() - start)
+
+    def evaluate_vectorised(self, source: str, columns: Mapping[str, Any]) -> Any:
+        """
+        Evaluate a ratus expression over columns of data with NumPy.
+
+        `columns` maps variable names to arrays of equal length and the result
+        is an array with the value of the expression for each row. See
+        `ratus.vectorise` for details.
+        """
+        expression = self._parse(source)
+
+        return self.executor.execute_vectorised(expression, columns)
+
+    def evaluate_columnar(
+        self,
+        source: str,
+        columns: Mapping[str, Any],
+        out: Optional[array] = None,
+        backend: str = "python",
+    ) -> array:
+        """
+        Evaluate a ratus expression over columns of data without NumPy.
+
+        `columns` maps variable names to buffers such as ``array('d')`` of equal
+        length, and the value of the expression for each row is written into
+        the array `out`. See `ratus.execer.Executor.execute_columnar` for
+        details.
+        """
+        expression = self._parse(source)
+
+        return self.executor.execute_columnar(expression, columns, out, backend)
+
+    def evaluate_many(
+        self,
+        sources: Union[str, Sequence[str]],
+        records: Iterable[Mapping[str, Any]],
+        workers: Optional[int] = None,
+        chunksize: int = 1000,
+        backend: str = "closures",
+    ) -> Iterator[Any]:
+        """
+        Evaluate ratus expressions for each record in worker processes.
+
+        `sources` is an expression, or a sequence of them, and each record is a
+        context to evaluate them in. Results are yielded lazily in the order of
+        the records: the value of the expression for a single source, otherwise
+        a tuple of the values of all of them.
 
-    def evaluate(self, source: str) -> Any:
-        """Evaluate an input as a ratus expression."""
-        tokens = self.tokeniser.tokenise(source)
+        The expressions are parsed here and sent with the injected functions to
+        each of the `workers` processes once. Records are sent in chunks of
+        `chunksize`. Injected functions must be picklable, see
+        `ratus.parallel` for details.
+        """
+        single = isinstance(sources, str)
+        if isinstance(sources, str):
+            sources = [sources]
+        expressions = [self._parse(source) for source in sources]
+
+        return evaluate_many(
+            self.executor, expressions, records, single, workers, chunksize, backend
+        )
+
+    def compile(self, source: str, backend: str = "closures") -> CompiledExpression:
+        """
+        Compile a ratus expression into a callable which evaluates it.
+
+        The result is called with the context to look variables up in. To
+        evaluate one expression against many records, compile it once and call
+        it with each record. See `ratus.execer.Executor.compile` for details.
+        """
+        expression = self._parse(source)
+
+        return self.executor.compile(expression, backend)
+
+    def compile_rules(self, sources: Mapping[str, str]) -> RuleSet:
+        """
+        Compile named ratus expressions into a rule set evaluated all at once.
+
+        Subexpressions common to several of the rules are evaluated once per
+        context, see `ratus.ruleset` for details.
+        """
+        rules = {name: self._parse(source) for name, source in sources.items()}
+
+        return RuleSet(self.executor, rules)
+
+    def compile_reactive_rules(
+        self, sources: Mapping[str, str], context: Mapping[str, Any]
+    ) -> ReactiveRuleSet:
+        """
+        Compile named ratus expressions into a rule set updated incrementally.
+
+        The rules are evaluated in `context` straight away. Updating variables
+        of the context then only evaluates again the subexpressions which depend
+        on them, see `ratus.ruleset.ReactiveRuleSet` for details.
+        """
+        rules = {name: self._parse(source) for name, source in sources.items()}
+
+        return ReactiveRuleSet(self.executor, rules, context)
+
+    def index_rules(
+        self, sources: Mapping[str, str], backend: str = "closures"
+    ) -> PredicateIndex:
+        """
+        Index named boolean ratus expressions to find which match records.
+
+        Comparisons of variables with literals in the rules are indexed, so
+        matching a record only evaluates the rules they don't rule out, see
+        `ratus.match` for details.
+        """
+        rules = {name: self._parse(source) for name, source in sources.items()}
+
+        return PredicateIndex(self.executor, rules, backend)
+
+    def _parse(self, source: str) -> Expression:
+        cached = self.cache.get(source)
+        if cached is not None:
+            if self.metrics is not None:
+                self.metrics.increment("cache.hits")
+            return cached
+
+        if self.profiler is not None or self.metrics is not None:
+            expression = self._parse_measured(source)
+            self.cache.put(source, expression)
+            return expression
+
+        tokens = self.tokeniser.tokenise_compact(source)
 
         expression = self.parser.parse(tokens)
 
-        return self.executor.execute(expression)
+        if self.optimiser is not None:
+            expression, _ = self.optimiser.optimise(expression)
+        self.cache.put(source, expression)
+        return expression
+
+    def _parse_measured(self, source: str) -> Expression:
+        if self.metrics is not None:
+            self.metrics.increment("cache.misses")
+
+        tokens = self._stage("tokenise", self.tokeniser.tokenise_compact, source)
+
+        expression = self._stage("parse", self.parser.parse, tokens)
+
+        if self.metrics is not None:
+            self.metrics.observe("tokens", len(tokens))
+            self.metrics.observe("nodes", count_nodes(expression))
+        if self.optimiser is not None:
+            expression, _ = self._stage("optimise", self.optimiser.optimise, expression)
+        return expression
+
+    def _stage(self, name: str, function: Callable[..., Any], *args: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            if self.profiler is not None:
+                self.profiler.add_stage(name, elapsed)
+            if self.metrics is not None:
+                self.metrics.observe(f"{name}.seconds", elapsed)
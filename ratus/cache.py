@@ -0,0 +1,126 @@
+"""Bounded caches."""
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import (
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    NamedTuple,
+    Optional,
+    TypeVar,
+    Union,
+)
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+D = TypeVar("D")
+
+
+class CacheInfo(NamedTuple):
+    """Statistics of a cache."""
+
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+    max_size: int
+    expirations: int = 0
+
+
+class LRUCache(Generic[K, V]):
+    """
+    Thread-safe cache which evicts the least recently used entry when full.
+
+    A `max_size` of 0 disables the cache, nothing is stored and every lookup is
+    a miss.
+
+    If a `ttl` is given, entries expire that many seconds after they were
+    stored, as measured by `clock`. Looking up an expired entry removes it and
+    counts as a miss. Expired entries which aren't looked up again stay until
+    they are evicted.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 128,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if max_size < 0:
+            raise ValueError(f"Cache size must not be negative, got {max_size}")
+        if ttl is not None and ttl <= 0:
+            raise ValueError(f"Cache TTL must be positive, got {ttl}")
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: "OrderedDict[K, V]" = OrderedDict()
+        self._expiry_times: Dict[K, float] = {}
+        self._lock = Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, key: K, default: Optional[D] = None) -> Union[V, Optional[D]]:
+        """Return the value cached for `key`, or `default` if there isn't one."""
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self._misses += 1
+                return default
+            if self.ttl is not None and self._expiry_times[key] <= self.clock():
+                del self._entries[key]
+                del self._expiry_times[key]
+                self._expirations += 1
+                self._misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key: K, value: V) -> None:
+        """Cache `value` for `key`, evicting the least recently used if full."""
+        if self.max_size == 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if self.ttl is not None:
+                self._expiry_times[key] = self.clock() + self.ttl
+            if len(self._entries) > self.max_size:
+                evicted, _ = self._entries.popitem(last=False)
+                self._expiry_times.pop(evicted, None)
+                self._evictions += 1
+
+    def clear(self) -> None:
+        """Remove all entries and reset the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self._expiry_times.clear()
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
+            self._expirations = 0
+
+    def info(self) -> CacheInfo:
+        """Return the statistics of the cache."""
+        with self._lock:
+            return CacheInfo(
+                self._hits,
+                self._misses,
+                self._evictions,
+                len(self._entries),
+                self.max_size,
+                self._expirations,
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, key: object) -> bool:
+        with self._lock:
+            return key in self._entries
@@ -0,0 +1,169 @@
+"""
+Python code generation backend.
+
+Expressions are translated into a Python ``ast.Expression`` which is compiled
+into a code object by the built-in ``compile()``, so evaluating them runs as
+native CPython bytecode.
+
+Operations which are still the defaults from ``operator`` are translated into
+the equivalent Python operator, as are the default lazy ``and``, ``or`` and
+``if``. Anything else, i.e. injected functions and overridden operations, is
+passed into the generated code as a bound constant, with the arguments of lazy
+functions wrapped in lambdas.
+The expression is compiled as the body of a lambda nested inside another lambda
+whose parameters hold those constants, so they are closure variables of the
+generated code. The inner lambda takes the values of the variables by slot as
+its parameter, and each variable is read by indexing it with its slot. No name
+used by the generated code is looked up in its globals, which are empty.
+"""
+import ast
+import operator
+from typing import Any, Callable, Dict, List, Tuple, Type
+
+from ratus.execer import (
+    CompiledExpression,
+    Executor,
+    ExecutorError,
+    LazyFunction,
+    lazy_and,
+    lazy_if,
+    lazy_or,
+    lookup_callable,
+    variable_slots,
+)
+from ratus.parse import BinaryOp, Expression, Function, Literal, UnaryOp, Variable
+
+# Name of the parameter holding the values of the variables
+_SLOTS = "_s"
+
+_NATIVE_BINARY_OPS: Dict[Callable[..., Any], Type[ast.operator]] = {
+    operator.add: ast.Add,
+    operator.sub: ast.Sub,
+    operator.mul: ast.Mult,
+    operator.truediv: ast.Div,
+    operator.and_: ast.BitAnd,
+    operator.or_: ast.BitOr,
+}
+
+_NATIVE_COMPARISONS: Dict[Callable[..., Any], Type[ast.cmpop]] = {
+    operator.gt: ast.Gt,
+    operator.ge: ast.GtE,
+    operator.lt: ast.Lt,
+    operator.le: ast.LtE,
+    operator.eq: ast.Eq,
+    operator.ne: ast.NotEq,
+}
+
+_NATIVE_BOOL_OPS: Dict[Callable[..., Any], Type[ast.boolop]] = {
+    lazy_and: ast.And,
+    lazy_or: ast.Or,
+}
+
+_NATIVE_UNARY_OPS: Dict[Callable[..., Any], Type[ast.unaryop]] = {
+    operator.not_: ast.Not,
+    operator.neg: ast.USub,
+}
+
+
+class _CodeGenerator:
+    """Translator of a ratus expression into a Python AST."""
+
+    def __init__(self, executor: Executor, slots: Dict[str, int]) -> None:
+        self.executor = executor
+        self.slots = slots
+        self.constants: List[Callable[..., Any]] = []
+        self.constant_names: Dict[int, str] = {}
+
+    def bind(self, function: Callable[..., Any]) -> ast.expr:
+        """Return a reference to `function` as a bound constant."""
+        name = self.constant_names.get(id(function))
+        if name is None:
+            name = f"_k{len(self.constants)}"
+            self.constants.append(function)
+            self.constant_names[id(function)] = name
+        return ast.Name(id=name, ctx=ast.Load())
+
+    def generate(self, expression: Expression) -> ast.expr:
+        if isinstance(expression, Literal):
+            return ast.Constant(value=expression.value)
+        if isinstance(expression, Variable):
+            # Parsed from a template, as subscripts are represented differently
+            # between Python versions
+            slot = self.slots[expression.name]
+            return ast.parse(f"{_SLOTS}[{slot}]", mode="eval").body
+        if isinstance(expression, BinaryOp):
+            left = self.generate(expression.left)
+            right = self.generate(expression.right)
+            binary_op = self.executor.binary_ops[expression.op_type]
+            native_op = lookup_callable(_NATIVE_BINARY_OPS, binary_op)
+            if native_op is not None:
+                return ast.BinOp(left=left, op=native_op(), right=right)
+            comparison = lookup_callable(_NATIVE_COMPARISONS, binary_op)
+            if comparison is not None:
+                return ast.Compare(left=left, ops=[comparison()], comparators=[right])
+            bool_op = lookup_callable(_NATIVE_BOOL_OPS, binary_op)
+            if bool_op is not None:
+                return ast.BoolOp(op=bool_op(), values=[left, right])
+            return self.call(binary_op, [left, right])
+        if isinstance(expression, UnaryOp):
+            operand = self.generate(expression.operand)
+            unary_op = self.executor.unary_ops[expression.op_type]
+            native_unary_op = lookup_callable(_NATIVE_UNARY_OPS, unary_op)
+            if native_unary_op is not None:
+                return ast.UnaryOp(op=native_unary_op(), operand=operand)
+            return self.call(unary_op, [operand])
+        if isinstance(expression, Function):
+            function = self.executor.functions.get(expression.name)
+            if function is None:
+                raise ExecutorError(f"Function '{expression.name}' is not defined")
+            args = [self.generate(arg) for arg in expression.args]
+            if function is lazy_if and len(args) == 3:
+                return ast.IfExp(test=args[0], body=args[1], orelse=args[2])
+            return self.call(function, args)
+        raise ExecutorError(f"Cannot compile expression {expression}")
+
+    def call(self, function: Callable[..., Any], args: List[ast.expr]) -> ast.expr:
+        if isinstance(function, LazyFunction):
+            function = function.function
+            args = [_thunk(arg) for arg in args]
+        return ast.Call(func=self.bind(function), args=args, keywords=[])
+
+
+def _thunk(body: ast.expr) -> ast.expr:
+    """Wrap `body` in a lambda of no arguments."""
+    thunk = ast.parse("lambda: None", mode="eval").body
+    assert isinstance(thunk, ast.Lambda)
+    thunk.body = body
+    return thunk
+
+
+def to_python_ast(
+    executor: Executor, expression: Expression, slots: Dict[str, int]
+) -> Tuple[ast.Expression, List[Callable[..., Any]]]:
+    """
+    Translate an expression into a Python AST.
+
+    The returned ``ast.Expression`` evaluates to a function which takes the
+    returned constants as positional arguments and returns a function which
+    evaluates the expression. That function takes a sequence holding the value
+    of each variable at its index in `slots`.
+    """
+    generator = _CodeGenerator(executor, slots)
+    body = generator.generate(expression)
+    names = [generator.constant_names[id(c)] for c in generator.constants]
+    # Parsing a template saves building ast.arguments by hand, whose fields
+    # differ between Python versions
+    tree = ast.parse(f"lambda {', '.join(names)}: lambda {_SLOTS}: None", mode="eval")
+    outer = tree.body
+    assert isinstance(outer, ast.Lambda) and isinstance(outer.body, ast.Lambda)
+    outer.body.body = body
+    return ast.fix_missing_locations(tree), generator.constants
+
+
+def compile_python(executor: Executor, expression: Expression) -> CompiledExpression:
+    """Compile an expression into native Python bytecode."""
+    slots = variable_slots(expression)
+    tree, constants = to_python_ast(executor, expression, slots)
+    code = compile(tree, "<ratus>", "eval")
+    factory = eval(code, {"__builtins__": {}})
+    return CompiledExpression(factory(*constants), slots)
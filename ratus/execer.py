@@ -1,6 +1,24 @@
+import asyncio
+import inspect
 import operator
-from typing import Any, Callable, Dict, Optional
+from array import array
+from functools import partial
+from itertools import repeat
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
+from ratus.cache import CacheInfo, LRUCache
 from ratus.parse import (
     BinaryOp,
     BinaryOpType,
@@ -9,6 +27,7 @@ from ratus.parse import (
     Literal,
     UnaryOp,
     UnaryOpType,
+    Variable,
 )
 
 
@@ -16,6 +35,280 @@ class ExecutorError(Exception):
     """Exception raised if there is an error executing an expression."""
 
 
+class LazyFunction:
+    """
+    Function whose arguments are evaluated lazily.
+
+    Instead of the values of its arguments, a lazy function is called with one
+    thunk per argument. A thunk is a function of no arguments which evaluates
+    the argument when called, so arguments that are not needed are never
+    evaluated. Lazy functions can be used as functions and as binary
+    operations.
+    """
+
+    def __init__(self, function: Callable[..., Any]) -> None:
+        self.function = function
+
+    def __call__(self, *thunks: Callable[[], Any]) -> Any:
+        return self.function(*thunks)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.function!r})"
+
+    def __reduce__(self) -> Any:
+        # The default lazy functions are pickled by name, so that unpickling
+        # them gives back the shared instances the compilers recognise
+        for name in ("lazy_if", "lazy_and", "lazy_or"):
+            if globals().get(name) is self:
+                return name
+        return (type(self), (self.function,))
+
+
+def lazy(function: Callable[..., Any]) -> LazyFunction:
+    """
+    Mark a function as lazy.
+
+    This can be used as a decorator on functions to be injected into the
+    executor, e.g. a ``coalesce`` which only evaluates arguments until it finds
+    one that is not ``None``::
+
+        @lazy
+        def coalesce(*thunks):
+            for thunk in thunks:
+                value = thunk()
+                if value is not None:
+                    return value
+            return None
+    """
+    return LazyFunction(function)
+
+
+class VectorisedFunction:
+    """
+    Function which can be applied to whole columns at once.
+
+    When an expression is evaluated over columns of data (see
+    `ratus.vectorise`), a vectorised function is called once with NumPy arrays
+    holding its arguments for all the rows, rather than once per row. Anywhere
+    else it is called like any other function.
+    """
+
+    def __init__(self, function: Callable[..., Any]) -> None:
+        self.function = function
+
+    def __call__(self, *args: Any) -> Any:
+        return self.function(*args)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.function!r})"
+
+
+def vectorised(function: Callable[..., Any]) -> VectorisedFunction:
+    """
+    Mark a function as vectorised.
+
+    This can be used as a decorator on functions to be injected into the
+    executor which work on NumPy arrays as well as on single values, e.g.::
+
+        @vectorised
+        def clip(value, low, high):
+            return numpy.clip(value, low, high)
+    """
+    return VectorisedFunction(function)
+
+
+_T = TypeVar("_T")
+
+
+def lookup_callable(
+    table: Mapping[Callable[..., Any], _T], function: Callable[..., Any]
+) -> Optional[_T]:
+    """
+    Return the value of a callable in a table keyed by callables, or None.
+
+    Callables are compared by identity, as those supplied by users need not be
+    hashable.
+    """
+    for known, value in table.items():
+        if function is known:
+            return value
+    return None
+
+
+# Marks a cache miss, as None may be a cached result
+_MISSING = object()
+
+
+class PureFunction:
+    """
+    Function whose result only depends on its arguments.
+
+    The results of a pure function are cached by the arguments it was called
+    with, so calling it again with the same arguments returns the cached result
+    without calling the function. The results are kept in an LRU cache of up to
+    `max_size` entries, available as `cache` to inspect its statistics. If a
+    `ttl` is given they expire after that many seconds, which suits functions
+    whose results change slowly, e.g. exchange rates.
+
+    Calls with unhashable arguments and calls which raise are not cached. The
+    results of coroutine functions are cached once they have been awaited.
+    """
+
+    def __init__(
+        self,
+        function: Callable[..., Any],
+        max_size: int = 128,
+        ttl: Optional[float] = None,
+    ) -> None:
+        self.function = function
+        self.cache: LRUCache[Tuple[Any, ...], Any] = LRUCache(max_size, ttl)
+        self._is_coroutine = inspect.iscoroutinefunction(function)
+
+    def __call__(self, *args: Any) -> Any:
+        if self._is_coroutine:
+            return self._call_async(args)
+        try:
+            value = self.cache.get(args, _MISSING)
+        except TypeError:
+            # Unhashable arguments can't be looked up
+            return self.function(*args)
+        if value is _MISSING:
+            value = self.function(*args)
+            self.cache.put(args, value)
+        return value
+
+    async def _call_async(self, args: Tuple[Any, ...]) -> Any:
+        try:
+            value = self.cache.get(args, _MISSING)
+        except TypeError:
+            return await self.function(*args)
+        if value is _MISSING:
+            value = await self.function(*args)
+            self.cache.put(args, value)
+        return value
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.function!r})"
+
+    def __reduce__(self) -> Any:
+        # The cache holds a lock, which can't be pickled, so a copy starts with
+        # an empty cache of the same size
+        return (type(self), (self.function, self.cache.max_size, self.cache.ttl))
+
+
+def pure(
+    function: Optional[Callable[..., Any]] = None,
+    *,
+    max_size: int = 128,
+    ttl: Optional[float] = None,
+) -> Union[PureFunction, Callable[[Callable[..., Any]], PureFunction]]:
+    """
+    Mark a function as pure, caching its results.
+
+    This can be used as a decorator on functions to be injected into the
+    executor, with or without arguments to size the cache (see
+    `PureFunction`)::
+
+        @pure
+        def tier(customer):
+            ...
+
+        @pure(max_size=16, ttl=60)
+        def rate(currency):
+            ...
+    """
+    if function is None:
+        return lambda function: PureFunction(function, max_size, ttl)
+    return PureFunction(function, max_size, ttl)
+
+
+def _if(
+    condition: Callable[[], Any],
+    if_true: Callable[[], Any],
+    if_false: Callable[[], Any],
+) -> Any:
+    return if_true() if condition() else if_false()
+
+
+def _and(left: Callable[[], Any], right: Callable[[], Any]) -> Any:
+    return left() and right()
+
+
+def _or(left: Callable[[], Any], right: Callable[[], Any]) -> Any:
+    return left() or right()
+
+
+# The default lazy functions are shared by all executors so that the compiler
+# backends can recognise them
+lazy_if = lazy(_if)
+lazy_and = lazy(_and)
+lazy_or = lazy(_or)
+
+
+def variable_slots(expression: Expression) -> Dict[str, int]:
+    """
+    Assign a slot to each variable in an expression.
+
+    Slots are numbered from 0 in the order the variables first appear in the
+    expression, reading left to right.
+    """
+    slots: Dict[str, int] = {}
+    # Walked with an explicit stack so expressions of any depth can be handled
+    stack = [expression]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Variable):
+            slots.setdefault(node.name, len(slots))
+        elif isinstance(node, BinaryOp):
+            stack.append(node.right)
+            stack.append(node.left)
+        elif isinstance(node, UnaryOp):
+            stack.append(node.operand)
+        elif isinstance(node, Function):
+            stack.extend(reversed(node.args))
+    return slots
+
+
+class CompiledExpression:
+    """
+    Compiled expression.
+
+    Calling a compiled expression evaluates it with its variables looked up in
+    a context mapping names to values. The variables were resolved to slots
+    when the expression was compiled: `variables` holds their names in slot
+    order, and the values are only looked up by name once per call, however
+    many times each variable is used.
+
+    `evaluate_slots` skips the lookup altogether and takes the values as a
+    sequence in the order of `variables`, e.g. a row of a table whose columns
+    are laid out in that order.
+    """
+
+    def __init__(
+        self,
+        # Called with the values of the variables, in slot order
+        function: Callable[[Sequence[Any]], Any],
+        variables: Iterable[str] = (),
+    ) -> None:
+        self.function = function
+        self.variables: Tuple[str, ...] = tuple(variables)
+
+    def __call__(self, context: Optional[Mapping[str, Any]] = None) -> Any:
+        if not self.variables:
+            return self.function(())
+        if context is None:
+            context = {}
+        try:
+            slots = [context[name] for name in self.variables]
+        except KeyError as error:
+            raise ExecutorError(f"Variable '{error.args[0]}' is not defined") from None
+        return self.function(slots)
+
+    def evaluate_slots(self, slots: Sequence[Any]) -> Any:
+        """Evaluate the expression with the values of its variables by slot."""
+        return self.function(slots)
+
+
 class Executor:
     """Executor of expressions."""
 
@@ -32,12 +325,17 @@ class Executor:
 
         `functions` allows us to extend the callable functions in expression. By
         default only `if` is provided but more can be added and the default
-        definition of `if` (`lambda c, s, f: s if c else f`) can be overridden
-        simple by having an "if" key in the `functions` dictionary.
+        definition of `if` can be overridden simple by having an "if" key in the
+        `functions` dictionary. Functions wrapped with `lazy` are passed thunks
+        rather than values for their arguments. The default `if` is lazy, so
+        only the branch that is chosen is evaluated. Functions wrapped with
+        `pure` cache their results, see `cache_info` for their statistics.
 
         `binary_ops` allows us to extend the binary operations available. It is
         a dictionary mapping variants of `ratus.parse.BinaryOpTypes` to a
-        function with two parameters and a single output.
+        function with two parameters and a single output. Operations can be lazy
+        too. The default `and` and `or` are, and short circuit like Python's
+        `and` and `or`.
 
         `unary_ops` allows us to extend the unary operations available. It is a
         dictionary mapping variants of `ratus.parse.UnaryOpTypes` to a function
@@ -53,8 +351,8 @@ class Executor:
             BinaryOpType.GREATER_EQUAL: operator.ge,
             BinaryOpType.LESS: operator.lt,
             BinaryOpType.LESS_EQUAL: operator.le,
-            BinaryOpType.AND: operator.and_,
-            BinaryOpType.OR: operator.or_,
+            BinaryOpType.AND: lazy_and,
+            BinaryOpType.OR: lazy_or,
             BinaryOpType.EQUAL: operator.eq,
             BinaryOpType.NOT_EQUAL: operator.ne,
         }
@@ -68,26 +366,314 @@ class Executor:
         if unary_ops is not None:
             self.unary_ops.update(unary_ops)
 
-        self.functions = {"if": lambda c, s, f: s if c else f}
+        self.functions: Dict[str, Callable[..., Any]] = {"if": lazy_if}
         if functions is not None:
             self.functions.update(functions)
 
-    def execute(self, expression: Expression) -> Any:
-        """Execute an expression and return the result."""
+    def cache_info(self) -> Dict[str, CacheInfo]:
+        """Return the cache statistics of each pure function, by name."""
+        return {
+            name: function.cache.info()
+            for name, function in self.functions.items()
+            if isinstance(function, PureFunction)
+        }
+
+    def execute(
+        self, expression: Expression, context: Optional[Mapping[str, Any]] = None
+    ) -> Any:
+        """
+        Execute an expression and return the result.
+
+        Variables in the expression are looked up by name in `context`.
+        """
         if isinstance(expression, Literal):
             return expression.value
+        if isinstance(expression, Variable):
+            if context is None or expression.name not in context:
+                raise ExecutorError(f"Variable '{expression.name}' is not defined")
+            return context[expression.name]
         if isinstance(expression, BinaryOp):
-            left = self.execute(expression.left)
-            right = self.execute(expression.right)
             binary_op = self.binary_ops[expression.op_type]
+            if isinstance(binary_op, LazyFunction):
+                return binary_op(
+                    partial(self.execute, expression.left, context),
+                    partial(self.execute, expression.right, context),
+                )
+            left = self.execute(expression.left, context)
+            right = self.execute(expression.right, context)
             return binary_op(left, right)
         if isinstance(expression, UnaryOp):
-            operand = self.execute(expression.operand)
+            operand = self.execute(expression.operand, context)
             unary_op = self.unary_ops[expression.op_type]
             return unary_op(operand)
         if isinstance(expression, Function):
             function = self.functions.get(expression.name)
             if function is None:
                 raise ExecutorError(f"Function '{expression.name}' is not defined")
-            args = [self.execute(arg) for arg in expression.args]
-            return function(*args)
+            args = expression.args
+            if isinstance(function, LazyFunction):
+                thunks = [partial(self.execute, arg, context) for arg in args]
+                return function(*thunks)
+            return function(*[self.execute(arg, context) for arg in args])
+
+    def execute_vectorised(
+        self, expression: Expression, columns: Mapping[str, Any]
+    ) -> Any:
+        """
+        Execute an expression over columns of data with NumPy.
+
+        `columns` maps variable names to arrays of equal length and the result
+        is an array with the value of the expression for each row. NumPy must be
+        installed, see `ratus.vectorise` for details.
+        """
+        # Imported here as NumPy is optional and vectorising builds on the
+        # executor
+        from ratus.vectorise import execute_vectorised
+
+        return execute_vectorised(self, expression, columns)
+
+    async def execute_async(
+        self, expression: Expression, context: Optional[Mapping[str, Any]] = None
+    ) -> Any:
+        """
+        Execute an expression, awaiting any awaitable results.
+
+        Functions and operations can be coroutine functions, or return other
+        awaitables, which are awaited for their values. Independent arguments
+        of a function or operation are evaluated concurrently, so awaiting
+        several slow functions takes about as long as awaiting the slowest of
+        them. The default ``if``, ``and`` and ``or`` still only evaluate the
+        arguments they need. Other lazy functions are passed thunks which
+        return awaitables rather than values.
+        """
+        if isinstance(expression, (Literal, Variable)):
+            return self.execute(expression, context)
+        if isinstance(expression, BinaryOp):
+            binary_op = self.binary_ops[expression.op_type]
+            left, right = expression.left, expression.right
+            if binary_op is lazy_and:
+                value = await self.execute_async(left, context)
+                return value and await self.execute_async(right, context)
+            if binary_op is lazy_or:
+                value = await self.execute_async(left, context)
+                return value or await self.execute_async(right, context)
+            if isinstance(binary_op, LazyFunction):
+                return await self._call_lazy_async(binary_op, [left, right], context)
+            values = await self._execute_args_async([left, right], context)
+            return await _resolve(binary_op(*values))
+        if isinstance(expression, UnaryOp):
+            operand = await self.execute_async(expression.operand, context)
+            unary_op = self.unary_ops[expression.op_type]
+            return await _resolve(unary_op(operand))
+        if isinstance(expression, Function):
+            function = self.functions.get(expression.name)
+            if function is None:
+                raise ExecutorError(f"Function '{expression.name}' is not defined")
+            args = expression.args
+            if function is lazy_if and len(args) == 3:
+                condition, if_true, if_false = args
+                if await self.execute_async(condition, context):
+                    return await self.execute_async(if_true, context)
+                return await self.execute_async(if_false, context)
+            if isinstance(function, LazyFunction):
+                return await self._call_lazy_async(function, args, context)
+            values = await self._execute_args_async(args, context)
+            return await _resolve(function(*values))
+
+    async def _execute_args_async(
+        self, args: Sequence[Expression], context: Optional[Mapping[str, Any]]
+    ) -> List[Any]:
+        # Literals and variables need no awaiting, so only the other arguments
+        # are gathered, which saves scheduling a task for each of them
+        values: List[Any] = []
+        pending = []
+        for index, arg in enumerate(args):
+            if isinstance(arg, (Literal, Variable)):
+                values.append(self.execute(arg, context))
+            else:
+                values.append(None)
+                pending.append((index, self.execute_async(arg, context)))
+        if len(pending) == 1:
+            index, awaitable = pending[0]
+            values[index] = await awaitable
+        elif pending:
+            results = await asyncio.gather(*[awaitable for _, awaitable in pending])
+            for (index, _), result in zip(pending, results):
+                values[index] = result
+        return values
+
+    async def _call_lazy_async(
+        self,
+        function: LazyFunction,
+        args: Sequence[Expression],
+        context: Optional[Mapping[str, Any]],
+    ) -> Any:
+        thunks = [partial(self.execute_async, arg, context) for arg in args]
+        return await _resolve(function(*thunks))
+
+    def execute_columnar(
+        self,
+        expression: Expression,
+        columns: Mapping[str, Any],
+        out: Optional[array] = None,
+        backend: str = "python",
+    ) -> array:
+        """
+        Execute an expression over columns of data.
+
+        `columns` maps variable names to one dimensional buffers of equal
+        length, e.g. ``array('d')`` or ``array('q')``. They are read through a
+        `memoryview`, so they are never copied. The expression is compiled with
+        `backend` and evaluated for each row, with the results written into
+        `out`, which must have one element per row. If `out` isn't given, a new
+        ``array('d')`` is allocated for them. The output array is returned.
+        """
+        compiled = self.compile(expression, backend)
+        if not columns:
+            raise ExecutorError("Columnar execution needs at least one column")
+        views = [memoryview(column) for column in columns.values()]
+        lengths = {len(view) for view in views if view.ndim == 1}
+        if len(lengths) != 1 or any(view.ndim != 1 for view in views):
+            raise ExecutorError(
+                "Columns must be one dimensional and all of the same length"
+            )
+        (n_rows,) = lengths
+        if out is None:
+            out = array("d", [0.0]) * n_rows
+        elif len(out) != n_rows:
+            raise ExecutorError(f"Output has {len(out)} elements, expected {n_rows}")
+        names = list(columns)
+        slot_views = []
+        for name in compiled.variables:
+            if name not in columns:
+                raise ExecutorError(f"Variable '{name}' is not defined")
+            slot_views.append(views[names.index(name)])
+        rows = zip(*slot_views) if slot_views else repeat((), n_rows)
+        output = memoryview(out)
+        function = compiled.function
+        for index, row in enumerate(rows):
+            value = function(row)
+            try:
+                output[index] = value
+            except (TypeError, ValueError):
+                # The wrong type, or a value out of the output type's range
+                raise ExecutorError(
+                    f"Cannot store {value!r} in an output of type '{output.format}'"
+                ) from None
+        return out
+
+    def compile(
+        self, expression: Expression, backend: str = "closures"
+    ) -> CompiledExpression:
+        """
+        Compile an expression into a callable which evaluates it.
+
+        The operations and functions used by the expression are looked up once,
+        when it is compiled, so calling the result repeatedly skips the dispatch
+        that `execute` does on every node. As they are bound ahead of time,
+        changes made to the executor's operations or functions after compiling
+        are not seen by the compiled expression. Variables are resolved to slots
+        at the same time, see `CompiledExpression`.
+
+        `backend` selects how the expression is compiled. "closures" binds it
+        into a tree of closures, "python" translates it into native Python
+        bytecode (see `ratus.codegen`) and "vm" compiles it into a program for a
+        stack based virtual machine (see `ratus.vm`). Unlike the other backends,
+        "vm" can compile and run expressions of any depth.
+        """
+        if backend == "closures":
+            slots = variable_slots(expression)
+            compiled = ClosureCompiler(self, slots).compile(expression)
+            return CompiledExpression(compiled, slots)
+        if backend == "python":
+            # Imported here as the code generator builds on the executor
+            from ratus.codegen import compile_python
+
+            return compile_python(self, expression)
+        if backend == "vm":
+            # Imported here as the virtual machine builds on the executor
+            from ratus.vm import compile_program
+
+            return compile_program(self, expression)
+        raise ValueError(f"Unknown compiler backend '{backend}'")
+
+
+class ClosureCompiler:
+    """
+    Compiler of expressions into a tree of closures.
+
+    Every closure takes the values of the variables by slot and returns the
+    value of its subexpression. Subclasses can override `compile` to change how
+    subexpressions are compiled, as children are compiled through it too.
+    """
+
+    def __init__(self, executor: Executor, slots: Dict[str, int]) -> None:
+        self.executor = executor
+        self.slots = slots
+
+    def compile(self, expression: Expression) -> Callable[[Sequence[Any]], Any]:
+        """Compile an expression into a closure."""
+        executor = self.executor
+        if isinstance(expression, Literal):
+            value = expression.value
+            return lambda values: value
+        if isinstance(expression, Variable):
+            return operator.itemgetter(self.slots[expression.name])
+        if isinstance(expression, BinaryOp):
+            left = self.compile(expression.left)
+            right = self.compile(expression.right)
+            binary_op = executor.binary_ops[expression.op_type]
+            if binary_op is lazy_and:
+                return lambda values: left(values) and right(values)
+            if binary_op is lazy_or:
+                return lambda values: left(values) or right(values)
+            if isinstance(binary_op, LazyFunction):
+                return _compile_call(binary_op, [left, right])
+            return lambda values: binary_op(left(values), right(values))
+        if isinstance(expression, UnaryOp):
+            operand = self.compile(expression.operand)
+            unary_op = executor.unary_ops[expression.op_type]
+            return lambda values: unary_op(operand(values))
+        if isinstance(expression, Function):
+            function = executor.functions.get(expression.name)
+            if function is None:
+                raise ExecutorError(f"Function '{expression.name}' is not defined")
+            return _compile_call(
+                function, [self.compile(arg) for arg in expression.args]
+            )
+        raise ExecutorError(f"Cannot compile expression {expression}")
+
+
+async def _resolve(value: Any) -> Any:
+    """Return `value`, awaiting it first if it is awaitable."""
+    if inspect.isawaitable(value):
+        return await value
+    return value
+
+
+def _compile_call(
+    function: Callable[..., Any], args: List[Callable[[Sequence[Any]], Any]]
+) -> Callable[[Sequence[Any]], Any]:
+    if function is lazy_if and len(args) == 3:
+        condition, if_true, if_false = args
+        return lambda values: (
+            if_true(values) if condition(values) else if_false(values)
+        )
+    if isinstance(function, LazyFunction):
+        # Thunks bind the compiled arguments to the values they are called with
+        lazy_function = function.function
+        return lambda values: lazy_function(*[partial(arg, values) for arg in args])
+    # Calls with few arguments are specialised so that no argument list has to
+    # be built when they are evaluated
+    if len(args) == 0:
+        return lambda values: function()
+    if len(args) == 1:
+        (arg,) = args
+        return lambda values: function(arg(values))
+    if len(args) == 2:
+        first, second = args
+        return lambda values: function(first(values), second(values))
+    if len(args) == 3:
+        first, second, third = args
+        return lambda values: function(first(values), second(values), third(values))
+    return lambda values: function(*[arg(values) for arg in args])
@@ -0,0 +1,251 @@
+"""
+Matching records against many rules with a predicate index.
+
+Finding which of many boolean rules match a record by executing every rule is
+linear in the number of rules. A predicate index avoids evaluating most of them.
+
+Each rule is split into the conjuncts of its top level ``and``. A conjunct which
+compares a variable with a literal using the default ``=``, ``>``, ``>=``, ``<``
+or ``<=``, e.g. ``5 < age`` or ``country = 'AU'`` in
+``5 < age and country = 'AU'``, is a predicate which can be indexed. One of them
+is chosen as the rule's access predicate, preferring equality as it is usually
+the most selective:
+
+- equality predicates are held in a hash index per variable, mapping literals to
+  the rules comparing the variable with them,
+- order predicates are held in an interval index per variable and operator, a
+  sorted list of literals in which the rules whose predicate holds for a value
+  are found by bisection.
+
+Matching a record looks its values up in the indexes to find the candidate
+rules whose access predicate holds, and only those, along with the rules which
+have no indexable predicate, are evaluated as `ratus.execer.Executor.execute`
+would. A rule whose access predicate doesn't hold for a record is false for it,
+so the rules matched are the same as when executing every rule, as long as none
+of them raises. Rules which aren't candidates aren't evaluated, so errors they
+would raise, e.g. from comparing a string with a number in another conjunct,
+aren't raised.
+Values are also looked up in the hash indexes by their hash, so a value which
+only compares equal to a literal through a custom ``__eq__`` isn't matched.
+
+A value which can't be ordered against the literals of an interval index, e.g.
+a string against numbers, makes all the rules in that index candidates rather
+than ruling any out.
+"""
+import operator
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, List, Mapping, Optional, Set, Tuple
+
+from ratus.execer import CompiledExpression, Executor, lazy_and
+from ratus.parse import (
+    BinaryOp,
+    BinaryOpType,
+    Expression,
+    Literal,
+    UnaryOp,
+    UnaryOpType,
+    Variable,
+)
+
+_MISSING = object()
+
+# Default operations of the comparisons which can be indexed
+_COMPARISONS = {
+    BinaryOpType.EQUAL: operator.eq,
+    BinaryOpType.GREATER: operator.gt,
+    BinaryOpType.GREATER_EQUAL: operator.ge,
+    BinaryOpType.LESS: operator.lt,
+    BinaryOpType.LESS_EQUAL: operator.le,
+}
+
+# Comparison equivalent to one with its operands swapped, e.g. 5 < x to x > 5
+_FLIPPED = {
+    BinaryOpType.EQUAL: BinaryOpType.EQUAL,
+    BinaryOpType.GREATER: BinaryOpType.LESS,
+    BinaryOpType.GREATER_EQUAL: BinaryOpType.LESS_EQUAL,
+    BinaryOpType.LESS: BinaryOpType.GREATER,
+    BinaryOpType.LESS_EQUAL: BinaryOpType.GREATER_EQUAL,
+}
+
+# Predicate of a rule: variable name, comparison and literal value
+_Predicate = Tuple[str, BinaryOpType, Any]
+
+
+def _literal(executor: Executor, expression: Expression) -> Tuple[bool, Any]:
+    """Return whether an expression is a literal, and its value if so."""
+    if isinstance(expression, Literal):
+        return True, expression.value
+    if (
+        isinstance(expression, UnaryOp)
+        and expression.op_type is UnaryOpType.NEGATIVE
+        and executor.unary_ops[UnaryOpType.NEGATIVE] is operator.neg
+        and isinstance(expression.operand, Literal)
+        and isinstance(expression.operand.value, (int, float))
+    ):
+        return True, -expression.operand.value
+    return False, None
+
+
+def predicates(executor: Executor, expression: Expression) -> List[_Predicate]:
+    """
+    Return the indexable predicates of a rule.
+
+    These are the comparisons of a variable with a literal in the conjuncts of
+    the top level ``and`` of the rule, normalised to have the variable first.
+    """
+    found: List[_Predicate] = []
+    stack = [expression]
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, BinaryOp):
+            continue
+        binary_op = executor.binary_ops[node.op_type]
+        if binary_op is lazy_and:
+            stack.extend((node.right, node.left))
+            continue
+        if _COMPARISONS.get(node.op_type) is not binary_op:
+            continue
+        op_type = node.op_type
+        left, right = node.left, node.right
+        if isinstance(right, Variable):
+            left, right = right, left
+            op_type = _FLIPPED[op_type]
+        is_literal, value = _literal(executor, right)
+        if isinstance(left, Variable) and is_literal:
+            found.append((left.name, op_type, value))
+    return found
+
+
+class _IntervalIndex:
+    """Rules with an order predicate on a variable, by the literal compared."""
+
+    def __init__(self, op_type: BinaryOpType) -> None:
+        self.op_type = op_type
+        self.entries: List[Tuple[Any, int]] = []
+        self.literals: List[Any] = []
+        self.rules: List[int] = []
+        self.ordered = True
+
+    def add(self, literal: Any, rule: int) -> None:
+        self.entries.append((literal, rule))
+
+    def build(self) -> None:
+        """Sort the rules by their literals once they have all been added."""
+        try:
+            self.entries.sort(key=operator.itemgetter(0))
+        except TypeError:
+            # Literals of different types, e.g. numbers and strings, can't be
+            # ordered, in which case every rule is a candidate
+            self.ordered = False
+        self.literals = [literal for literal, _ in self.entries]
+        self.rules = [rule for _, rule in self.entries]
+        self.entries = []
+
+    def candidates(self, value: Any) -> List[int]:
+        """Return the rules whose predicate may hold for a value."""
+        if not self.ordered:
+            return self.rules
+        literals = self.literals
+        op_type = self.op_type
+        try:
+            # The value is greater than the literals before where it would be
+            # inserted, and less than the ones after
+            if op_type is BinaryOpType.GREATER:
+                return self.rules[: bisect_left(literals, value)]
+            if op_type is BinaryOpType.GREATER_EQUAL:
+                return self.rules[: bisect_right(literals, value)]
+            if op_type is BinaryOpType.LESS:
+                return self.rules[bisect_right(literals, value) :]
+            return self.rules[bisect_left(literals, value) :]
+        except TypeError:
+            return self.rules
+
+
+class PredicateIndex:
+    """
+    Rules indexed by their predicates, to find which match a record.
+
+    `indexed` is the number of rules with an indexable predicate. The others
+    are evaluated for every record.
+    """
+
+    def __init__(
+        self,
+        executor: Executor,
+        rules: Mapping[str, Expression],
+        backend: str = "closures",
+    ) -> None:
+        """
+        Instantiate a PredicateIndex object.
+
+        `rules` maps the name of each rule to its parsed expression. The rules
+        are compiled with `backend` to be evaluated.
+        """
+        self.names = list(rules)
+        self.compiled: List[CompiledExpression] = [
+            executor.compile(rule, backend) for rule in rules.values()
+        ]
+        self.unindexed: List[int] = []
+        self.equality: Dict[str, Dict[Any, List[int]]] = {}
+        self.intervals: Dict[str, List[_IntervalIndex]] = {}
+        interval_indices: Dict[Tuple[str, BinaryOpType], _IntervalIndex] = {}
+
+        for index, rule in enumerate(rules.values()):
+            found = predicates(executor, rule)
+            if not found:
+                self.unindexed.append(index)
+                continue
+            equalities = [p for p in found if p[1] is BinaryOpType.EQUAL]
+            name, op_type, literal = (equalities or found)[0]
+            if op_type is BinaryOpType.EQUAL:
+                by_literal = self.equality.setdefault(name, {})
+                by_literal.setdefault(literal, []).append(index)
+                continue
+            interval = interval_indices.get((name, op_type))
+            if interval is None:
+                interval = interval_indices[name, op_type] = _IntervalIndex(op_type)
+                self.intervals.setdefault(name, []).append(interval)
+            interval.add(literal, index)
+        for interval in interval_indices.values():
+            interval.build()
+        self.indexed = len(self.names) - len(self.unindexed)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def candidates(self, context: Mapping[str, Any]) -> List[int]:
+        """Return the indices of the rules to evaluate for a record, in order."""
+        candidates: Set[int] = set(self.unindexed)
+        for name, by_literal in self.equality.items():
+            if name not in context:
+                # Evaluating the rules reports the missing variable
+                for rules in by_literal.values():
+                    candidates.update(rules)
+                continue
+            try:
+                matched = by_literal.get(context[name])
+            except TypeError:
+                # Unhashable values don't equal any literal
+                continue
+            if matched is not None:
+                candidates.update(matched)
+        for name, intervals in self.intervals.items():
+            value = context.get(name, _MISSING)
+            for interval in intervals:
+                if value is _MISSING:
+                    candidates.update(interval.rules)
+                else:
+                    candidates.update(interval.candidates(value))
+        return sorted(candidates)
+
+    def match(self, context: Optional[Mapping[str, Any]] = None) -> List[str]:
+        """Return the names of the rules which are truthy for a record."""
+        if context is None:
+            context = {}
+        compiled = self.compiled
+        names = self.names
+        return [
+            names[index]
+            for index in self.candidates(context)
+            if compiled[index](context)
+        ]
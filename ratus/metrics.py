@@ -0,0 +1,166 @@
+"""
+Stage level metrics of evaluation.
+
+A `ratus.Evaluator` created with a `MetricsCollector` reports what each stage
+of evaluating a source costs to it, under the following names:
+
+``tokenise.seconds``, ``parse.seconds``, ``optimise.seconds``
+    Observed each time a source which isn't in the parse cache is tokenised,
+    parsed and optimised.
+``execute.seconds``
+    Observed for each expression executed by ``evaluate`` and
+    ``evaluate_async``.
+``tokens``, ``nodes``
+    Observed for each source parsed, the number of tokens it has and the number
+    of nodes of the expression parsed from them.
+``cache.hits``, ``cache.misses``
+    Incremented for each lookup in the parse cache.
+
+Collectors are plain objects, so the metrics can be exported to any monitoring
+system by implementing `MetricsCollector`. `InMemoryMetrics` keeps them in
+memory, in histograms with fixed buckets which are cheap to update.
+"""
+import math
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from threading import Lock
+from typing import Dict, List, NamedTuple, Sequence
+
+# Powers of two from about a microsecond to about a million, which cover both
+# durations in seconds and counts of tokens or nodes
+DEFAULT_BOUNDS = tuple(pow(2.0, exponent) for exponent in range(-20, 21))
+
+
+class MetricsCollector(ABC):
+    """Receiver of the metrics of an evaluator."""
+
+    @abstractmethod
+    def observe(self, name: str, value: float) -> None:
+        """Record a measured value, e.g. a duration, of the metric `name`."""
+
+    @abstractmethod
+    def increment(self, name: str, amount: int = 1) -> None:
+        """Add `amount` to the counter `name`."""
+
+
+class HistogramSummary(NamedTuple):
+    """Summary of the values observed by a histogram, `n` being their number."""
+
+    n: int
+    sum: float
+    min: float
+    max: float
+    p50: float
+    p90: float
+    p99: float
+
+
+class Histogram:
+    """
+    Histogram of values counted in fixed buckets.
+
+    `bounds` are the ascending upper bounds of the buckets, values greater than
+    the last go in an overflow bucket. Observing a value is a bisection and a
+    few additions. Quantiles are estimated as the upper bound of the bucket
+    they fall in, so they are accurate to within a bucket.
+
+    A histogram isn't thread-safe on its own, `InMemoryMetrics` locks around
+    it.
+    """
+
+    def __init__(self, bounds: Sequence[float] = DEFAULT_BOUNDS) -> None:
+        if list(bounds) != sorted(bounds):
+            raise ValueError("Histogram bounds must be in ascending order")
+        self.bounds = list(bounds)
+        self.counts: List[int] = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def observe(self, value: float) -> None:
+        """Count a value."""
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Estimate the value below which a fraction `q` of the values fall."""
+        if not 0 <= q <= 1:
+            raise ValueError(f"Quantile must be between 0 and 1, got {q}")
+        if not self.count:
+            raise ValueError("Cannot estimate a quantile of an empty histogram")
+        rank = q * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if count and cumulative >= rank:
+                upper = self.max
+                if index < len(self.bounds):
+                    upper = min(self.bounds[index], self.max)
+                return max(upper, self.min)
+        return self.max
+
+    def summary(self) -> HistogramSummary:
+        """Return the count, sum, extremes and main quantiles of the values."""
+        if not self.count:
+            nan = math.nan
+            return HistogramSummary(0, 0.0, nan, nan, nan, nan, nan)
+        return HistogramSummary(
+            self.count,
+            self.sum,
+            self.min,
+            self.max,
+            self.quantile(0.5),
+            self.quantile(0.9),
+            self.quantile(0.99),
+        )
+
+
+class InMemoryMetrics(MetricsCollector):
+    """
+    Thread-safe collector keeping metrics in memory.
+
+    Every observed metric has a `Histogram` with `bounds` and every counter an
+    integer.
+    """
+
+    def __init__(self, bounds: Sequence[float] = DEFAULT_BOUNDS) -> None:
+        self.bounds = tuple(bounds)
+        self._lock = Lock()
+        self._histograms: Dict[str, Histogram] = {}
+        self._counters: Dict[str, int] = {}
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram(self.bounds)
+            histogram.observe(value)
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def histograms(self) -> Dict[str, HistogramSummary]:
+        """Return a summary of each observed metric, by name."""
+        with self._lock:
+            return {
+                name: histogram.summary()
+                for name, histogram in self._histograms.items()
+            }
+
+    def counters(self) -> Dict[str, int]:
+        """Return the value of each counter, by name."""
+        with self._lock:
+            return dict(self._counters)
+
+    def reset(self) -> None:
+        """Discard all the metrics."""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
@@ -0,0 +1,177 @@
+"""
+Expression optimisation.
+
+The optimiser rewrites a parsed expression into a smaller one which evaluates
+to the same result. It
+
+- folds binary and unary operations whose operands are all literals into a
+  literal,
+- prunes ``if`` calls with a literal condition down to the branch that would be
+  taken, and ``and``/``or`` with a literal left operand down to their result,
+- simplifies the identities ``x * 1``, ``1 * x``, ``x + 0``, ``0 + x`` and
+  ``x - 0`` to ``x``. This assumes ``x`` is a number, for any other type the
+  simplified expression may not raise the error the original would have.
+
+Only operations which are known to be pure, i.e. the defaults of
+`ratus.execer.Executor`, are rewritten. Operations and functions overridden by
+the user are always left to be evaluated when the expression is executed. An
+operation on literals which raises an error is also left alone, so the error
+is still raised at execution.
+"""
+import operator
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from ratus.execer import Executor, lazy_and, lazy_if, lazy_or, lookup_callable
+from ratus.parse import (
+    BinaryOp,
+    Expression,
+    Float,
+    Function,
+    Integer,
+    Literal,
+    String,
+    UnaryOp,
+)
+
+# Operations known to be pure, i.e. the defaults of the executor, mapped to True
+PURE_OPS: Dict[Callable[..., Any], bool] = dict.fromkeys(
+    (
+        operator.add,
+        operator.sub,
+        operator.mul,
+        operator.truediv,
+        operator.gt,
+        operator.ge,
+        operator.lt,
+        operator.le,
+        operator.eq,
+        operator.ne,
+        operator.and_,
+        operator.or_,
+        operator.not_,
+        operator.neg,
+    ),
+    True,
+)
+
+# Operand which leaves the other operand unchanged, by operation and by whether
+# the identity may appear on the left, the right or either side
+_IDENTITIES = (
+    (operator.mul, 1, True, True),
+    (operator.add, 0, True, True),
+    (operator.sub, 0, False, True),
+)
+
+
+def count_nodes(expression: Expression) -> int:
+    """Count the nodes in an expression."""
+    # Counted with an explicit stack, so expressions of any depth can be counted
+    count = 0
+    stack = [expression]
+    while stack:
+        node = stack.pop()
+        count += 1
+        if isinstance(node, BinaryOp):
+            stack.append(node.left)
+            stack.append(node.right)
+        elif isinstance(node, UnaryOp):
+            stack.append(node.operand)
+        elif isinstance(node, Function):
+            stack.extend(node.args)
+    return count
+
+
+def _is_pure(op: Callable[..., Any]) -> bool:
+    return lookup_callable(PURE_OPS, op) is not None
+
+
+def _to_literal(value: Any) -> Optional[Literal]:
+    # bool is a subclass of int, and Integer(True) still evaluates to True
+    if isinstance(value, int):
+        return Integer(value)
+    if isinstance(value, float):
+        return Float(value)
+    if isinstance(value, str):
+        return String(value)
+    return None
+
+
+def _fold(op: Callable[..., Any], *operands: Literal) -> Optional[Literal]:
+    try:
+        value = op(*[operand.value for operand in operands])
+    except Exception:
+        return None
+    return _to_literal(value)
+
+
+def _is_literal_value(expression: Expression, value: int) -> bool:
+    # Only integers are identities, as x * 1.0 would turn an integer x into a
+    # float. Booleans are excluded for the same reason.
+    return (
+        isinstance(expression, Integer)
+        and not isinstance(expression.value, bool)
+        and expression.value == value
+    )
+
+
+class Optimiser:
+    """Optimiser of expressions."""
+
+    def __init__(self, executor: Executor) -> None:
+        """
+        Instantiate an Optimiser object.
+
+        `executor` is the executor the optimised expressions will be executed
+        by. Its operations and functions decide what can be rewritten.
+        """
+        self.executor = executor
+
+    def optimise(self, expression: Expression) -> Tuple[Expression, int]:
+        """Optimise an expression, returning it and the number of nodes removed."""
+        optimised = self._optimise(expression)
+        return optimised, count_nodes(expression) - count_nodes(optimised)
+
+    def _optimise(self, expression: Expression) -> Expression:
+        if isinstance(expression, BinaryOp):
+            return self._optimise_binary_op(expression)
+        if isinstance(expression, UnaryOp):
+            operand = self._optimise(expression.operand)
+            unary_op = self.executor.unary_ops[expression.op_type]
+            if isinstance(operand, Literal) and _is_pure(unary_op):
+                folded = _fold(unary_op, operand)
+                if folded is not None:
+                    return folded
+            return UnaryOp(expression.op_type, operand)
+        if isinstance(expression, Function):
+            args = [self._optimise(arg) for arg in expression.args]
+            function = self.executor.functions.get(expression.name)
+            if function is lazy_if and len(args) == 3 and isinstance(args[0], Literal):
+                return args[1] if args[0].value else args[2]
+            return Function(expression.name, args=args)
+        return expression
+
+    def _optimise_binary_op(self, expression: BinaryOp) -> Expression:
+        left = self._optimise(expression.left)
+        right = self._optimise(expression.right)
+        binary_op = self.executor.binary_ops[expression.op_type]
+        if binary_op is lazy_and and isinstance(left, Literal):
+            return right if left.value else left
+        if binary_op is lazy_or and isinstance(left, Literal):
+            return left if left.value else right
+        if not _is_pure(binary_op):
+            return BinaryOp(expression.op_type, left, right)
+        if isinstance(left, Literal) and isinstance(right, Literal):
+            # An operation on literals which can't be folded is left alone
+            # rather than simplified as an identity, e.g. "a" - 0 still raises
+            folded = _fold(binary_op, left, right)
+            if folded is not None:
+                return folded
+            return BinaryOp(expression.op_type, left, right)
+        for op, identity, on_left, on_right in _IDENTITIES:
+            if binary_op is not op:
+                continue
+            if on_left and _is_literal_value(left, identity):
+                return right
+            if on_right and _is_literal_value(right, identity):
+                return left
+        return BinaryOp(expression.op_type, left, right)
@@ -0,0 +1,296 @@
+"""
+Packrat parsing engine.
+
+The ratus grammar is expressed below as a parsing expression grammar (PEG)
+over tokens::
+
+    Expression  <- Conjunction ('or' Conjunction)*
+    Conjunction <- Comparison ('and' Comparison)*
+    Comparison  <- Term (ExprOp Term)*
+    Term        <- Factor (TermOp Factor)*
+    Factor      <- Group / Call / Variable / STRING / Unary / Number
+    Group       <- '(' Expression ')'
+    Call        <- IDENT '(' Arguments? ')'
+    Variable    <- IDENT
+    Arguments   <- Expression (',' Expression)*
+    Unary       <- ('-' / '!') Factor
+    Number      <- INT / FLOAT
+    ExprOp      <- '+' / '-' / '>' / '>=' / '<' / '<=' / '=' / '!='
+    TermOp      <- '*' / '/'
+
+Each rule is memoised on the position it is applied at, so no rule is ever
+evaluated twice at the same position. Rules matching a single token take
+constant time anyway and aren't memoised. This bounds parsing time to the
+number of rules times the number of tokens, no matter how much backtracking the
+ordered choices do.
+
+Rules are generators which yield the rules they apply, by name, along with the
+position to apply them at, and are sent back the result. The parser keeps the
+rules being applied on an explicit stack rather than the Python call stack, so
+expressions can be nested to any depth.
+
+When the input does not match the grammar the error reports the furthest
+position any rule reached, along with the tokens that would have been accepted
+there.
+"""
+from typing import Any, Callable, Dict, Generator, List, Optional, Set, Tuple, Union
+
+from ratus.parse import (
+    _CONJUNCTION_OPERATORS,
+    _DISJUNCTION_OPERATORS,
+    _EXPRESSION_OPERATORS,
+    _TERM_OPERATORS,
+    _UNARY_OPERATORS,
+    BinaryOp,
+    Expression,
+    Float,
+    Function,
+    Integer,
+    ParserError,
+    String,
+    UnaryOp,
+    Variable,
+    _Tokens,
+)
+from ratus.token import Token, TokenStream, TokenType
+
+# Result of applying a rule: the parsed value and the position after it, or None
+# if the rule did not match
+_Result = Optional[Tuple[Any, int]]
+# Application of a rule, by name, at a position
+_Application = Tuple[str, int]
+_Rule = Generator[_Application, _Result, _Result]
+
+_RULES = (
+    "expression",
+    "conjunction",
+    "comparison",
+    "term",
+    "factor",
+    "group",
+    "call",
+    "arguments",
+    "unary",
+)
+
+
+class _PackratParser:
+    """Packrat parser state for a single token list."""
+
+    def __init__(self, tokens: Union[List[Token], TokenStream]) -> None:
+        self.tokens = _Tokens(tokens)
+        self.types = self.tokens.types
+        self.memo: Dict[_Application, _Result] = {}
+        self.furthest = 0
+        self.expected: Set[str] = set()
+        self.rules: Dict[str, Callable[[int], _Rule]] = {
+            name: getattr(self, name) for name in _RULES
+        }
+
+    def parse(self) -> Expression:
+        if len(self.types) == 0:
+            raise ParserError("Expression cannot be empty")
+        result = self.apply("expression", 0)
+        if result is not None:
+            expression, pos = result
+            if pos == len(self.types):
+                return expression
+            self._expect(pos, "end of expression")
+        raise self._error()
+
+    def apply(self, name: str, pos: int) -> _Result:
+        """Apply the rule `name` at `pos`, along with every rule it applies."""
+        memo = self.memo
+        rules = self.rules
+        stack = [((name, pos), rules[name](pos))]
+        result: _Result = None
+        while stack:
+            application, rule = stack[-1]
+            try:
+                inner = rule.send(result)
+            except StopIteration as stop:
+                stack.pop()
+                result = memo[application] = stop.value
+                continue
+            if inner in memo:
+                result = memo[inner]
+            else:
+                stack.append((inner, rules[inner[0]](inner[1])))
+                result = None
+        return result
+
+    def _error(self) -> ParserError:
+        expected = ", ".join(sorted(self.expected))
+        if self.furthest >= len(self.types):
+            return ParserError(f"Unexpected end of expression. Expected {expected}")
+        token = self.tokens[self.furthest]
+        return ParserError(
+            f"Unexpected token {token} at position {self.furthest}. "
+            f"Expected {expected}"
+        )
+
+    def _expect(self, pos: int, description: str) -> None:
+        """Record that `description` was expected at `pos` for error reporting."""
+        if pos > self.furthest:
+            self.furthest = pos
+            self.expected = set()
+        if pos == self.furthest:
+            self.expected.add(description)
+
+    def _match(self, pos: int, token_type: TokenType) -> bool:
+        if pos < len(self.types) and self.types[pos] is token_type:
+            return True
+        self._expect(pos, f"'{token_type.value}'")
+        return False
+
+    def expression(self, pos: int) -> _Rule:
+        result = yield "conjunction", pos
+        if result is None:
+            return None
+        expr, pos = result
+        while pos < len(self.types):
+            operator_type = _DISJUNCTION_OPERATORS.get(self.types[pos])
+            if operator_type is None:
+                break
+            right = yield "conjunction", pos + 1
+            if right is None:
+                break
+            expr, pos = BinaryOp(operator_type, expr, right[0]), right[1]
+        return expr, pos
+
+    def conjunction(self, pos: int) -> _Rule:
+        result = yield "comparison", pos
+        if result is None:
+            return None
+        conjunction, pos = result
+        while pos < len(self.types):
+            operator_type = _CONJUNCTION_OPERATORS.get(self.types[pos])
+            if operator_type is None:
+                break
+            right = yield "comparison", pos + 1
+            if right is None:
+                break
+            conjunction, pos = BinaryOp(operator_type, conjunction, right[0]), right[1]
+        return conjunction, pos
+
+    def comparison(self, pos: int) -> _Rule:
+        result = yield "term", pos
+        if result is None:
+            return None
+        expr, pos = result
+        while pos < len(self.types):
+            operator_type = _EXPRESSION_OPERATORS.get(self.types[pos])
+            if operator_type is None:
+                self._expect(pos, "operator")
+                break
+            right = yield "term", pos + 1
+            if right is None:
+                break
+            expr, pos = BinaryOp(operator_type, expr, right[0]), right[1]
+        return expr, pos
+
+    def term(self, pos: int) -> _Rule:
+        result = yield "factor", pos
+        if result is None:
+            return None
+        term, pos = result
+        while pos < len(self.types):
+            operator_type = _TERM_OPERATORS.get(self.types[pos])
+            if operator_type is None:
+                break
+            right = yield "factor", pos + 1
+            if right is None:
+                break
+            term, pos = BinaryOp(operator_type, term, right[0]), right[1]
+        return term, pos
+
+    def factor(self, pos: int) -> _Rule:
+        for alternative in ("group", "call"):
+            result = yield alternative, pos
+            if result is not None:
+                return result
+        result = self.variable(pos)
+        if result is None:
+            result = self.string(pos)
+        if result is None:
+            result = yield "unary", pos
+        if result is None:
+            result = self.number(pos)
+        return result
+
+    def group(self, pos: int) -> _Rule:
+        if not self._match(pos, TokenType.LEFT_PAREN):
+            return None
+        result = yield "expression", pos + 1
+        if result is None:
+            return None
+        expr, pos = result
+        if not self._match(pos, TokenType.RIGHT_PAREN):
+            return None
+        return expr, pos + 1
+
+    def call(self, pos: int) -> _Rule:
+        if not self._match(pos, TokenType.IDENT) or not self._match(
+            pos + 1, TokenType.LEFT_PAREN
+        ):
+            return None
+        name = self.tokens.literal(pos)
+        pos += 2
+        args: List[Expression] = []
+        if not self._match(pos, TokenType.RIGHT_PAREN):
+            result = yield "arguments", pos
+            if result is None:
+                return None
+            args, pos = result
+            if not self._match(pos, TokenType.RIGHT_PAREN):
+                return None
+        return Function(name, args=args), pos + 1
+
+    def variable(self, pos: int) -> _Result:
+        if not self._match(pos, TokenType.IDENT):
+            return None
+        return Variable(self.tokens.literal(pos)), pos + 1
+
+    def arguments(self, pos: int) -> _Rule:
+        result = yield "expression", pos
+        if result is None:
+            return None
+        arg, pos = result
+        args = [arg]
+        while self._match(pos, TokenType.COMMA):
+            result = yield "expression", pos + 1
+            if result is None:
+                break
+            arg, pos = result
+            args.append(arg)
+        return args, pos
+
+    def string(self, pos: int) -> _Result:
+        if not self._match(pos, TokenType.STRING):
+            return None
+        return String(self.tokens.literal(pos)), pos + 1
+
+    def unary(self, pos: int) -> _Rule:
+        unary_op_type = None
+        if pos < len(self.types):
+            unary_op_type = _UNARY_OPERATORS.get(self.types[pos])
+        if unary_op_type is None:
+            self._expect(pos, "'-'")
+            self._expect(pos, "'!'")
+            return None
+        result = yield "factor", pos + 1
+        if result is None:
+            return None
+        return UnaryOp(unary_op_type, result[0]), result[1]
+
+    def number(self, pos: int) -> _Result:
+        if self._match(pos, TokenType.INT):
+            return Integer(self.tokens.literal(pos)), pos + 1
+        if self._match(pos, TokenType.FLOAT):
+            return Float(self.tokens.literal(pos)), pos + 1
+        return None
+
+
+def parse_packrat(tokens: Union[List[Token], TokenStream]) -> Expression:
+    """Parse a list or stream of tokens with the packrat engine."""
+    return _PackratParser(tokens).parse()
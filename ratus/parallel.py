@@ -0,0 +1,138 @@
+"""
+Parallel evaluation in worker processes.
+
+Evaluating expressions over many records is bound to a single core by the GIL,
+so `evaluate_many` spreads the records over a pool of worker processes.
+
+The executor and the parsed expressions are sent to each worker once, when it
+starts, and compiled there. Records are then sent to the workers in chunks, so
+the cost of passing work between processes is paid once per chunk rather than
+once per record. Only a bounded number of chunks are in flight at a time, so
+the records can be an iterator too large to hold in memory, and the results are
+yielded in the order of the records as they become available.
+
+Everything sent to the workers has to be pickled. Injected functions and
+operations must therefore be defined at the top level of a module, not be
+lambdas or closures. Workers are sent a plain `ratus.execer.Executor` with the
+functions and operations of the executor given, so subclasses such as
+`ratus.profiling.ProfilingExecutor` can be used, but their extra behaviour,
+e.g. profiling, doesn't apply in the workers.
+"""
+import os
+import pickle
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Deque, Iterable, Iterator, List, Mapping, Optional
+
+from ratus.execer import Executor, ExecutorError
+from ratus.parse import Expression
+
+# Evaluates a record in a worker process, set by the worker's initialiser
+_evaluate_record: Optional[Callable[[Mapping[str, Any]], Any]] = None
+
+
+def _initialise_worker(
+    executor: Executor, expressions: List[Expression], single: bool, backend: str
+) -> None:
+    global _evaluate_record
+    rules = [executor.compile(expression, backend) for expression in expressions]
+    if single:
+        _evaluate_record = rules[0]
+        return
+
+    def evaluate_record(record: Mapping[str, Any]) -> Any:
+        return tuple(rule(record) for rule in rules)
+
+    _evaluate_record = evaluate_record
+
+
+def _evaluate_chunk(chunk: List[Mapping[str, Any]]) -> List[Any]:
+    evaluate_record = _evaluate_record
+    assert evaluate_record is not None
+    return [evaluate_record(record) for record in chunk]
+
+
+def _worker_executor(executor: Executor) -> Executor:
+    """Return a plain executor with the functions and operations of `executor`."""
+    return Executor(executor.functions, executor.binary_ops, executor.unary_ops)
+
+
+def _check_picklable(executor: Executor) -> None:
+    """Raise an error naming any function of `executor` that can't be pickled."""
+    tables = (
+        ("function", executor.functions),
+        ("binary operation", executor.binary_ops),
+        ("unary operation", executor.unary_ops),
+    )
+    for kind, table in tables:
+        for key, function in table.items():
+            try:
+                pickle.dumps(function)
+            except Exception as error:
+                name = getattr(key, "value", key)
+                raise ExecutorError(
+                    f"Cannot send {kind} '{name}' to worker processes as it can't "
+                    f"be pickled: {error}"
+                ) from error
+
+
+def _results(
+    pool: ProcessPoolExecutor,
+    records: Iterable[Mapping[str, Any]],
+    chunksize: int,
+    max_pending: int,
+) -> Iterator[Any]:
+    with pool:
+        iterator = iter(records)
+        pending: Deque["Future[List[Any]]"] = deque()
+        while True:
+            while len(pending) < max_pending:
+                chunk = list(islice(iterator, chunksize))
+                if not chunk:
+                    break
+                pending.append(pool.submit(_evaluate_chunk, chunk))
+            if not pending:
+                return
+            yield from pending.popleft().result()
+
+
+def evaluate_many(
+    executor: Executor,
+    expressions: List[Expression],
+    records: Iterable[Mapping[str, Any]],
+    single: bool = True,
+    workers: Optional[int] = None,
+    chunksize: int = 1000,
+    backend: str = "closures",
+) -> Iterator[Any]:
+    """
+    Evaluate expressions for each record in worker processes.
+
+    Each record is a context mapping variable names to values. If `single` is
+    set, there must be one expression and its value is yielded for each record,
+    otherwise a tuple of the values of all the expressions is.
+
+    `workers` is the number of worker processes, by default the number of
+    processors. Records are sent to them in chunks of `chunksize` records, and
+    the expressions are compiled with `backend`.
+    """
+    if chunksize < 1:
+        raise ValueError(f"Chunk size must be positive, got {chunksize}")
+    if single and len(expressions) != 1:
+        raise ValueError(f"Expected a single expression, got {len(expressions)}")
+    worker_executor = _worker_executor(executor)
+    _check_picklable(worker_executor)
+    # Compiling up front reports errors such as undefined functions here,
+    # rather than as a broken pool when the workers fail to start
+    for expression in expressions:
+        worker_executor.compile(expression, backend)
+    n_workers = workers or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(
+        n_workers,
+        initializer=_initialise_worker,
+        initargs=(worker_executor, expressions, single, backend),
+    )
+    # Keeping a couple of chunks queued per worker stops them going idle while
+    # results are consumed, without reading ahead through all the records
+    return _results(pool, records, chunksize, 2 * n_workers)
@@ -1,9 +1,9 @@
 from abc import ABC
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from enum import Enum
-from typing import Any, List, Tuple, cast
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union, cast
 
-from ratus.token import Token, TokenLiteral, TokenType
+from ratus.token import Token, TokenLiteral, TokenStream, TokenType
 
 
 class ParserError(Exception):
@@ -11,47 +11,92 @@ class ParserError(Exception):
 
 
 class Expression(ABC):
-    """Base representation of an expression."""
+    """
+    Base representation of an expression.
+
+    Expressions are immutable and hashable, and have no per instance
+    ``__dict__``, which keeps large numbers of parsed expressions small in
+    memory. Structurally equal expressions compare and hash equal, so identical
+    subtrees can be shared between expressions (see `Interner`).
+    """
+
+    __slots__ = ()
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # Frozen dataclasses with slots can't be unpickled through __setstate__
+        # on all supported Python versions, so rebuild them with __init__. Every
+        # concrete expression is a dataclass, though the base class isn't
+        values = tuple(getattr(self, f.name) for f in fields(cast(Any, self)))
+        return (type(self), values)
 
 
 class Literal(Expression, ABC):
     """Literal value."""
 
+    __slots__ = ()
+
     value: Any
 
 
-@dataclass
+@dataclass(frozen=True)
 class Integer(Literal):
     """Integer literal."""
 
+    __slots__ = ("value",)
+
     value: int
 
 
-@dataclass
+@dataclass(frozen=True)
 class Float(Literal):
     """Float literal."""
 
+    __slots__ = ("value",)
+
     value: float
 
 
-@dataclass
+@dataclass(frozen=True)
 class String(Literal):
     """String literal."""
 
+    __slots__ = ("value",)
+
     value: str
 
 
-@dataclass
+@dataclass(frozen=True)
+class Variable(Expression):
+    """
+    Variable reference.
+
+    Variables have a `name` which is looked up in the context the expression is
+    evaluated with.
+    """
+
+    __slots__ = ("name",)
+
+    name: str
+
+
+@dataclass(frozen=True)
 class Function(Expression):
     """
     Function call.
 
     Functions have a `name` which is used to look them up in the executor and a
-    list of arguments that the function should be called with.
+    sequence of arguments that the function should be called with. The
+    arguments are stored as a tuple.
     """
 
+    __slots__ = ("name", "args")
+
     name: str
-    args: List[Expression]
+    args: Sequence[Expression]
+
+    def __post_init__(self) -> None:
+        if not isinstance(self.args, tuple):
+            object.__setattr__(self, "args", tuple(self.args))
 
 
 class BinaryOpType(Enum):
@@ -71,7 +116,7 @@ class BinaryOpType(Enum):
     OR = "or"
 
 
-@dataclass
+@dataclass(frozen=True)
 class BinaryOp(Expression, ABC):
     """
     Binary operation.
@@ -80,6 +125,8 @@ class BinaryOp(Expression, ABC):
     performed and left and right operands upon which the operation is performed.
     """
 
+    __slots__ = ("op_type", "left", "right")
+
     op_type: BinaryOpType
     left: Expression
     right: Expression
@@ -92,7 +139,7 @@ class UnaryOpType(Enum):
     NEGATIVE = "-"
 
 
-@dataclass
+@dataclass(frozen=True)
 class UnaryOp(Expression, ABC):
     """
     Unary operation.
@@ -101,167 +148,499 @@ class UnaryOp(Expression, ABC):
     performed.
     """
 
+    __slots__ = ("op_type", "operand")
+
     op_type: UnaryOpType
     operand: Expression
 
 
-def _parse(tokens: List[Token]) -> Expression:
-    expression, _ = _parse_expression(tokens)
+class Interner:
+    """
+    Table of unique expressions.
+
+    Interning an expression returns an equal expression in which every subtree
+    is the one object the table holds for that structure. Interning many
+    expressions with the same interner therefore stores each distinct subtree
+    only once, however many expressions it appears in.
+
+    The table keeps every expression interned in it alive until `clear` is
+    called. An interner can be shared between threads: nodes are added to the
+    table with a single `dict.setdefault`, so when two threads intern the same
+    structure at once both get back the node that was added first.
+    """
+
+    def __init__(self) -> None:
+        self._table: Dict[Tuple[Any, ...], Expression] = {}
+
+    def intern(self, expression: Expression) -> Expression:
+        """Return the interned equivalent of an expression."""
+        # Children are interned before their parents, so nodes can be identified
+        # by the identity of their children without hashing whole subtrees. The
+        # expression is walked with an explicit stack so expressions of any
+        # depth can be interned, each node being visited again once its
+        # children have been interned onto `interned`
+        interned: List[Expression] = []
+        stack: List[Tuple[Expression, bool]] = [(expression, False)]
+        while stack:
+            node, children_interned = stack.pop()
+            if not children_interned:
+                children: Sequence[Expression] = ()
+                if isinstance(node, BinaryOp):
+                    children = (node.left, node.right)
+                elif isinstance(node, UnaryOp):
+                    children = (node.operand,)
+                elif isinstance(node, Function):
+                    children = node.args
+                if children:
+                    stack.append((node, True))
+                    stack.extend((child, False) for child in reversed(children))
+                    continue
+            interned.append(self._intern_node(node, interned))
+        return interned[0]
+
+    def _intern_node(
+        self, expression: Expression, interned: List[Expression]
+    ) -> Expression:
+        """Intern a node whose interned children are at the end of `interned`."""
+        key: Tuple[Any, ...]
+        if isinstance(expression, BinaryOp):
+            right = interned.pop()
+            left = interned.pop()
+            key = (BinaryOp, expression.op_type, id(left), id(right))
+            if key not in self._table:
+                expression = BinaryOp(expression.op_type, left, right)
+        elif isinstance(expression, UnaryOp):
+            operand = interned.pop()
+            key = (UnaryOp, expression.op_type, id(operand))
+            if key not in self._table:
+                expression = UnaryOp(expression.op_type, operand)
+        elif isinstance(expression, Function):
+            first = len(interned) - len(expression.args)
+            args = tuple(interned[first:])
+            del interned[first:]
+            key = (Function, expression.name, tuple(id(arg) for arg in args))
+            if key not in self._table:
+                expression = Function(expression.name, args)
+        elif isinstance(expression, Variable):
+            key = (Variable, expression.name)
+        elif isinstance(expression, Literal):
+            # The type of the value is part of the key as 1, 1.0 and True are
+            # all equal, and floats are keyed by their repr to tell 0.0 and -0.0
+            # apart
+            value = expression.value
+            value_key = repr(value) if isinstance(value, float) else value
+            key = (type(expression), type(value), value_key)
+        else:
+            return expression
+        return self._table.setdefault(key, expression)
+
+    def clear(self) -> None:
+        """Remove all expressions from the table."""
+        self._table.clear()
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+
+_EXPRESSION_OPERATORS = {
+    TokenType.PLUS: BinaryOpType.ADDITION,
+    TokenType.MINUS: BinaryOpType.SUBTRACTION,
+    TokenType.GREATER: BinaryOpType.GREATER,
+    TokenType.GREATER_EQUAL: BinaryOpType.GREATER_EQUAL,
+    TokenType.LESS: BinaryOpType.LESS,
+    TokenType.LESS_EQUAL: BinaryOpType.LESS_EQUAL,
+    TokenType.EQUAL: BinaryOpType.EQUAL,
+    TokenType.BANG_EQUAL: BinaryOpType.NOT_EQUAL,
+}
+
+# The boolean operators bind loosest, ``or`` looser than ``and``, so that
+# comparisons can be combined without parentheses
+_CONJUNCTION_OPERATORS = {TokenType.AND: BinaryOpType.AND}
+
+_DISJUNCTION_OPERATORS = {TokenType.OR: BinaryOpType.OR}
+
+_TERM_OPERATORS = {
+    TokenType.STAR: BinaryOpType.MULTIPLICATION,
+    TokenType.SLASH: BinaryOpType.DIVISION,
+}
+
+_UNARY_OPERATORS = {
+    TokenType.MINUS: UnaryOpType.NEGATIVE,
+    TokenType.BANG: UnaryOpType.NOT,
+}
+
+# Tokens which end an expression without being part of it. They are left for
+# the enclosing grouping or function call to consume.
+_EXPRESSION_TERMINATORS = (TokenType.RIGHT_PAREN, TokenType.COMMA)
+
+
+class _Tokens:
+    """
+    Uniform view of a list or stream of tokens for the parsing functions.
+
+    The parser mostly needs the type of each token, so the types are collected
+    into a list up front and other token details are fetched on demand.
+    """
+
+    def __init__(self, tokens: Union[List[Token], TokenStream]) -> None:
+        self.tokens = tokens
+        self.types: List[TokenType]
+        self.literal: Callable[[int], Any]
+        if isinstance(tokens, TokenStream):
+            self.types = tokens.token_types()
+            self.literal = tokens.literal
+        else:
+            self.types = [token.token_type for token in tokens]
+            self.literal = lambda pos: cast(TokenLiteral, tokens[pos]).literal
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    def __getitem__(self, pos: int) -> Token:
+        return self.tokens[pos]
+
+
+# The parsing functions below all take the tokens and the position of the next
+# unconsumed token, and return the parsed expression along with the position
+# following it. Walking a single buffer like this keeps parsing linear in the
+# number of tokens, as no function ever copies it.
+
+
+def _parse(tokens: Union[List[Token], TokenStream]) -> Expression:
+    buffer = _Tokens(tokens)
+    expression, pos = _parse_expression(buffer, 0)
+    if pos < len(buffer):
+        raise ParserError(f"Unexpected token {buffer[pos]} after end of expression")
     return expression
 
 
-def _parse_expression(tokens: List[Token]) -> Tuple[Expression, List[Token]]:
-    if len(tokens) == 0:
+def _parse_expression(tokens: _Tokens, pos: int) -> Tuple[Expression, int]:
+    types = tokens.types
+    if pos >= len(types) or types[pos] in _EXPRESSION_TERMINATORS:
         raise ParserError("Expression cannot be empty")
-    if tokens[0].token_type is TokenType.STRING and isinstance(tokens[0], TokenLiteral):
-        return String(tokens[0].literal), tokens[1:]
-    if tokens[0].token_type is TokenType.IDENT and isinstance(tokens[0], TokenLiteral):
-        return _parse_function(tokens)
-    expr, rest = _parse_term(tokens)
-    while len(rest) > 0:
-        operator, *rest = rest
-        if operator.token_type not in (
-            TokenType.PLUS,
-            TokenType.MINUS,
-            TokenType.GREATER,
-            TokenType.GREATER_EQUAL,
-            TokenType.LESS,
-            TokenType.LESS_EQUAL,
-            TokenType.EQUAL,
-            TokenType.BANG_EQUAL,
-            TokenType.AND,
-            TokenType.OR,
+    expr, pos = _parse_conjunction(tokens, pos)
+    while pos < len(types):
+        operator_type = _DISJUNCTION_OPERATORS.get(types[pos])
+        if operator_type is None:
+            break
+        right_conjunction, pos = _parse_conjunction(tokens, pos + 1)
+        expr = BinaryOp(operator_type, expr, right_conjunction)
+    return expr, pos
+
+
+def _parse_conjunction(tokens: _Tokens, pos: int) -> Tuple[Expression, int]:
+    types = tokens.types
+    conjunction, pos = _parse_comparison(tokens, pos)
+    while pos < len(types):
+        operator_type = _CONJUNCTION_OPERATORS.get(types[pos])
+        if operator_type is None:
+            break
+        right_comparison, pos = _parse_comparison(tokens, pos + 1)
+        conjunction = BinaryOp(operator_type, conjunction, right_comparison)
+    return conjunction, pos
+
+
+def _parse_comparison(tokens: _Tokens, pos: int) -> Tuple[Expression, int]:
+    # Addition and subtraction share this level with the comparisons
+    types = tokens.types
+    expr, pos = _parse_term(tokens, pos)
+    while pos < len(types):
+        token_type = types[pos]
+        if (
+            token_type in _EXPRESSION_TERMINATORS
+            or token_type in _CONJUNCTION_OPERATORS
+            or token_type in _DISJUNCTION_OPERATORS
         ):
+            break
+        operator_type = _EXPRESSION_OPERATORS.get(token_type)
+        if operator_type is None:
             raise ParserError(
                 f"Unexpected token after term {expr}. Expected operator '+', "
                 "'-', '>', '>=', '<', '<=', '=', '!=', 'and', 'or'."
             )
-        right_term, rest = _parse_term(rest)
-        operator_type_mapping = {
-            TokenType.PLUS: BinaryOpType.ADDITION,
-            TokenType.MINUS: BinaryOpType.SUBTRACTION,
-            TokenType.GREATER: BinaryOpType.GREATER,
-            TokenType.GREATER_EQUAL: BinaryOpType.GREATER_EQUAL,
-            TokenType.LESS: BinaryOpType.LESS,
-            TokenType.LESS_EQUAL: BinaryOpType.LESS_EQUAL,
-            TokenType.EQUAL: BinaryOpType.EQUAL,
-            TokenType.BANG_EQUAL: BinaryOpType.NOT_EQUAL,
-            TokenType.AND: BinaryOpType.AND,
-            TokenType.OR: BinaryOpType.OR,
-        }
-        operator_type = operator_type_mapping[operator.token_type]
+        right_term, pos = _parse_term(tokens, pos + 1)
         expr = BinaryOp(operator_type, expr, right_term)
-    return expr, []
-
-
-def _parse_function(tokens: List[Token]) -> Tuple[Expression, List[Token]]:
-    if len(tokens) < 3:
-        raise ParserError(f"Tokens {tokens} do not form a valid function call")
-    if tokens[1].token_type is not TokenType.LEFT_PAREN:
-        raise ParserError(
-            f"Expected left paren ('(') following call to function '{tokens[0].lexeme}'. Found '{tokens[1].lexeme}'"
-        )
-    nesting = 0
-    end_of_function_call_idx = 0
-    for i, token in enumerate(tokens):
-        if token.token_type is TokenType.LEFT_PAREN:
-            nesting += 1
-        elif token.token_type is TokenType.RIGHT_PAREN:
-            nesting -= 1
-            if nesting == 0:
-                end_of_function_call_idx = i
-                break
-    else:
-        raise ParserError(
-            f"Unbalanced parentheses in call to function '{tokens[0].lexeme}'"
-        )
-    func_token: TokenLiteral
-    func_token = cast(TokenLiteral, tokens[0])
-    name = func_token.literal
-    if len(tokens) == 3:
-        return Function(name, args=[]), tokens[end_of_function_call_idx + 1 :]
-    args_tokens, rest = _split_function_args(tokens[2:])
-    args = [_parse(arg_tokens) for arg_tokens in args_tokens]
-    return Function(name, args=args), rest
-
-
-def _parse_term(tokens: List[Token]) -> Tuple[Expression, List[Token]]:
-    term, rest = _parse_factor(tokens)
-    while len(rest) > 0:
-        operator, *rest = rest
-        if operator.token_type not in (TokenType.STAR, TokenType.SLASH):
-            return term, [operator] + rest
-
-        # Based on the condition we know the operator token is STAR or SLASH
-        right_factor, rest = _parse_factor(rest)
-        operator_type_mapping = {
-            TokenType.STAR: BinaryOpType.MULTIPLICATION,
-            TokenType.SLASH: BinaryOpType.DIVISION,
-        }
-        operator_type = operator_type_mapping[operator.token_type]
+    return expr, pos
+
+
+def _parse_term(tokens: _Tokens, pos: int) -> Tuple[Expression, int]:
+    types = tokens.types
+    term, pos = _parse_factor(tokens, pos)
+    while pos < len(types):
+        operator_type = _TERM_OPERATORS.get(types[pos])
+        if operator_type is None:
+            break
+        right_factor, pos = _parse_factor(tokens, pos + 1)
         term = BinaryOp(operator_type, term, right_factor)
+    return term, pos
+
+
+def _parse_factor(tokens: _Tokens, pos: int) -> Tuple[Expression, int]:
+    types = tokens.types
+    if pos >= len(types):
+        raise ParserError("Expected int or float token but none were found")
+    token_type = types[pos]
+    if token_type is TokenType.LEFT_PAREN:
+        expr, pos = _parse_expression(tokens, pos + 1)
+        if pos >= len(types) or types[pos] is not TokenType.RIGHT_PAREN:
+            raise ParserError("Grouped expression does not have closing paren (')')")
+        return expr, pos + 1
+    if token_type is TokenType.IDENT:
+        if pos + 1 < len(types) and types[pos + 1] is TokenType.LEFT_PAREN:
+            return _parse_function(tokens, pos)
+        return Variable(tokens.literal(pos)), pos + 1
+    if token_type is TokenType.STRING:
+        return String(tokens.literal(pos)), pos + 1
+    unary_op_type = _UNARY_OPERATORS.get(token_type)
+    if unary_op_type is not None:
+        operand, pos = _parse_factor(tokens, pos + 1)
+        return UnaryOp(unary_op_type, operand), pos
+    return _parse_number(tokens, pos)
+
+
+def _parse_number(tokens: _Tokens, pos: int) -> Tuple[Expression, int]:
+    token_type = tokens.types[pos]
+    if token_type is TokenType.INT:
+        return Integer(tokens.literal(pos)), pos + 1
+    if token_type is TokenType.FLOAT:
+        return Float(tokens.literal(pos)), pos + 1
+    raise ParserError(f"Unexpected token {tokens[pos]}. Expected an int or float")
+
+
+def _parse_function(tokens: _Tokens, pos: int) -> Tuple[Expression, int]:
+    types = tokens.types
+    if len(types) - pos < 3:
+        rest = [tokens[i] for i in range(pos, len(types))]
+        raise ParserError(f"Tokens {rest} do not form a valid function call")
+    name = tokens.literal(pos)
+    pos += 2
+    args: List[Expression] = []
+    if types[pos] is TokenType.RIGHT_PAREN:
+        return Function(name, args=args), pos + 1
+    while True:
+        arg, pos = _parse_expression(tokens, pos)
+        args.append(arg)
+        if pos >= len(types):
+            raise ParserError(f"Unbalanced parentheses in call to function '{name}'")
+        if types[pos] is TokenType.RIGHT_PAREN:
+            return Function(name, args=args), pos + 1
+        # _parse_expression only stops early on a terminator, so this is a comma
+        pos += 1
+
+
+# Entries of the operator stack of the iterative parser. Binary and unary
+# operators are reduced into expressions by precedence, groups and calls mark
+# where the expression inside parentheses starts.
+_BINARY = 0
+_UNARY = 1
+_GROUP = 2
+_CALL = 3
+
+_DISJUNCTION_PRECEDENCE = 1
+_CONJUNCTION_PRECEDENCE = 2
+_EXPRESSION_PRECEDENCE = 3
+_TERM_PRECEDENCE = 4
+
+# Binary operators by token type, with their precedence
+_BINARY_OPERATORS: Dict[TokenType, Tuple[BinaryOpType, int]] = {
+    token_type: (op_type, precedence)
+    for operators, precedence in (
+        (_DISJUNCTION_OPERATORS, _DISJUNCTION_PRECEDENCE),
+        (_CONJUNCTION_OPERATORS, _CONJUNCTION_PRECEDENCE),
+        (_EXPRESSION_OPERATORS, _EXPRESSION_PRECEDENCE),
+        (_TERM_OPERATORS, _TERM_PRECEDENCE),
+    )
+    for token_type, op_type in operators.items()
+}
+
+
+def _reduce_one(operators: List[Tuple[Any, ...]], operands: List[Expression]) -> None:
+    """Reduce the operator on top of the stack into the operands."""
+    entry = operators.pop()
+    if entry[0] == _BINARY:
+        right = operands.pop()
+        operands[-1] = BinaryOp(entry[1], operands[-1], right)
+    else:
+        operands[-1] = UnaryOp(entry[1], operands[-1])
+
+
+def _reduce_binding(
+    operators: List[Tuple[Any, ...]], operands: List[Expression], precedence: int
+) -> None:
+    """Reduce the operators binding at least as tightly as `precedence`."""
+    # All operators are left associative and unary operators bind tightest
+    while operators and (
+        operators[-1][0] == _UNARY
+        or (operators[-1][0] == _BINARY and operators[-1][2] >= precedence)
+    ):
+        _reduce_one(operators, operands)
+
+
+def _reduce(operators: List[Tuple[Any, ...]], operands: List[Expression]) -> None:
+    """Reduce operators into operands until a group or call is reached."""
+    while operators and operators[-1][0] in (_BINARY, _UNARY):
+        _reduce_one(operators, operands)
 
-    return term, rest
-
-
-def _parse_factor(tokens: List[Token]) -> Tuple[Expression, List[Token]]:
-    if tokens[0].token_type is TokenType.LEFT_PAREN:
-        expr_end_index = 0
-        nesting = 0
-        for i, token in enumerate(tokens):
-            if token.token_type is TokenType.LEFT_PAREN:
-                nesting += 1
-            elif token.token_type is TokenType.RIGHT_PAREN:
-                nesting -= 1
-                if nesting == 0:
-                    expr_end_index = i
-                    break
-        expr_tokens = tokens[1:expr_end_index]
-        expr = _parse(expr_tokens)
-        return expr, tokens[expr_end_index + 1 :]
-    return _parse_number(tokens)
-
-
-def _parse_number(
-    tokens: List[Token], bang_allowed=True, minus_allowed=True
-) -> Tuple[Expression, List[Token]]:
-    if len(tokens) == 0:
-        raise ParserError(f"Expected int or float token but none were found")
-    if tokens[0].token_type is TokenType.INT and isinstance(tokens[0], TokenLiteral):
-        return Integer(tokens[0].literal), tokens[1:]
-    if tokens[0].token_type is TokenType.FLOAT and isinstance(tokens[0], TokenLiteral):
-        return Float(tokens[0].literal), tokens[1:]
-    if tokens[0].token_type is TokenType.MINUS and minus_allowed:
-        operand, rest = _parse_number(tokens[1:], bang_allowed=False)
-        return UnaryOp(UnaryOpType.NEGATIVE, operand), rest
-    if tokens[0].token_type is TokenType.BANG and bang_allowed:
-        operand, rest = _parse_number(tokens[1:], minus_allowed=False)
-        return UnaryOp(UnaryOpType.NOT, operand), rest
-    raise ParserError(f"Unexpected token {tokens[0]}. Expected an int or float")
-
-
-def _split_function_args(tokens: List[Token]) -> Tuple[List[List[Token]], List[Token]]:
-    nesting = 1
-    arg: List[Token] = []
-    function_args: List[List[Token]] = []
-    while len(tokens) > 0:
-        token = tokens.pop(0)
-        if token.token_type is TokenType.LEFT_PAREN:
-            nesting += 1
-        elif token.token_type is TokenType.RIGHT_PAREN:
-            nesting -= 1
-            if nesting == 0:
-                function_args.append(arg)
-                return function_args, tokens
-
-        if nesting == 1 and token.token_type is TokenType.COMMA:
-            function_args.append(arg)
-            arg = []
+
+def _parse_iterative(tokens: Union[List[Token], TokenStream]) -> Expression:
+    """
+    Parse tokens without recursion.
+
+    This is a shunting-yard parser which accepts the same language, and builds
+    the same expressions with the same errors, as the recursive descent
+    functions above. Instead of the call stack it keeps an operator stack with
+    entries marking open groups and function calls, so nesting depth is only
+    limited by memory.
+    """
+    buffer = _Tokens(tokens)
+    types = buffer.types
+    n_tokens = len(types)
+    operands: List[Expression] = []
+    operators: List[Tuple[Any, ...]] = []
+    expect_operand = True
+    # Whether the next operand starts an expression, rather than following an
+    # operator, which only changes the error raised if it is missing
+    expression_start = True
+    pos = 0
+    while pos < n_tokens:
+        token_type = types[pos]
+        if expect_operand:
+            if expression_start and token_type in _EXPRESSION_TERMINATORS:
+                raise ParserError("Expression cannot be empty")
+            expression_start = False
+            unary_op_type = _UNARY_OPERATORS.get(token_type)
+            if unary_op_type is not None:
+                operators.append((_UNARY, unary_op_type))
+            elif token_type is TokenType.LEFT_PAREN:
+                operators.append((_GROUP,))
+                expression_start = True
+            elif token_type is TokenType.IDENT and (
+                pos + 1 == n_tokens or types[pos + 1] is not TokenType.LEFT_PAREN
+            ):
+                operands.append(Variable(buffer.literal(pos)))
+                expect_operand = False
+            elif token_type is TokenType.IDENT:
+                name = buffer.literal(pos)
+                if n_tokens - pos < 3:
+                    rest = [buffer[i] for i in range(pos, n_tokens)]
+                    raise ParserError(
+                        f"Tokens {rest} do not form a valid function call"
+                    )
+                pos += 1
+                if types[pos + 1] is TokenType.RIGHT_PAREN:
+                    operands.append(Function(name, args=[]))
+                    expect_operand = False
+                    pos += 1
+                else:
+                    operators.append((_CALL, name, len(operands)))
+                    expression_start = True
+            elif token_type is TokenType.STRING:
+                operands.append(String(buffer.literal(pos)))
+                expect_operand = False
+            elif token_type is TokenType.INT:
+                operands.append(Integer(buffer.literal(pos)))
+                expect_operand = False
+            elif token_type is TokenType.FLOAT:
+                operands.append(Float(buffer.literal(pos)))
+                expect_operand = False
+            else:
+                raise ParserError(
+                    f"Unexpected token {buffer[pos]}. Expected an int or float"
+                )
+        elif token_type in _BINARY_OPERATORS:
+            op_type, precedence = _BINARY_OPERATORS[token_type]
+            _reduce_binding(operators, operands, precedence)
+            operators.append((_BINARY, op_type, precedence))
+            expect_operand = True
+        elif token_type in _EXPRESSION_TERMINATORS:
+            _reduce(operators, operands)
+            if not operators:
+                raise ParserError(
+                    f"Unexpected token {buffer[pos]} after end of expression"
+                )
+            marker = operators[-1]
+            if marker[0] == _GROUP:
+                if token_type is not TokenType.RIGHT_PAREN:
+                    raise ParserError(
+                        "Grouped expression does not have closing paren (')')"
+                    )
+                operators.pop()
+            elif token_type is TokenType.RIGHT_PAREN:
+                operators.pop()
+                _, name, first_arg = marker
+                args = operands[first_arg:]
+                del operands[first_arg:]
+                operands.append(Function(name, args=args))
+            else:
+                expect_operand = True
+                expression_start = True
         else:
-            arg.append(token)
-    raise ParserError("Function call does not have closing paren (')')")
+            # Like the recursive descent parser, name the expression since the
+            # last ``and`` or ``or``
+            _reduce_binding(operators, operands, _EXPRESSION_PRECEDENCE)
+            raise ParserError(
+                f"Unexpected token after term {operands[-1]}. Expected operator "
+                "'+', '-', '>', '>=', '<', '<=', '=', '!=', 'and', 'or'."
+            )
+        pos += 1
+
+    if expect_operand:
+        if expression_start:
+            raise ParserError("Expression cannot be empty")
+        raise ParserError("Expected int or float token but none were found")
+    _reduce(operators, operands)
+    if operators:
+        marker = operators[-1]
+        if marker[0] == _GROUP:
+            raise ParserError("Grouped expression does not have closing paren (')')")
+        raise ParserError(f"Unbalanced parentheses in call to function '{marker[1]}'")
+    return operands[0]
 
 
 class Parser:
-    def parse(self, tokens: List[Token]):
-        return _parse(tokens)
+    """
+    Parser of token lists into expressions.
+
+    The parser keeps no state between calls to `parse`, so one parser can be
+    used by several threads at once.
+    """
+
+    def __init__(
+        self, engine: str = "descent", interner: Optional[Interner] = None
+    ) -> None:
+        """
+        Instantiate a Parser object.
+
+        `engine` selects the parsing engine. "descent" is a hand written
+        recursive descent parser, "iterative" is a shunting-yard parser which
+        accepts the same input but doesn't recurse, so it can parse expressions
+        nested to any depth, and "packrat" is a memoising PEG parser which
+        doesn't recurse either (see `ratus.packrat`). All produce the same
+        expressions for valid input but the packrat parser reports errors
+        differently.
+
+        If an `interner` is given, every parsed expression is interned in it so
+        that identical subtrees are shared between all the expressions parsed.
+        """
+        self._parse: Callable[[Union[List[Token], TokenStream]], Expression]
+        if engine == "descent":
+            self._parse = _parse
+        elif engine == "iterative":
+            self._parse = _parse_iterative
+        elif engine == "packrat":
+            # Imported here as the packrat engine builds on the AST defined in
+            # this module
+            from ratus.packrat import parse_packrat
+
+            self._parse = parse_packrat
+        else:
+            raise ValueError(f"Unknown parser engine '{engine}'")
+        self.engine = engine
+        self.interner = interner
+
+    def parse(self, tokens: Union[List[Token], TokenStream]) -> Expression:
+        """Parse a list or stream of tokens into an expression."""
+        expression = self._parse(tokens)
+        if self.interner is not None:
+            expression = self.interner.intern(expression)
+        return expression
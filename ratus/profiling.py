@@ -0,0 +1,334 @@
+"""
+Profiling of expression evaluation.
+
+A `ProfilingExecutor` times every operation and function call it executes or
+compiles and records them in a `Profiler`, aggregated over all evaluations:
+
+- per node, by the source of the subexpression, the number of calls and the
+  cumulative time, including the time spent in its arguments, and the self
+  time, excluding it,
+- per injected function, by name, the same over all its calls,
+- per stage of evaluating a source, the time spent tokenising, parsing and
+  optimising it, when profiling through `ratus.Evaluator`.
+
+The profiler renders a text report sorted by self time, and the self time of
+each call stack as collapsed stacks, the input format of flame graph tools.
+
+Literals and variables are not timed, their cost is part of the self time of
+the node using them. Profiling has its own overhead, so times are best compared
+to each other rather than to unprofiled runs. Nodes can only be timed in
+closures, so only expressions compiled with the closures backend are profiled,
+those compiled with the other backends run untimed. Async evaluation isn't
+profiled.
+
+Profiling is opt-in: an ordinary `ratus.execer.Executor` has no profiling code
+on its paths at all.
+"""
+import time
+from functools import partial
+from threading import Lock, local
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from ratus.cache import LRUCache
+from ratus.execer import ClosureCompiler, CompiledExpression, Executor, variable_slots
+from ratus.parse import (
+    BinaryOp,
+    BinaryOpType,
+    Expression,
+    Function,
+    Literal,
+    String,
+    UnaryOp,
+    UnaryOpType,
+    Variable,
+)
+
+# Nodes nested deeper than this in a label are elided
+_LABEL_DEPTH = 3
+
+_LABEL_LENGTH = 60
+
+
+class ProfileStats(NamedTuple):
+    """Aggregated timings of a node, function or stage, in seconds."""
+
+    calls: int
+    total_time: float
+    self_time: float
+
+
+def _source(expression: Expression, depth: int) -> str:
+    if isinstance(expression, String):
+        quote = "'" if "'" not in expression.value else '"'
+        return f"{quote}{expression.value}{quote}"
+    if isinstance(expression, Literal):
+        return repr(expression.value)
+    if isinstance(expression, Variable):
+        return expression.name
+    if depth == 0:
+        return "..."
+    if isinstance(expression, BinaryOp):
+        operands = []
+        for operand in (expression.left, expression.right):
+            text = _source(operand, depth - 1)
+            if isinstance(operand, BinaryOp):
+                text = f"({text})"
+            operands.append(text)
+        return f"{operands[0]} {expression.op_type.value} {operands[1]}"
+    if isinstance(expression, UnaryOp):
+        text = _source(expression.operand, depth - 1)
+        if isinstance(expression.operand, BinaryOp):
+            text = f"({text})"
+        return f"{expression.op_type.value}{text}"
+    if isinstance(expression, Function):
+        args = ", ".join(_source(arg, depth - 1) for arg in expression.args)
+        return f"{expression.name}({args})"
+    return repr(expression)
+
+
+def label(expression: Expression) -> str:
+    """
+    Return the label a node is profiled under.
+
+    This is its ratus source, with subexpressions nested too deeply replaced by
+    ``...`` and shortened to 60 characters.
+    """
+    text = _source(expression, _LABEL_DEPTH)
+    if len(text) > _LABEL_LENGTH:
+        text = text[: _LABEL_LENGTH - 3] + "..."
+    return text
+
+
+class _Totals:
+    """Mutable running totals of a node, function or stage."""
+
+    __slots__ = ("calls", "total_time", "self_time")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.total_time = 0.0
+        self.self_time = 0.0
+
+    def add(self, total_time: float, self_time: float) -> None:
+        self.calls += 1
+        self.total_time += total_time
+        self.self_time += self_time
+
+    def freeze(self) -> ProfileStats:
+        return ProfileStats(self.calls, self.total_time, self.self_time)
+
+
+class _Frame:
+    """Node being measured, with the time spent in the nodes it called."""
+
+    __slots__ = ("label", "child_time")
+
+    def __init__(self, label: str) -> None:
+        self.label = label
+        self.child_time = 0.0
+
+
+class Profiler:
+    """
+    Aggregator of the timings of evaluations.
+
+    A profiler can be shared by several threads, each thread's calls are nested
+    in their own stacks.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter) -> None:
+        self.clock = clock
+        self._lock = Lock()
+        self._local = local()
+        self._nodes: Dict[str, _Totals] = {}
+        self._functions: Dict[str, _Totals] = {}
+        self._stages: Dict[str, _Totals] = {}
+        self._stacks: Dict[Tuple[str, ...], float] = {}
+
+    def measure(
+        self, label: str, name: Optional[str], function: Callable[..., Any], *args: Any
+    ) -> Any:
+        """
+        Call a function with arguments, timing it as the node `label`.
+
+        `name` is the name of the injected function the node calls, if any.
+        Nodes measured during the call are its children.
+        """
+        frames: List[_Frame] = self._local.__dict__.setdefault("frames", [])
+        frame = _Frame(label)
+        frames.append(frame)
+        clock = self.clock
+        start = clock()
+        try:
+            return function(*args)
+        finally:
+            elapsed = clock() - start
+            frames.pop()
+            if frames:
+                frames[-1].child_time += elapsed
+            stack = tuple(outer.label for outer in frames) + (label,)
+            self_time = elapsed - frame.child_time
+            with self._lock:
+                _totals(self._nodes, label).add(elapsed, self_time)
+                if name is not None:
+                    _totals(self._functions, name).add(elapsed, self_time)
+                self._stacks[stack] = self._stacks.get(stack, 0.0) + self_time
+
+    def stage(self, name: str, function: Callable[..., Any], *args: Any) -> Any:
+        """Call a function with arguments, timing it as the stage `name`."""
+        start = self.clock()
+        try:
+            return function(*args)
+        finally:
+            self.add_stage(name, self.clock() - start)
+
+    def add_stage(self, name: str, elapsed: float) -> None:
+        """Record a call of the stage `name` which took `elapsed` seconds."""
+        with self._lock:
+            _totals(self._stages, name).add(elapsed, elapsed)
+
+    def node_stats(self) -> Dict[str, ProfileStats]:
+        """Return the timings of each node, by label."""
+        with self._lock:
+            return {key: totals.freeze() for key, totals in self._nodes.items()}
+
+    def function_stats(self) -> Dict[str, ProfileStats]:
+        """Return the timings of each injected function, by name."""
+        with self._lock:
+            return {key: totals.freeze() for key, totals in self._functions.items()}
+
+    def stage_stats(self) -> Dict[str, ProfileStats]:
+        """Return the timings of each stage, by name."""
+        with self._lock:
+            return {key: totals.freeze() for key, totals in self._stages.items()}
+
+    def reset(self) -> None:
+        """Discard all the timings."""
+        with self._lock:
+            self._nodes.clear()
+            self._functions.clear()
+            self._stages.clear()
+            self._stacks.clear()
+
+    def report(self, limit: Optional[int] = 20) -> str:
+        """
+        Return a text report of the timings.
+
+        Stages, functions and nodes are listed in tables sorted by self time,
+        with at most `limit` rows per table.
+        """
+        sections = (
+            ("stage", self.stage_stats()),
+            ("function", self.function_stats()),
+            ("node", self.node_stats()),
+        )
+        lines: List[str] = []
+        for title, stats in sections:
+            if not stats:
+                continue
+            if lines:
+                lines.append("")
+            lines.append(f"{'calls':>9} {'total s':>10} {'self s':>10}  {title}")
+            rows = sorted(stats.items(), key=lambda item: item[1].self_time)
+            rows.reverse()
+            for key, row in rows[:limit]:
+                lines.append(
+                    f"{row.calls:>9} {row.total_time:>10.6f} {row.self_time:>10.6f}"
+                    f"  {key}"
+                )
+        return "\n".join(lines)
+
+    def collapsed_stacks(self) -> str:
+        """
+        Return the self time of each call stack as collapsed stacks.
+
+        Each line is a stack of node labels from the outermost, separated by
+        semicolons, followed by its self time in microseconds. This is the
+        format flame graph tools such as ``flamegraph.pl`` and speedscope read.
+        """
+        with self._lock:
+            stacks = list(self._stacks.items())
+        lines = []
+        for stack, self_time in stacks:
+            frames = ";".join(frame.replace(";", ",") for frame in stack)
+            lines.append(f"{frames} {round(self_time * 1e6)}")
+        return "\n".join(lines)
+
+
+def _totals(table: Dict[str, _Totals], key: str) -> _Totals:
+    totals = table.get(key)
+    if totals is None:
+        totals = table[key] = _Totals()
+    return totals
+
+
+class _ProfilingCompiler(ClosureCompiler):
+    """Compiler of expressions into closures which time themselves."""
+
+    def __init__(self, executor: "ProfilingExecutor", slots: Dict[str, int]) -> None:
+        super().__init__(executor, slots)
+        self.profiler = executor.profiler
+
+    def compile(self, expression: Expression) -> Callable[[Sequence[Any]], Any]:
+        compiled = super().compile(expression)
+        if isinstance(expression, (Literal, Variable)):
+            return compiled
+        name = expression.name if isinstance(expression, Function) else None
+        return partial(self.profiler.measure, label(expression), name, compiled)
+
+
+class ProfilingExecutor(Executor):
+    """
+    Executor which records the timings of what it executes in a profiler.
+
+    It takes the same arguments as `ratus.execer.Executor`, along with the
+    `profiler` to record timings in, a new one by default.
+    """
+
+    def __init__(
+        self,
+        functions: Optional[Dict[str, Callable[..., Any]]] = None,
+        binary_ops: Optional[Dict[BinaryOpType, Callable[[Any, Any], Any]]] = None,
+        unary_ops: Optional[Dict[UnaryOpType, Callable[[Any], Any]]] = None,
+        profiler: Optional[Profiler] = None,
+    ) -> None:
+        super().__init__(functions, binary_ops, unary_ops)
+        self.profiler = profiler if profiler is not None else Profiler()
+        # Labels by node identity, holding on to the node so its id isn't
+        # reused while the label is cached
+        self._labels: LRUCache[int, Tuple[Expression, str]] = LRUCache(4096)
+
+    def execute(
+        self, expression: Expression, context: Optional[Mapping[str, Any]] = None
+    ) -> Any:
+        if isinstance(expression, (Literal, Variable)):
+            return super().execute(expression, context)
+        cached = self._labels.get(id(expression))
+        if cached is not None and cached[0] is expression:
+            node_label = cached[1]
+        else:
+            node_label = label(expression)
+            self._labels.put(id(expression), (expression, node_label))
+        name = expression.name if isinstance(expression, Function) else None
+        return self.profiler.measure(
+            node_label, name, super().execute, expression, context
+        )
+
+    def compile(
+        self, expression: Expression, backend: str = "closures"
+    ) -> CompiledExpression:
+        if backend != "closures":
+            return super().compile(expression, backend)
+        slots = variable_slots(expression)
+        compiled = _ProfilingCompiler(self, slots).compile(expression)
+        return CompiledExpression(compiled, slots)
@@ -0,0 +1,375 @@
+"""
+Rule sets with common subexpressions evaluated once.
+
+A rule set compiles many expressions, its rules, together. The rules are
+interned into one directed acyclic graph (see `ratus.parse.Interner`), so every
+structurally equal subexpression, whether repeated within a rule or across
+rules, is a single node. Nodes which are pure and referenced more than once are
+shared: when the rule set is evaluated for a context, the first use of a shared
+node evaluates it and later uses reuse its value.
+
+A node is pure if its operation is one of the default operations of the
+executor, or it calls the default ``if`` or a function marked with
+`ratus.execer.pure`, and all of its children are pure. Impure subexpressions are
+evaluated every time they are used, as they would be in separate rules.
+
+Shared nodes are evaluated on demand rather than up front, so lazy ``if``,
+``and`` and ``or`` still only evaluate what they need and an error guarded by
+one of them is not raised.
+
+A reactive rule set goes further and keeps the value of every pure node from one
+context to the next. When some variables of the context change, only the nodes
+which depend on them are evaluated again.
+"""
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+from ratus.execer import (
+    ClosureCompiler,
+    Executor,
+    ExecutorError,
+    PureFunction,
+    lazy_and,
+    lazy_if,
+    lazy_or,
+    lookup_callable,
+    variable_slots,
+)
+from ratus.optimise import PURE_OPS
+from ratus.parse import (
+    BinaryOp,
+    Expression,
+    Function,
+    Interner,
+    Literal,
+    UnaryOp,
+    Variable,
+)
+
+# Value of a shared node which hasn't been evaluated for the current context
+_UNSET = object()
+
+
+def children(expression: Expression) -> Sequence[Expression]:
+    """Return the direct subexpressions of an expression."""
+    if isinstance(expression, BinaryOp):
+        return (expression.left, expression.right)
+    if isinstance(expression, UnaryOp):
+        return (expression.operand,)
+    if isinstance(expression, Function):
+        return expression.args
+    return ()
+
+
+def _is_pure_node(executor: Executor, expression: Expression) -> bool:
+    """Return whether the operation of a node, ignoring its children, is pure."""
+    if isinstance(expression, BinaryOp):
+        binary_op = executor.binary_ops[expression.op_type]
+        if binary_op is lazy_and or binary_op is lazy_or:
+            return True
+        return lookup_callable(PURE_OPS, binary_op) is not None
+    if isinstance(expression, UnaryOp):
+        unary_op = executor.unary_ops[expression.op_type]
+        return lookup_callable(PURE_OPS, unary_op) is not None
+    if isinstance(expression, Function):
+        function = executor.functions.get(expression.name)
+        return function is lazy_if or isinstance(function, PureFunction)
+    return True
+
+
+def _analyse(
+    executor: Executor, roots: Sequence[Expression]
+) -> Tuple[List[Expression], Dict[int, int], Dict[int, bool]]:
+    """
+    Find the distinct nodes of a graph, their references and which are pure.
+
+    The nodes are returned in post order, children before their parents, and
+    identified by their `id` in the other results, as the graph is interned.
+    """
+    nodes: List[Expression] = []
+    references: Dict[int, int] = {}
+    pure: Dict[int, bool] = {}
+    # Walked with an explicit stack, so graphs of any depth can be handled
+    stack: List[Tuple[Expression, bool]] = [(root, False) for root in roots]
+    while stack:
+        node, expanded = stack.pop()
+        key = id(node)
+        if expanded:
+            nodes.append(node)
+            pure[key] = _is_pure_node(executor, node) and all(
+                pure[id(child)] for child in children(node)
+            )
+            continue
+        references[key] = references.get(key, 0) + 1
+        if references[key] == 1:
+            stack.append((node, True))
+            stack.extend((child, False) for child in children(node))
+    return nodes, references, pure
+
+
+def _memoise(
+    function: Callable[[List[Any]], Any], index: int
+) -> Callable[[List[Any]], Any]:
+    """Cache the value of a compiled node in slot `index` of the values."""
+
+    def memoised(values: List[Any]) -> Any:
+        value = values[index]
+        if value is _UNSET:
+            value = values[index] = function(values)
+        return value
+
+    return memoised
+
+
+class _SharingCompiler(ClosureCompiler):
+    """Compiler of a graph which compiles each node once and memoises some."""
+
+    def __init__(
+        self,
+        executor: Executor,
+        slots: Dict[str, int],
+        memoised: Dict[int, int],
+        memoise: Callable[
+            [Callable[[List[Any]], Any], int], Callable[[List[Any]], Any]
+        ],
+    ) -> None:
+        super().__init__(executor, slots)
+        self.memoised = memoised
+        self.memoise = memoise
+        self.compiled: Dict[int, Callable[[Any], Any]] = {}
+
+    def compile(self, expression: Expression) -> Callable[[Any], Any]:
+        key = id(expression)
+        compiled = self.compiled.get(key)
+        if compiled is None:
+            compiled = super().compile(expression)
+            index = self.memoised.get(key)
+            if index is not None:
+                compiled = self.memoise(compiled, index)
+            self.compiled[key] = compiled
+        return compiled
+
+
+class RuleSet:
+    """
+    Named rules compiled together, sharing their common subexpressions.
+
+    `variables` lists the variables used by any rule, `distinct_nodes` is the
+    number of nodes in the graph of all the rules and `shared_nodes` the number
+    of them which are evaluated at most once per context.
+    """
+
+    def __init__(self, executor: Executor, rules: Mapping[str, Expression]) -> None:
+        """
+        Instantiate a RuleSet object.
+
+        `rules` maps the name of each rule to its parsed expression. The rules
+        are compiled with the operations and functions of `executor`.
+        """
+        interner = Interner()
+        self.executor = executor
+        self.rules = {name: interner.intern(rule) for name, rule in rules.items()}
+        roots = list(self.rules.values())
+        nodes, references, pure = _analyse(executor, roots)
+
+        slots: Dict[str, int] = {}
+        for root in roots:
+            for name in variable_slots(root):
+                slots.setdefault(name, len(slots))
+        self.variables = tuple(slots)
+        self._slots = slots
+
+        # Memoised nodes are kept in the slots following the variables
+        self._memoised: Dict[int, int] = {}
+        for node in nodes:
+            key = id(node)
+            if self._memoises(node, references[key], pure[key]):
+                self._memoised[key] = len(slots) + len(self._memoised)
+        self._nodes = nodes
+        self.distinct_nodes = len(nodes)
+        self.shared_nodes = sum(references[key] > 1 for key in self._memoised)
+        self._unset = [_UNSET] * len(self._memoised)
+
+        compiler = _SharingCompiler(executor, slots, self._memoised, self._memoise)
+        self._compiled = [
+            (name, compiler.compile(rule)) for name, rule in self.rules.items()
+        ]
+
+    def _memoises(self, node: Expression, references: int, pure: bool) -> bool:
+        """Return whether a node's value is kept rather than evaluated per use."""
+        return references > 1 and pure and not isinstance(node, (Literal, Variable))
+
+    def _memoise(
+        self, function: Callable[[List[Any]], Any], index: int
+    ) -> Callable[[List[Any]], Any]:
+        return _memoise(function, index)
+
+    def evaluate(self, context: Optional[Mapping[str, Any]] = None) -> Dict[str, Any]:
+        """Evaluate every rule in a context, returning the results by name."""
+        if context is None:
+            context = {}
+        try:
+            values = [context[name] for name in self.variables]
+        except KeyError as error:
+            raise ExecutorError(f"Variable '{error.args[0]}' is not defined") from None
+        values.extend(self._unset)
+        return {name: rule(values) for name, rule in self._compiled}
+
+
+class UpdateInfo(NamedTuple):
+    """Statistics of a reactive rule set."""
+
+    updates: int
+    evaluated: int
+    skipped: int
+
+
+class ReactiveRuleSet(RuleSet):
+    """
+    Rule set which keeps its results, re-evaluating only what changes affect.
+
+    The value of every pure node is kept along with the names of the variables
+    and functions it depends on. `update` changes variables of the context and
+    evaluates again only the nodes which depend on them, or on pure functions
+    whose results expire, reusing the values of the others. Impure nodes are
+    evaluated whenever they are needed, as in a `RuleSet`.
+
+    `dependencies` maps the name of each rule to the names of the variables and
+    functions it depends on, and `results` holds the latest results.
+
+    A reactive rule set holds the state of its context, so unlike a `RuleSet`
+    it must not be updated by several threads at once.
+    """
+
+    def __init__(
+        self,
+        executor: Executor,
+        rules: Mapping[str, Expression],
+        context: Mapping[str, Any],
+    ) -> None:
+        """
+        Instantiate a ReactiveRuleSet object.
+
+        `rules` maps the name of each rule to its parsed expression, and the
+        rules are evaluated in `context` straight away.
+        """
+        self._evaluations = 0
+        super().__init__(executor, rules)
+
+        dependencies: Dict[int, FrozenSet[str]] = {}
+        for node in self._nodes:
+            names: Set[str] = set()
+            if isinstance(node, (Variable, Function)):
+                names.add(node.name)
+            for child in children(node):
+                names.update(dependencies[id(child)])
+            dependencies[id(node)] = frozenset(names)
+        self.dependencies = {
+            name: dependencies[id(rule)] for name, rule in self.rules.items()
+        }
+        self._dependents: Dict[str, List[int]] = {}
+        for key, index in self._memoised.items():
+            for name in dependencies[key]:
+                self._dependents.setdefault(name, []).append(index)
+        # Nodes calling pure functions whose results expire are evaluated again
+        # on every update, leaving it to the functions' caches to reuse their
+        # results until they expire
+        self._expiring: Set[int] = set()
+        for name, function in executor.functions.items():
+            if isinstance(function, PureFunction) and function.cache.ttl is not None:
+                self._expiring.update(self._dependents.get(name, ()))
+
+        self.context = dict(context)
+        try:
+            self._values = [self.context[name] for name in self.variables]
+        except KeyError as error:
+            raise ExecutorError(f"Variable '{error.args[0]}' is not defined") from None
+        self._values.extend(self._unset)
+        # Number of memoised nodes holding a value
+        self._kept = 0
+        self._updates = 0
+        self._evaluated = 0
+        self._skipped = 0
+        self.results = self._refresh()
+
+    def _memoises(self, node: Expression, references: int, pure: bool) -> bool:
+        return pure and not isinstance(node, (Literal, Variable))
+
+    def _memoise(
+        self, function: Callable[[List[Any]], Any], index: int
+    ) -> Callable[[List[Any]], Any]:
+        def memoised(values: List[Any]) -> Any:
+            value = values[index]
+            if value is _UNSET:
+                value = values[index] = function(values)
+                self._evaluations += 1
+            return value
+
+        return memoised
+
+    def update(
+        self, changes: Optional[Mapping[str, Any]] = None, functions: Iterable[str] = ()
+    ) -> Dict[str, Any]:
+        """
+        Change the context and re-evaluate the nodes affected.
+
+        `changes` maps variables to their new values. `functions` names injected
+        functions whose results may have changed, e.g. because a table they look
+        values up in was reloaded, and the cache of any pure one is cleared.
+        Nodes calling pure functions with a ``ttl`` are evaluated again on every
+        update, so their results expire as the functions' do. Returns the
+        results of all the rules.
+        """
+        values = self._values
+        invalidated = set(self._expiring)
+        if changes:
+            self.context.update(changes)
+            for name, value in changes.items():
+                slot = self._slots.get(name)
+                if slot is not None:
+                    values[slot] = value
+                invalidated.update(self._dependents.get(name, ()))
+        for name in functions:
+            function = self.executor.functions.get(name)
+            if isinstance(function, PureFunction):
+                function.cache.clear()
+            invalidated.update(self._dependents.get(name, ()))
+        for index in invalidated:
+            if values[index] is not _UNSET:
+                values[index] = _UNSET
+                self._kept -= 1
+        self._updates += 1
+        self._skipped += self._kept
+        self.results = self._refresh()
+        return self.results
+
+    def info(self) -> UpdateInfo:
+        """
+        Return the statistics of the updates.
+
+        `evaluated` counts the pure nodes evaluated, including when the rule set
+        was created, and `skipped` the pure nodes whose value was kept rather
+        than evaluated again, over all the updates.
+        """
+        return UpdateInfo(self._updates, self._evaluated, self._skipped)
+
+    def _refresh(self) -> Dict[str, Any]:
+        before = self._evaluations
+        try:
+            return {name: rule(self._values) for name, rule in self._compiled}
+        finally:
+            evaluated = self._evaluations - before
+            self._evaluated += evaluated
+            self._kept += evaluated
@@ -1,6 +1,8 @@
+import re
+from array import array
 from dataclasses import dataclass
 from enum import Enum
-from typing import Any, List
+from typing import Any, Iterator, List, Sequence, cast
 
 
 class TokeniserError(Exception):
@@ -52,115 +54,185 @@ class TokenLiteral(Token):
     literal: Any
 
 
+# Token types by the code they are stored as in a TokenStream
+_TOKEN_TYPES = list(TokenType)
+_TOKEN_TYPE_CODES = {token_type: code for code, token_type in enumerate(_TOKEN_TYPES)}
+
+
+class TokenStream(Sequence[Token]):
+    """
+    Compact representation of a list of tokens.
+
+    Rather than a token object per token, the stream stores the type of each
+    token as a byte in one array and the offsets of its lexeme in the source in
+    two more. Lexemes and literals are only sliced out of the source when they
+    are asked for. The stream can be indexed like a list of tokens, in which
+    case each token is materialised on access.
+    """
+
+    def __init__(self, source: str, types: array, starts: array, ends: array) -> None:
+        self.source = source
+        self.types = types
+        self.starts = starts
+        self.ends = ends
+
+    def token_type(self, index: int) -> TokenType:
+        """Return the type of the token at `index`."""
+        return _TOKEN_TYPES[self.types[index]]
+
+    def token_types(self) -> List[TokenType]:
+        """Return the types of all the tokens."""
+        token_types = _TOKEN_TYPES
+        return [token_types[code] for code in self.types]
+
+    def lexeme(self, index: int) -> str:
+        """Return the lexeme of the token at `index`."""
+        return self.source[self.starts[index] : self.ends[index]]
+
+    def literal(self, index: int) -> Any:
+        """Return the literal value of the token at `index`."""
+        token_type = _TOKEN_TYPES[self.types[index]]
+        lexeme = self.source[self.starts[index] : self.ends[index]]
+        if token_type is TokenType.INT:
+            return int(lexeme)
+        if token_type is TokenType.FLOAT:
+            return float(lexeme)
+        if token_type is TokenType.STRING:
+            return lexeme[1:-1]
+        if token_type is TokenType.IDENT:
+            return lexeme
+        raise TypeError(f"Token {self[index]} is not a literal")
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    def __getitem__(self, index: Any) -> Any:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        token_type = self.token_type(index)
+        if token_type in (
+            TokenType.INT,
+            TokenType.FLOAT,
+            TokenType.STRING,
+            TokenType.IDENT,
+        ):
+            return TokenLiteral(token_type, self.lexeme(index), self.literal(index))
+        return Token(token_type, self.lexeme(index))
+
+    def __iter__(self) -> Iterator[Token]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def __repr__(self) -> str:
+        return f"TokenStream({list(self)!r})"
+
+
+# Master pattern matching a whole lexeme at a time, along with any whitespace in
+# front of it. The alternatives are tried in order, so longer operators come
+# before their prefixes and the error cases come after the lexemes they are
+# malformed versions of. Whitespace is only matched on its own at the end of
+# the source.
+_TOKEN_PATTERN = re.compile(
+    r"""
+    \s*(?:
+    (?P<OPERATOR>!=|<=|>=|[(),+\-*/=!<>])
+    | (?P<INT>\d+(?![.\d]))
+    | (?P<IDENT>[^\W\d_]\w*)
+    | (?P<FLOAT>\d+\.\d+)
+    | (?P<STRING>"[^"]*"|'[^']*')
+    | (?P<UNTERMINATED_STRING>["'])
+    | (?P<UNFINISHED_FLOAT>\d+\.)
+    | (?P<WHITESPACE>\s+)
+    | (?P<UNEXPECTED>.)
+    )
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+# Looking token types up in a dictionary is much faster than through the enum
+_OPERATORS = {
+    token_type.value: token_type
+    for token_type in TokenType
+    if not token_type.value.isalpha()
+}
+
+_KEYWORDS = {"and": TokenType.AND, "or": TokenType.OR}
+
+_OPERATOR_CODES = {
+    lexeme: _TOKEN_TYPE_CODES[token_type] for lexeme, token_type in _OPERATORS.items()
+}
+_KEYWORD_CODES = {
+    lexeme: _TOKEN_TYPE_CODES[token_type] for lexeme, token_type in _KEYWORDS.items()
+}
+_LITERAL_CODES = {
+    kind: _TOKEN_TYPE_CODES[TokenType[kind]]
+    for kind in ("INT", "FLOAT", "STRING", "IDENT")
+}
+
+
 class Tokeniser:
-    def __init__(self):
-        self.start: int = 0
-        self.current: int = 0
-        self.source: str = ""
-        self.tokens: List[Token] = []
+    """
+    Tokeniser of ratus expressions.
+
+    The tokeniser keeps no state between calls to `tokenise`, each call returns
+    a new list of tokens, so one tokeniser can be used by several threads at
+    once.
+    """
 
     def tokenise(self, source: str) -> List[Token]:
         """Tokenise an input in a list of tokens."""
-        self.source = source
-        self.current = 0
-        self.start = 0
-        while self.current < len(self.source):
-            self.start = self.current
-            self.scan_token()
-        return self.tokens
-
-    def scan_token(self):
-        c = self.source[self.current]
-        self.current += 1
-        if c.strip() == "":
-            # Skip whitespace
-            return
-        if c in ("(", ")", ",", "+", "-", "*", "=", "/"):
-            # Match characters that are unambiguously only single characters
-            self.add_token(TokenType(c))
-        elif c == "!":
-            if self.source[self.current] == "=":
-                self.add_token(TokenType.BANG_EQUAL)
-                self.current += 1
-            else:
-                self.add_token(TokenType.BANG)
-        elif c == "<":
-            if self.source[self.current] == "=":
-                self.current += 1
-                self.add_token(TokenType.LESS_EQUAL)
+        tokens: List[Token] = []
+        append = tokens.append
+        for match in _TOKEN_PATTERN.finditer(source):
+            kind = cast(str, match.lastgroup)
+            lexeme = match.group(kind)
+            if kind == "OPERATOR":
+                append(Token(_OPERATORS[lexeme], lexeme))
+            elif kind == "INT":
+                append(TokenLiteral(TokenType.INT, lexeme, int(lexeme)))
+            elif kind == "IDENT":
+                keyword = _KEYWORDS.get(lexeme)
+                if keyword is not None:
+                    append(Token(keyword, lexeme))
+                else:
+                    append(TokenLiteral(TokenType.IDENT, lexeme, lexeme))
+            elif kind == "FLOAT":
+                append(TokenLiteral(TokenType.FLOAT, lexeme, float(lexeme)))
+            elif kind == "STRING":
+                append(TokenLiteral(TokenType.STRING, lexeme, lexeme[1:-1]))
+            elif kind != "WHITESPACE":
+                raise _error(kind, source, match.end())
+        return tokens
+
+    def tokenise_compact(self, source: str) -> TokenStream:
+        """Tokenise an input into a compact stream of tokens."""
+        types = array("B")
+        starts = array("I")
+        ends = array("I")
+        ident = _LITERAL_CODES["IDENT"]
+        for match in _TOKEN_PATTERN.finditer(source):
+            kind = cast(str, match.lastgroup)
+            if kind == "OPERATOR":
+                code = _OPERATOR_CODES[match.group(kind)]
+            elif kind == "IDENT":
+                code = _KEYWORD_CODES.get(match.group(kind), ident)
+            elif kind in _LITERAL_CODES:
+                code = _LITERAL_CODES[kind]
+            elif kind == "WHITESPACE":
+                continue
             else:
-                self.add_token(TokenType.LESS)
-        elif c == ">":
-            if self.source[self.current] == "=":
-                self.current += 1
-                self.add_token(TokenType.GREATER_EQUAL)
-            else:
-                self.add_token(TokenType.GREATER)
-        elif c in ("'", '"'):
-            self.string()
-        elif c.isdigit():
-            self.numeric()
-        elif c.isalpha():
-            self.identifier()
-        else:
-            raise TokeniserError(f"Unexpected character: '{c}'")
-
-    def add_token(self, token_type: TokenType):
-        lexeme = self.source[self.start : self.current]
-        token = Token(token_type, lexeme)
-        self.tokens.append(token)
-
-    def string(self):
-        while self.current < len(self.source) and self.source[self.current] not in (
-            "'",
-            '"',
-        ):
-            self.current += 1
-        if self.current >= len(self.source):
-            raise TokeniserError("Unterminated string")
-        self.current += 1  # Consume closing quote
-        lexeme = self.source[self.start : self.current]
-        string = self.source[self.start + 1 : self.current - 1]
-        token = TokenLiteral(TokenType.STRING, lexeme, string)
-        self.tokens.append(token)
-
-    def numeric(self):
-        while self.current < len(self.source) and self.source[self.current].isdigit():
-            self.current += 1
-
-        # Invalid to finish expression with "."
-        if self.current == len(self.source) - 1 and self.source[self.current] == ".":
-            raise TokeniserError("Expression cannot finish with '.'")
-
-        if self.current < len(self.source) and self.source[self.current] == ".":
-            # Consume the "." so we can start consuming digits again
-            self.current += 1
-            if not self.source[self.current].isdigit():
-                raise TokeniserError(
-                    f"Expected digit after '.', found '{self.source[self.current]}'"
-                )
-
-            # Match a float
-            while (
-                self.current < len(self.source) and self.source[self.current].isdigit()
-            ):
-                self.current += 1
-            float_ = self.source[self.start : self.current]
-            token = TokenLiteral(TokenType.FLOAT, float_, float(float_))
-            self.tokens.append(token)
-        else:
-            int_ = self.source[self.start : self.current]
-            token = TokenLiteral(TokenType.INT, int_, int(int_))
-            self.tokens.append(token)
-
-    def identifier(self):
-        #  Identifiers can be made up of letters, numbers and '_'
-        while self.current < len(self.source) and (
-            self.source[self.current].isalpha()
-            or self.source[self.current].isdigit()
-            or self.source[self.current] == "_"
-        ):
-            self.current += 1
-        ident = self.source[self.start : self.current]
-        token = TokenLiteral(TokenType.IDENT, ident, ident)
-        self.tokens.append(token)
+                raise _error(kind, source, match.end())
+            types.append(code)
+            starts.append(match.start(kind))
+            ends.append(match.end(kind))
+        return TokenStream(source, types, starts, ends)
+
+
+def _error(kind: str, source: str, end: int) -> TokeniserError:
+    if kind == "UNTERMINATED_STRING":
+        return TokeniserError("Unterminated string")
+    if kind == "UNFINISHED_FLOAT":
+        if end == len(source):
+            return TokeniserError("Expression cannot finish with '.'")
+        return TokeniserError(f"Expected digit after '.', found '{source[end]}'")
+    return TokeniserError(f"Unexpected character: '{source[end - 1]}'")
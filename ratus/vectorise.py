@@ -0,0 +1,199 @@
+"""
+Vectorised evaluation with NumPy.
+
+An expression is evaluated once over whole columns of data, given as a mapping
+of variable names to one dimensional arrays of equal length, and evaluates to
+an array holding the result for each row.
+
+Operations which are still the defaults are applied to whole columns at once:
+
+- arithmetic and comparisons map to the equivalent ufuncs, e.g. ``+`` to
+  ``numpy.add`` and ``>=`` to ``numpy.greater_equal``,
+- ``!`` maps to ``numpy.logical_not``,
+- ``if``, ``and`` and ``or`` map to ``numpy.where``, with ``and`` and ``or``
+  selecting one of their operands for each row as they do row by row.
+
+Functions marked with `ratus.execer.vectorised` are called once with arrays.
+Any other function or operation falls back to being applied row by row, with
+the arguments it is given still evaluated over whole columns, and so does a
+ufunc which has no loop for the types of its operands, e.g. comparing strings
+with older versions of NumPy. Lazy functions and operations other than the
+defaults are executed row by row along with their arguments, so they still only
+evaluate the arguments they need.
+
+Unlike row by row execution, both branches of an ``if`` and both operands of
+``and`` and ``or`` are evaluated for every row, and NumPy's semantics apply to
+the operations, e.g. dividing by zero results in ``inf`` rather than raising.
+
+NumPy is an optional dependency, installed with the ``numpy`` extra.
+"""
+import operator
+from itertools import repeat
+from typing import Any, Callable, Dict, List, Mapping
+
+from ratus.execer import (
+    Executor,
+    ExecutorError,
+    LazyFunction,
+    VectorisedFunction,
+    lazy_and,
+    lazy_if,
+    lazy_or,
+    lookup_callable,
+)
+from ratus.parse import BinaryOp, Expression, Function, Literal, UnaryOp, Variable
+
+try:
+    import numpy as np
+except ImportError as error:
+    raise ImportError(
+        "Vectorised evaluation requires NumPy, install ratus with the numpy extra"
+    ) from error
+
+_UFUNCS: Dict[Callable[..., Any], Any] = {
+    operator.add: np.add,
+    operator.sub: np.subtract,
+    operator.mul: np.multiply,
+    operator.truediv: np.true_divide,
+    operator.gt: np.greater,
+    operator.ge: np.greater_equal,
+    operator.lt: np.less,
+    operator.le: np.less_equal,
+    operator.eq: np.equal,
+    operator.ne: np.not_equal,
+    operator.not_: np.logical_not,
+    operator.neg: np.negative,
+}
+
+
+def _to_array(values: List[Any]) -> "np.ndarray":
+    # NumPy would coerce values of mixed types to a common type, e.g. numbers to
+    # strings, so they are kept as objects instead
+    if len({type(value) for value in values}) > 1:
+        return np.array(values, dtype=object)
+    return np.array(values)
+
+
+def _truth(values: Any) -> "np.ndarray":
+    """Return the truth of each value as Python would evaluate it."""
+    array = np.asarray(values)
+    if array.dtype.kind in "biufc":
+        return array.astype(bool)
+    # Strings and objects, whose truth NumPy doesn't evaluate like Python does
+    truth = [bool(value) for value in array.ravel().tolist()]
+    return np.array(truth, dtype=bool).reshape(array.shape)
+
+
+def _select(condition: Any, if_true: Any, if_false: Any) -> "np.ndarray":
+    """Select values by row from two arrays, like ``numpy.where``."""
+    if_true = np.asarray(if_true)
+    if_false = np.asarray(if_false)
+    kinds = {if_true.dtype.kind, if_false.dtype.kind}
+    if len(kinds) > 1 and not kinds <= set("biuf"):
+        # As in _to_array, values of different types aren't coerced to a common
+        # type, so they are kept as objects
+        if_true = if_true.astype(object)
+        if_false = if_false.astype(object)
+    return np.where(_truth(condition), if_true, if_false)
+
+
+class _Vectoriser:
+    """Evaluator of an expression over columns."""
+
+    def __init__(
+        self, executor: Executor, columns: Mapping[str, Any], n_rows: int
+    ) -> None:
+        self.executor = executor
+        self.columns = columns
+        self.n_rows = n_rows
+
+    def evaluate(self, expression: Expression) -> Any:
+        """Evaluate an expression into an array, or a scalar for a constant."""
+        if isinstance(expression, Literal):
+            return expression.value
+        if isinstance(expression, Variable):
+            column = self.columns.get(expression.name)
+            if column is None:
+                raise ExecutorError(f"Variable '{expression.name}' is not defined")
+            return column
+        if isinstance(expression, BinaryOp):
+            binary_op = self.executor.binary_ops[expression.op_type]
+            if binary_op is lazy_and or binary_op is lazy_or:
+                left = self.evaluate(expression.left)
+                right = self.evaluate(expression.right)
+                if binary_op is lazy_and:
+                    return _select(left, right, left)
+                return _select(left, left, right)
+            ufunc = lookup_callable(_UFUNCS, binary_op)
+            if ufunc is None and isinstance(binary_op, LazyFunction):
+                return self.per_row(expression)
+            left = self.evaluate(expression.left)
+            right = self.evaluate(expression.right)
+            return self.apply(binary_op, ufunc, [left, right])
+        if isinstance(expression, UnaryOp):
+            unary_op = self.executor.unary_ops[expression.op_type]
+            operand = self.evaluate(expression.operand)
+            return self.apply(unary_op, lookup_callable(_UFUNCS, unary_op), [operand])
+        if isinstance(expression, Function):
+            function = self.executor.functions.get(expression.name)
+            if function is None:
+                raise ExecutorError(f"Function '{expression.name}' is not defined")
+            if function is lazy_if and len(expression.args) == 3:
+                condition, if_true, if_false = map(self.evaluate, expression.args)
+                return _select(condition, if_true, if_false)
+            if isinstance(function, LazyFunction):
+                return self.per_row(expression)
+            args = [self.evaluate(arg) for arg in expression.args]
+            if isinstance(function, VectorisedFunction):
+                return function.function(*args)
+            return self.apply(function, None, args)
+        raise ExecutorError(f"Cannot evaluate expression {expression}")
+
+    def apply(self, function: Callable[..., Any], ufunc: Any, args: List[Any]) -> Any:
+        """Apply a function to evaluated arguments, by ufunc if there is one."""
+        if ufunc is not None:
+            try:
+                return ufunc(*args)
+            except TypeError:
+                # No loop for the operand types, e.g. strings on old NumPy
+                pass
+        if not args:
+            return _to_array([function() for _ in range(self.n_rows)])
+        columns = [np.broadcast_to(arg, (self.n_rows,)).tolist() for arg in args]
+        return _to_array([function(*row) for row in zip(*columns)])
+
+    def per_row(self, expression: Expression) -> Any:
+        """Execute an expression row by row."""
+        compiled = self.executor.compile(expression)
+        columns = [
+            np.broadcast_to(self.evaluate(Variable(name)), (self.n_rows,)).tolist()
+            for name in compiled.variables
+        ]
+        rows = zip(*columns) if columns else repeat((), self.n_rows)
+        return _to_array([compiled.evaluate_slots(row) for row in rows])
+
+
+def execute_vectorised(
+    executor: Executor, expression: Expression, columns: Mapping[str, Any]
+) -> "np.ndarray":
+    """
+    Evaluate an expression over columns of data.
+
+    `columns` maps the names of the variables in the expression to one
+    dimensional arrays, or anything which can be converted to one, all of the
+    same length. The result is an array holding the value of the expression
+    for each row.
+    """
+    arrays = {name: np.asarray(column) for name, column in columns.items()}
+    if not arrays:
+        raise ExecutorError("Vectorised evaluation needs at least one column")
+    shapes = {array.shape for array in arrays.values()}
+    if len(shapes) > 1 or len(next(iter(shapes))) != 1:
+        raise ExecutorError(
+            "Columns must be one dimensional and all of the same length"
+        )
+    n_rows = len(next(iter(arrays.values())))
+    result = _Vectoriser(executor, arrays, n_rows).evaluate(expression)
+    if np.shape(result) != (n_rows,):
+        result = np.array(np.broadcast_to(result, (n_rows,)))
+    return result
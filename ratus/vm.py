@@ -0,0 +1,279 @@
+"""
+Stack based virtual machine.
+
+Expressions are compiled into a flat list of instructions which are run by a
+loop over an explicit value stack. Neither compiling nor running an expression
+recurses in Python, so expressions can be nested arbitrarily deeply.
+
+The instructions are
+
+``PUSH_CONST i``
+    Push constant ``i``.
+``LOAD_SLOT i``
+    Push the value of the variable in slot ``i``.
+``PUSH_THUNK i``
+    Push a thunk which runs the program in constant ``i`` with the values of
+    the variables the current program is run with.
+``BINARY_OP i``
+    Pop two values and push the result of calling constant ``i`` with them.
+``UNARY_OP i``
+    Pop a value and push the result of calling constant ``i`` with it.
+``CALL n``
+    Pop ``n`` arguments and then a function, and push the result of calling the
+    function with the arguments.
+``JUMP target``
+    Continue from instruction ``target``.
+``JUMP_IF_FALSE target``
+    Pop a value and continue from ``target`` if it is falsy.
+``JUMP_IF_FALSE_OR_POP target``
+    Continue from ``target`` leaving the top value on the stack if it is falsy,
+    otherwise pop it.
+``JUMP_IF_TRUE_OR_POP target``
+    Continue from ``target`` leaving the top value on the stack if it is
+    truthy, otherwise pop it.
+
+The default lazy ``if``, ``and`` and ``or`` are compiled into jumps. Other lazy
+functions are called with thunks which run the program compiled for each
+argument.
+"""
+from enum import IntEnum
+from functools import partial
+from typing import Any, Dict, Iterable, List, Sequence, Tuple, Union
+
+from ratus.execer import (
+    CompiledExpression,
+    Executor,
+    ExecutorError,
+    LazyFunction,
+    lazy_and,
+    lazy_if,
+    lazy_or,
+    variable_slots,
+)
+from ratus.parse import BinaryOp, Expression, Function, Literal, UnaryOp, Variable
+
+
+class Opcode(IntEnum):
+    """Instruction opcode."""
+
+    PUSH_CONST = 0
+    BINARY_OP = 1
+    UNARY_OP = 2
+    CALL = 3
+    JUMP = 4
+    JUMP_IF_FALSE = 5
+    JUMP_IF_FALSE_OR_POP = 6
+    JUMP_IF_TRUE_OR_POP = 7
+    LOAD_SLOT = 8
+    PUSH_THUNK = 9
+
+
+# Opcodes are compared as plain ints in the run loop, which is faster than
+# comparing enum members
+_PUSH_CONST = int(Opcode.PUSH_CONST)
+_BINARY_OP = int(Opcode.BINARY_OP)
+_UNARY_OP = int(Opcode.UNARY_OP)
+_CALL = int(Opcode.CALL)
+_JUMP = int(Opcode.JUMP)
+_JUMP_IF_FALSE = int(Opcode.JUMP_IF_FALSE)
+_JUMP_IF_FALSE_OR_POP = int(Opcode.JUMP_IF_FALSE_OR_POP)
+_JUMP_IF_TRUE_OR_POP = int(Opcode.JUMP_IF_TRUE_OR_POP)
+_LOAD_SLOT = int(Opcode.LOAD_SLOT)
+_PUSH_THUNK = int(Opcode.PUSH_THUNK)
+
+
+class Program(CompiledExpression):
+    """
+    Compiled expression.
+
+    A program is a list of opcodes, a parallel list of their arguments and the
+    constants the arguments refer to. Calling the program runs it and returns
+    the value of the expression.
+    """
+
+    def __init__(
+        self,
+        opcodes: List[int],
+        args: List[int],
+        constants: List[Any],
+        variables: Iterable[str] = (),
+    ) -> None:
+        super().__init__(partial(_run, opcodes, args, constants), variables)
+        self.opcodes = opcodes
+        self.args = args
+        self.constants = constants
+
+    def __len__(self) -> int:
+        return len(self.opcodes)
+
+    def disassemble(self) -> List[Tuple[Opcode, Any]]:
+        """
+        Return the instructions of the program.
+
+        The arguments of instructions that refer to constants are replaced by
+        the constants themselves.
+        """
+        instructions = []
+        for opcode, arg in zip(self.opcodes, self.args):
+            if opcode in (_PUSH_CONST, _PUSH_THUNK, _BINARY_OP, _UNARY_OP):
+                instructions.append((Opcode(opcode), self.constants[arg]))
+            else:
+                instructions.append((Opcode(opcode), arg))
+        return instructions
+
+
+def _run(
+    opcodes: List[int], args: List[int], constants: List[Any], slots: Sequence[Any]
+) -> Any:
+    stack: List[Any] = []
+    push = stack.append
+    pop = stack.pop
+    pc = 0
+    end = len(opcodes)
+    while pc < end:
+        opcode = opcodes[pc]
+        arg = args[pc]
+        pc += 1
+        if opcode == _PUSH_CONST:
+            push(constants[arg])
+        elif opcode == _LOAD_SLOT:
+            push(slots[arg])
+        elif opcode == _BINARY_OP:
+            right = pop()
+            stack[-1] = constants[arg](stack[-1], right)
+        elif opcode == _CALL:
+            if arg:
+                call_args = stack[-arg:]
+                del stack[-arg:]
+                stack[-1] = stack[-1](*call_args)
+            else:
+                stack[-1] = stack[-1]()
+        elif opcode == _UNARY_OP:
+            stack[-1] = constants[arg](stack[-1])
+        elif opcode == _JUMP_IF_FALSE:
+            if not pop():
+                pc = arg
+        elif opcode == _JUMP:
+            pc = arg
+        elif opcode == _JUMP_IF_FALSE_OR_POP:
+            if stack[-1]:
+                pop()
+            else:
+                pc = arg
+        elif opcode == _JUMP_IF_TRUE_OR_POP:
+            if stack[-1]:
+                pc = arg
+            else:
+                pop()
+        elif opcode == _PUSH_THUNK:
+            push(partial(constants[arg].function, slots))
+    return stack[-1]
+
+
+class _Label:
+    """Jump target whose address is filled in once it is reached."""
+
+    address = -1
+
+
+# Work items of the compiler: an expression to compile, an instruction to emit
+# or a label to place
+_Work = Union[Expression, Tuple[int, Any], _Label]
+
+
+class _Compiler:
+    """Compiler of an expression into a program."""
+
+    def __init__(self, executor: Executor, slots: Dict[str, int]) -> None:
+        self.executor = executor
+        self.slots = slots
+        self.opcodes: List[int] = []
+        self.args: List[Any] = []
+        self.constants: List[Any] = []
+        self.constant_indices: Dict[int, int] = {}
+
+    def constant(self, value: Any) -> int:
+        """Return the index of a constant, adding it if it is new."""
+        # Constants are deduplicated by identity, as values need not be
+        # hashable and equal values of different types must be kept apart
+        index = self.constant_indices.get(id(value))
+        if index is None:
+            index = len(self.constants)
+            self.constants.append(value)
+            self.constant_indices[id(value)] = index
+        return index
+
+    def compile(self, expression: Expression) -> Program:
+        work: List[_Work] = [expression]
+        while work:
+            item = work.pop()
+            if isinstance(item, _Label):
+                item.address = len(self.opcodes)
+            elif isinstance(item, tuple):
+                opcode, arg = item
+                self.opcodes.append(opcode)
+                self.args.append(arg)
+            else:
+                # Work is done last in first out, so it is pushed in reverse
+                work.extend(reversed(self.expand(item)))
+        args = [arg.address if isinstance(arg, _Label) else arg for arg in self.args]
+        return Program(self.opcodes, args, self.constants, self.slots)
+
+    def expand(self, expression: Expression) -> List[_Work]:
+        """Return the work needed to compile an expression."""
+        if isinstance(expression, Literal):
+            return [(_PUSH_CONST, self.constant(expression.value))]
+        if isinstance(expression, Variable):
+            return [(_LOAD_SLOT, self.slots[expression.name])]
+        if isinstance(expression, BinaryOp):
+            binary_op = self.executor.binary_ops[expression.op_type]
+            left, right = expression.left, expression.right
+            if binary_op is lazy_and or binary_op is lazy_or:
+                end = _Label()
+                jump = _JUMP_IF_FALSE_OR_POP
+                if binary_op is lazy_or:
+                    jump = _JUMP_IF_TRUE_OR_POP
+                return [left, (jump, end), right, end]
+            if isinstance(binary_op, LazyFunction):
+                return self.lazy_call(binary_op, [left, right])
+            return [left, right, (_BINARY_OP, self.constant(binary_op))]
+        if isinstance(expression, UnaryOp):
+            unary_op = self.executor.unary_ops[expression.op_type]
+            return [expression.operand, (_UNARY_OP, self.constant(unary_op))]
+        if isinstance(expression, Function):
+            function = self.executor.functions.get(expression.name)
+            if function is None:
+                raise ExecutorError(f"Function '{expression.name}' is not defined")
+            args = list(expression.args)
+            if function is lazy_if and len(args) == 3:
+                condition, if_true, if_false = args
+                otherwise, end = _Label(), _Label()
+                return [
+                    condition,
+                    (_JUMP_IF_FALSE, otherwise),
+                    if_true,
+                    (_JUMP, end),
+                    otherwise,
+                    if_false,
+                    end,
+                ]
+            if isinstance(function, LazyFunction):
+                return self.lazy_call(function, args)
+            work: List[_Work] = [(_PUSH_CONST, self.constant(function))]
+            work.extend(args)
+            work.append((_CALL, len(args)))
+            return work
+        raise ExecutorError(f"Cannot compile expression {expression}")
+
+    def lazy_call(self, function: LazyFunction, args: List[Expression]) -> List[_Work]:
+        work: List[_Work] = [(_PUSH_CONST, self.constant(function.function))]
+        for arg in args:
+            thunk = _Compiler(self.executor, self.slots).compile(arg)
+            work.append((_PUSH_THUNK, self.constant(thunk)))
+        work.append((_CALL, len(args)))
+        return work
+
+
+def compile_program(executor: Executor, expression: Expression) -> Program:
+    """Compile an expression into a program for the virtual machine."""
+    return _Compiler(executor, variable_slots(expression)).compile(expression)
@@ -0,0 +1,103 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from ratus.cache import CacheInfo, LRUCache
+
+
+def test_lru_cache_eviction():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert "b" not in cache
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.info() == CacheInfo(hits=3, misses=1, evictions=1, size=2, max_size=2)
+
+
+def test_lru_cache_default():
+    cache = LRUCache(1)
+    missing = object()
+    cache.put("a", None)
+    assert cache.get("a", missing) is None
+    assert cache.get("b", missing) is missing
+
+
+def test_lru_cache_clear():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.get("a")
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.info() == CacheInfo(hits=0, misses=0, evictions=0, size=0, max_size=2)
+
+
+def test_lru_cache_disabled():
+    cache = LRUCache(0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_lru_cache_negative_size():
+    with pytest.raises(ValueError, match="Cache size must not be negative, got -1"):
+        LRUCache(-1)
+
+
+def test_lru_cache_threads():
+    cache = LRUCache(64)
+
+    def worker(offset):
+        for i in range(1000):
+            key = (offset + i) % 100
+            if cache.get(key) is None:
+                cache.put(key, key)
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(worker, range(8)))
+    info = cache.info()
+    assert info.hits + info.misses == 8000
+    assert info.size == 64
+
+
+class FakeClock:
+    def __init__(self):
+        self.time = 0.0
+
+    def __call__(self):
+        return self.time
+
+
+def test_lru_cache_ttl():
+    clock = FakeClock()
+    cache = LRUCache(2, ttl=10, clock=clock)
+    cache.put("a", 1)
+    clock.time = 5
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    clock.time = 10
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    cache.put("a", 3)
+    clock.time = 19
+    assert cache.get("a") == 3
+    assert cache.info() == CacheInfo(
+        hits=3, misses=1, evictions=0, size=2, max_size=2, expirations=1
+    )
+
+
+def test_lru_cache_ttl_eviction():
+    cache = LRUCache(1, ttl=10, clock=FakeClock())
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert cache.info().evictions == 1
+
+
+def test_lru_cache_invalid_ttl():
+    with pytest.raises(ValueError, match="Cache TTL must be positive, got 0"):
+        LRUCache(ttl=0)
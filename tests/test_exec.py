@@ -1,9 +1,33 @@
+import asyncio
 import operator
+import pickle
+from array import array
+from functools import partial
 
 import pytest
 
-from ratus.execer import Executor
-from ratus.parse import BinaryOp, BinaryOpType, Function, Integer, UnaryOp, UnaryOpType
+from ratus.cache import CacheInfo
+from ratus.execer import (
+    Executor,
+    ExecutorError,
+    LazyFunction,
+    lazy,
+    pure,
+    variable_slots,
+    vectorised,
+)
+from ratus.parse import (
+    BinaryOp,
+    BinaryOpType,
+    Function,
+    Integer,
+    String,
+    UnaryOp,
+    UnaryOpType,
+    Variable,
+)
+
+BACKENDS = ("closures", "python", "vm")
 
 
 @pytest.mark.parametrize(
@@ -36,6 +60,8 @@ from ratus.parse import BinaryOp, BinaryOpType, Function, Integer, UnaryOp, Unar
 def test_execute(expression, expected):
     executor = Executor()
     assert executor.execute(expression) == expected
+    for backend in BACKENDS:
+        assert executor.compile(expression, backend)() == expected
 
 
 @pytest.mark.parametrize(
@@ -61,6 +87,8 @@ def test_execute(expression, expected):
 def test_override_binary_ops(expression, binary_op_overrides, expected):
     executor = Executor(binary_ops=binary_op_overrides)
     assert executor.execute(expression) == expected
+    for backend in BACKENDS:
+        assert executor.compile(expression, backend)() == expected
 
 
 @pytest.mark.parametrize(
@@ -72,8 +100,507 @@ def test_override_binary_ops(expression, binary_op_overrides, expected):
             {UnaryOpType.NEGATIVE: operator.not_},
             False,
         ),
+        (UnaryOp(UnaryOpType.NEGATIVE, Integer(-2)), {UnaryOpType.NEGATIVE: abs}, 2),
     ),
 )
 def test_override_unary_ops(expression, unary_op_overrides, expected):
     executor = Executor(unary_ops=unary_op_overrides)
     assert executor.execute(expression) == expected
+    for backend in BACKENDS:
+        assert executor.compile(expression, backend)() == expected
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("n_args", range(6))
+def test_compile_function_call(n_args, backend):
+    executor = Executor({"f": lambda *args: list(args)})
+    expression = Function("f", [Integer(i) for i in range(n_args)])
+    assert executor.compile(expression, backend)() == list(range(n_args))
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_compile_binds_functions(backend):
+    executor = Executor({"f": lambda: 1})
+    compiled = executor.compile(Function("f", []), backend)
+    executor.functions["f"] = lambda: 2
+    assert compiled() == 1
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_compile_undefined_function(backend):
+    executor = Executor()
+    with pytest.raises(ExecutorError, match="Function 'f' is not defined"):
+        executor.compile(Function("f", []), backend)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_compile_unknown_expression(backend):
+    with pytest.raises(ExecutorError, match="Cannot compile expression"):
+        Executor().compile(BinaryOp(BinaryOpType.ADDITION, Integer(1), None), backend)
+
+
+def test_compile_unknown_backend():
+    with pytest.raises(ValueError, match="Unknown compiler backend 'jit'"):
+        Executor().compile(Integer(1), "jit")
+
+
+def test_compile_python_sandboxed():
+    # Injected functions shadowing Python builtins must be the ones called
+    executor = Executor({"print": lambda x: x * 2, "len": lambda: 3})
+    expression = BinaryOp(
+        BinaryOpType.ADDITION,
+        Function("print", [Function("len", [])]),
+        UnaryOp(UnaryOpType.NEGATIVE, Integer(1)),
+    )
+    compiled = executor.compile(expression, "python")
+    assert compiled() == 5
+    assert compiled.function.__code__.co_names == ()
+
+
+def _boom():
+    raise AssertionError("evaluated a branch that should have been skipped")
+
+
+@pytest.mark.parametrize(
+    ("expression", "expected"),
+    (
+        pytest.param(
+            Function("if", [Integer(1), Integer(2), Function("boom", [])]),
+            2,
+            id="if-true",
+        ),
+        pytest.param(
+            Function("if", [Integer(0), Function("boom", []), Integer(3)]),
+            3,
+            id="if-false",
+        ),
+        pytest.param(
+            BinaryOp(BinaryOpType.AND, Integer(0), Function("boom", [])),
+            0,
+            id="and",
+        ),
+        pytest.param(
+            BinaryOp(BinaryOpType.OR, Integer(1), Function("boom", [])),
+            1,
+            id="or",
+        ),
+        pytest.param(
+            BinaryOp(BinaryOpType.AND, Integer(1), Integer(2)), 2, id="and-both"
+        ),
+        pytest.param(
+            BinaryOp(BinaryOpType.OR, Integer(0), Integer(2)), 2, id="or-both"
+        ),
+        pytest.param(
+            Function(
+                "coalesce",
+                [Function("none", []), Integer(1), Function("boom", [])],
+            ),
+            1,
+            id="injected-lazy-function",
+        ),
+    ),
+)
+def test_lazy_evaluation(expression, expected):
+    @lazy
+    def coalesce(*thunks):
+        for thunk in thunks:
+            value = thunk()
+            if value is not None:
+                return value
+        return None
+
+    executor = Executor({"boom": _boom, "none": lambda: None, "coalesce": coalesce})
+    assert executor.execute(expression) == expected
+    for backend in BACKENDS:
+        assert executor.compile(expression, backend)() == expected
+
+
+def test_lazy_binary_op_override():
+    executor = Executor(
+        {"boom": _boom},
+        binary_ops={BinaryOpType.ADDITION: lazy(lambda left, right: left())},
+    )
+    expression = BinaryOp(BinaryOpType.ADDITION, Integer(1), Function("boom", []))
+    assert executor.execute(expression) == 1
+    for backend in BACKENDS:
+        assert executor.compile(expression, backend)() == 1
+
+
+def test_eager_if_override():
+    calls = []
+    executor = Executor({"if": lambda c, s, f: s if c else f, "f": calls.append})
+    expression = Function("if", [Integer(1), Integer(2), Function("f", [Integer(3)])])
+    assert executor.execute(expression) == 2
+    assert calls == [3]
+
+
+def test_variable_slots():
+    expression = Function(
+        "f",
+        [
+            BinaryOp(BinaryOpType.ADDITION, Variable("b"), Variable("a")),
+            UnaryOp(UnaryOpType.NEGATIVE, Variable("b")),
+            Variable("c"),
+        ],
+    )
+    assert variable_slots(expression) == {"b": 0, "a": 1, "c": 2}
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_variables(backend):
+    @lazy
+    def first(*thunks):
+        return thunks[0]()
+
+    executor = Executor({"first": first})
+    # y * if(x > 1, x, y) + first(-x, y)
+    expression = BinaryOp(
+        BinaryOpType.ADDITION,
+        BinaryOp(
+            BinaryOpType.MULTIPLICATION,
+            Variable("y"),
+            Function(
+                "if",
+                [
+                    BinaryOp(BinaryOpType.GREATER, Variable("x"), Integer(1)),
+                    Variable("x"),
+                    Variable("y"),
+                ],
+            ),
+        ),
+        Function(
+            "first", [UnaryOp(UnaryOpType.NEGATIVE, Variable("x")), Variable("y")]
+        ),
+    )
+    compiled = executor.compile(expression, backend)
+    assert compiled.variables == ("y", "x")
+    for x, y in ((2, 3), (0, 5), (10, -1)):
+        expected = y * (x if x > 1 else y) - x
+        assert executor.execute(expression, {"x": x, "y": y}) == expected
+        assert compiled({"x": x, "y": y}) == expected
+        assert compiled.evaluate_slots((y, x)) == expected
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_undefined_variable(backend):
+    executor = Executor()
+    expression = BinaryOp(BinaryOpType.ADDITION, Variable("x"), Variable("y"))
+    with pytest.raises(ExecutorError, match="Variable 'y' is not defined"):
+        executor.execute(expression, {"x": 1})
+    compiled = executor.compile(expression, backend)
+    with pytest.raises(ExecutorError, match="Variable 'y' is not defined"):
+        compiled({"x": 1})
+    with pytest.raises(ExecutorError, match="Variable 'x' is not defined"):
+        compiled()
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_execute_columnar(backend):
+    executor = Executor()
+    # if(x > 1, x * y, 0)
+    expression = Function(
+        "if",
+        [
+            BinaryOp(BinaryOpType.GREATER, Variable("x"), Integer(1)),
+            BinaryOp(BinaryOpType.MULTIPLICATION, Variable("x"), Variable("y")),
+            Integer(0),
+        ],
+    )
+    columns = {
+        "x": array("q", [1, 2, 3]),
+        "y": array("d", [1.5, 2.0, 3.0]),
+        "unused": memoryview(b"abc"),
+    }
+    result = executor.execute_columnar(expression, columns, backend=backend)
+    assert result == array("d", [0.0, 4.0, 9.0])
+    out = array("q", [0]) * 3
+    squared = BinaryOp(BinaryOpType.MULTIPLICATION, Variable("x"), Variable("x"))
+    result = executor.execute_columnar(squared, columns, out, backend)
+    assert result is out
+    assert out == array("q", [1, 4, 9])
+
+
+def test_execute_columnar_constant():
+    executor = Executor()
+    result = executor.execute_columnar(Integer(2), {"x": array("d", [1.0, 2.0])})
+    assert result == array("d", [2.0, 2.0])
+
+
+@pytest.mark.parametrize(
+    ("expression", "columns", "out", "error_msg"),
+    (
+        pytest.param(
+            Variable("x"),
+            {"x": array("d", [1.0]), "y": array("d", [1.0, 2.0])},
+            None,
+            "Columns must be one dimensional and all of the same length",
+            id="different-lengths",
+        ),
+        pytest.param(
+            Variable("x"),
+            {},
+            None,
+            "Columnar execution needs at least one column",
+            id="no-columns",
+        ),
+        pytest.param(
+            Variable("z"),
+            {"x": array("d", [1.0])},
+            None,
+            "Variable 'z' is not defined",
+            id="undefined-variable",
+        ),
+        pytest.param(
+            Variable("x"),
+            {"x": array("d", [1.0])},
+            array("d"),
+            "Output has 0 elements, expected 1",
+            id="output-length",
+        ),
+        pytest.param(
+            Variable("x"),
+            {"x": array("d", [1.5])},
+            array("q", [0]),
+            "Cannot store 1.5 in an output of type 'q'",
+            id="output-type",
+        ),
+        pytest.param(
+            BinaryOp(
+                BinaryOpType.MULTIPLICATION, Variable("x"), Integer(1_000_000_000_000)
+            ),
+            {"x": array("q", [1_000_000_000])},
+            array("q", [0]),
+            "Cannot store 1000000000000000000000 in an output of type 'q'",
+            id="output-overflow",
+        ),
+    ),
+)
+def test_execute_columnar_error(expression, columns, out, error_msg):
+    with pytest.raises(ExecutorError, match=error_msg):
+        Executor().execute_columnar(expression, columns, out)
+
+
+class FakeService:
+    """Service whose lookups take `latency` seconds, tracking concurrency."""
+
+    def __init__(self, latency, values):
+        self.latency = latency
+        self.values = values
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def lookup(self, key):
+        self.calls.append(key)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.latency)
+        self.in_flight -= 1
+        return self.values[key]
+
+
+def _lookup(key):
+    return Function("lookup", [String(key)])
+
+
+def test_execute_async_concurrent():
+    service = FakeService(0.1, {"a": 1, "b": 2, "c": 3})
+    executor = Executor({"lookup": service.lookup, "max": max})
+    # max(lookup("a") + lookup("b") * 2, lookup("c"), x)
+    expression = Function(
+        "max",
+        [
+            BinaryOp(
+                BinaryOpType.ADDITION,
+                _lookup("a"),
+                BinaryOp(BinaryOpType.MULTIPLICATION, _lookup("b"), Integer(2)),
+            ),
+            _lookup("c"),
+            Variable("x"),
+        ],
+    )
+    assert asyncio.run(executor.execute_async(expression, {"x": 4})) == 5
+    assert sorted(service.calls) == ["a", "b", "c"]
+    # All the lookups were awaited at once rather than one after another
+    assert service.max_in_flight == 3
+
+
+@pytest.mark.parametrize(
+    ("expression", "expected", "calls"),
+    (
+        pytest.param(
+            Function("if", [_lookup("yes"), _lookup("a"), _lookup("b")]),
+            "a",
+            ["yes", "a"],
+            id="if-true",
+        ),
+        pytest.param(
+            Function("if", [_lookup("no"), _lookup("a"), _lookup("b")]),
+            "b",
+            ["no", "b"],
+            id="if-false",
+        ),
+        pytest.param(
+            BinaryOp(BinaryOpType.AND, _lookup("no"), _lookup("a")),
+            0,
+            ["no"],
+            id="and",
+        ),
+        pytest.param(
+            BinaryOp(BinaryOpType.OR, _lookup("yes"), _lookup("a")),
+            1,
+            ["yes"],
+            id="or",
+        ),
+        pytest.param(
+            Function("first", [_lookup("a"), _lookup("b")]),
+            "a",
+            ["a"],
+            id="injected-lazy-function",
+        ),
+    ),
+)
+def test_execute_async_lazy(expression, expected, calls):
+    @lazy
+    async def first(*thunks):
+        return await thunks[0]()
+
+    service = FakeService(0.01, {"yes": 1, "no": 0, "a": "a", "b": "b"})
+    executor = Executor({"lookup": service.lookup, "first": first})
+    assert asyncio.run(executor.execute_async(expression)) == expected
+    assert service.calls == calls
+
+
+def test_execute_async_variable():
+    assert asyncio.run(Executor().execute_async(Variable("x"), {"x": 1})) == 1
+
+
+def test_execute_async_lazy_binary_op_override():
+    executor = Executor(
+        {"boom": _boom},
+        binary_ops={BinaryOpType.ADDITION: lazy(lambda left, right: left())},
+    )
+    expression = BinaryOp(BinaryOpType.ADDITION, Integer(1), Function("boom", []))
+    assert asyncio.run(executor.execute_async(expression)) == 1
+
+
+def test_execute_async_undefined_function():
+    with pytest.raises(ExecutorError, match="Function 'f' is not defined"):
+        asyncio.run(Executor().execute_async(Function("f", [])))
+
+
+def test_execute_async_sync_functions():
+    executor = Executor({"f": lambda x: x * 2})
+    expression = UnaryOp(UnaryOpType.NEGATIVE, Function("f", [Variable("x")]))
+    assert asyncio.run(executor.execute_async(expression, {"x": 3})) == -6
+
+
+@pytest.mark.parametrize("backend", (None,) + BACKENDS)
+def test_pure_function(backend):
+    calls = []
+
+    @pure(max_size=2)
+    def rate(currency):
+        calls.append(currency)
+        return {"AUD": 1, "NZD": 2, "USD": 3}[currency]
+
+    executor = Executor({"rate": rate})
+    expression = Function("rate", [Variable("c")])
+    if backend is None:
+        evaluate = partial(executor.execute, expression)
+    else:
+        evaluate = executor.compile(expression, backend)
+    currencies = ("AUD", "AUD", "NZD", "AUD", "USD", "NZD", "NZD")
+    results = [evaluate({"c": currency}) for currency in currencies]
+    assert results == [1, 1, 2, 1, 3, 2, 2]
+    assert calls == ["AUD", "NZD", "USD", "NZD"]
+    assert executor.cache_info() == {
+        "rate": CacheInfo(hits=3, misses=4, evictions=2, size=2, max_size=2)
+    }
+
+
+def test_pure_function_unhashable_arguments():
+    calls = []
+
+    @pure
+    def length(value):
+        calls.append(value)
+        return len(value)
+
+    assert length([1, 2]) == 2
+    assert length([1, 2]) == 2
+    assert len(calls) == 2
+
+
+def test_pure_async_function_unhashable_arguments():
+    calls = []
+
+    @pure
+    async def length(value):
+        calls.append(value)
+        return len(value)
+
+    for _ in range(2):
+        assert asyncio.run(length([1, 2])) == 2
+    assert len(calls) == 2
+
+
+def test_pure_function_errors_not_cached():
+    calls = []
+
+    @pure
+    def divide(x):
+        calls.append(x)
+        return 1 / x
+
+    for _ in range(2):
+        with pytest.raises(ZeroDivisionError):
+            divide(0)
+    assert calls == [0, 0]
+
+
+def test_pure_async_function():
+    calls = []
+
+    @pure(ttl=60)
+    async def lookup(key):
+        calls.append(key)
+        await asyncio.sleep(0)
+        return key.upper()
+
+    executor = Executor({"lookup": lookup})
+    expression = BinaryOp(
+        BinaryOpType.ADDITION,
+        Function("lookup", [String("a")]),
+        Function("lookup", [String("b")]),
+    )
+    assert asyncio.run(executor.execute_async(expression)) == "AB"
+    assert asyncio.run(executor.execute_async(expression)) == "AB"
+    assert calls == ["a", "b"]
+
+
+def test_pure_function_pickle():
+    function = pure(abs, max_size=4, ttl=1.5)
+    function(-1)
+    copy = pickle.loads(pickle.dumps(function))
+    assert copy(-2) == 2
+    assert (copy.cache.max_size, copy.cache.ttl) == (4, 1.5)
+    assert len(copy.cache) == 1
+
+
+@pytest.mark.parametrize(
+    ("decorator", "name"),
+    (
+        (lazy, "LazyFunction"),
+        (pure, "PureFunction"),
+        (vectorised, "VectorisedFunction"),
+    ),
+)
+def test_function_wrapper_repr(decorator, name):
+    assert repr(decorator(abs)) == f"{name}(<built-in function abs>)"
+
+
+def test_lazy_function_pickle():
+    function = pickle.loads(pickle.dumps(lazy(callable)))
+    assert isinstance(function, LazyFunction)
+    assert function.function is callable
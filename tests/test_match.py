@@ -0,0 +1,148 @@
+import random
+
+import pytest
+
+from ratus import Evaluator
+from ratus.execer import ExecutorError
+from ratus.match import predicates
+from ratus.parse import BinaryOpType
+
+RULES = {
+    "adult_au": "(age >= 18) and (country = 'AU')",
+    "child": "18 > age",
+    "large": "(total > 100) and (total <= 500)",
+    "vip": "(country = 'NZ') or (total > 1000)",
+    "computed": "total * 2 > 300",
+}
+
+
+@pytest.mark.parametrize(
+    "record, expected",
+    [
+        ({"age": 30, "country": "AU", "total": 50}, ["adult_au"]),
+        ({"age": 10, "country": "NZ", "total": 120}, ["child", "large", "vip"]),
+        ({"age": 18, "country": "US", "total": 2000}, ["vip", "computed"]),
+    ],
+)
+def test_match(record, expected):
+    index = Evaluator().index_rules(RULES)
+    assert index.match(record) == expected
+
+
+def test_indexed_rules():
+    index = Evaluator().index_rules(RULES)
+    assert index.indexed == 3
+    assert len(index) == 5
+    # Only the rules whose access predicates hold and the unindexed ones
+    assert index.candidates({"age": 30, "country": "US", "total": 50}) == [3, 4]
+
+
+@pytest.mark.parametrize(
+    "source, expected",
+    [
+        ("x > 1", [("x", BinaryOpType.GREATER, 1)]),
+        ("1 > x", [("x", BinaryOpType.LESS, 1)]),
+        ("x <= -2.5", [("x", BinaryOpType.LESS_EQUAL, -2.5)]),
+        (
+            "(x = 'a') and ((y < 2) and (z != 3))",
+            [("x", BinaryOpType.EQUAL, "a"), ("y", BinaryOpType.LESS, 2)],
+        ),
+        ("(x = 'a') or (y < 2)", []),
+        (
+            "x > 5 and y = 'a'",
+            [("x", BinaryOpType.GREATER, 5), ("y", BinaryOpType.EQUAL, "a")],
+        ),
+        ("(x = 1) and y", [("x", BinaryOpType.EQUAL, 1)]),
+        ("x > y", []),
+        ("x + 1 > 2", []),
+    ],
+)
+def test_predicates(source, expected):
+    evaluator = Evaluator()
+    assert predicates(evaluator.executor, evaluator._parse(source)) == expected
+
+
+def test_unparenthesised_conjuncts_indexed():
+    index = Evaluator().index_rules({"r": "x > 5 and y = 'a'"})
+    assert index.indexed == 1
+    assert index.match({"x": 6, "y": "a"}) == ["r"]
+    assert index.match({"x": 1, "y": "a"}) == []
+    assert index.match({"x": 6, "y": "b"}) == []
+
+
+def test_overridden_comparison_not_indexed():
+    evaluator = Evaluator()
+    evaluator.executor.binary_ops[BinaryOpType.GREATER] = lambda x, y: True
+    assert predicates(evaluator.executor, evaluator._parse("x > 5")) == []
+    assert evaluator.index_rules({"a": "x > 5"}).match({"x": 1}) == ["a"]
+
+
+def test_match_numbers_of_different_types():
+    index = Evaluator().index_rules({"a": "x = 1", "b": "x >= 1", "c": "x < 1.5"})
+    assert index.match({"x": 1.0}) == ["a", "b", "c"]
+    assert index.match({"x": 2}) == ["b"]
+
+
+def test_match_unorderable_value():
+    index = Evaluator().index_rules({"a": "x > 1"})
+    with pytest.raises(TypeError):
+        index.match({"x": "a"})
+
+
+def test_match_mixed_literals():
+    index = Evaluator().index_rules({"a": "x > 1", "b": "x > 'a'"})
+    assert index.candidates({"x": 0}) == [0, 1]
+    with pytest.raises(TypeError):
+        index.match({"x": 2})
+
+
+def test_match_unhashable_value():
+    index = Evaluator().index_rules({"a": "x = 1", "b": "x != 1"})
+    assert index.match({"x": [1]}) == ["b"]
+
+
+def test_match_missing_variable():
+    index = Evaluator().index_rules({"a": "x = 1"})
+    with pytest.raises(ExecutorError, match="Variable 'x' is not defined"):
+        index.match({})
+
+
+def test_match_missing_order_variable():
+    index = Evaluator().index_rules({"a": "x > 1", "b": "1"})
+    with pytest.raises(ExecutorError, match="Variable 'x' is not defined"):
+        index.match({})
+
+
+def test_match_no_record():
+    assert Evaluator().index_rules({"a": "1 > 0", "b": "0"}).match() == ["a"]
+
+
+def test_match_skips_rule_errors():
+    index = Evaluator().index_rules({"a": "c >= 'x' and 0 = b"})
+    with pytest.raises(TypeError):
+        index.match({"b": 0, "c": 1})
+    # Not a candidate, so not evaluated, unlike when executing every rule
+    assert index.match({"b": -1, "c": 1}) == []
+
+
+def test_match_same_as_executing_every_rule():
+    rng = random.Random(0)
+    fields = ["a", "b", "c"]
+    ops = ["=", ">", ">=", "<", "<="]
+    sources = {}
+    for i in range(300):
+        terms = [
+            f"({rng.choice(fields)} {rng.choice(ops)} {rng.randint(0, 9)})"
+            for _ in range(rng.randint(1, 3))
+        ]
+        sources[f"rule{i}"] = " and ".join(terms)
+    evaluator = Evaluator()
+    index = evaluator.index_rules(sources)
+    for _ in range(100):
+        record = {field: rng.randint(0, 9) for field in fields}
+        expected = [
+            name
+            for name, source in sources.items()
+            if evaluator.evaluate(source, record)
+        ]
+        assert index.match(record) == expected
@@ -0,0 +1,118 @@
+import asyncio
+import math
+
+import pytest
+
+from ratus import Evaluator
+from ratus.metrics import Histogram, HistogramSummary, InMemoryMetrics, MetricsCollector
+
+
+class RecordingMetrics(MetricsCollector):
+    def __init__(self):
+        self.observed = []
+        self.incremented = []
+
+    def observe(self, name, value):
+        self.observed.append((name, value))
+
+    def increment(self, name, amount=1):
+        self.incremented.append((name, amount))
+
+
+def test_evaluator_metrics():
+    metrics = RecordingMetrics()
+    evaluator = Evaluator(metrics=metrics)
+    assert evaluator.evaluate("x + 1", {"x": 1}) == 2
+    assert evaluator.evaluate("x + 1", {"x": 2}) == 3
+    assert [name for name, _ in metrics.observed] == [
+        "tokenise.seconds",
+        "parse.seconds",
+        "tokens",
+        "nodes",
+        "execute.seconds",
+        "execute.seconds",
+    ]
+    observed = dict(metrics.observed)
+    assert observed["tokens"] == 3
+    assert observed["nodes"] == 3
+    assert all(value >= 0 for value in observed.values())
+    assert metrics.incremented == [("cache.misses", 1), ("cache.hits", 1)]
+
+
+def test_evaluator_metrics_optimise():
+    metrics = InMemoryMetrics()
+    evaluator = Evaluator(optimise=True, metrics=metrics)
+    evaluator.evaluate("1 + 2")
+    assert "optimise.seconds" in metrics.histograms()
+    # Nodes are counted before optimising
+    assert metrics.histograms()["nodes"].max == 3
+
+
+def test_evaluator_metrics_error():
+    metrics = InMemoryMetrics()
+    evaluator = Evaluator(metrics=metrics)
+    with pytest.raises(ZeroDivisionError):
+        evaluator.evaluate("1 / 0")
+    assert metrics.histograms()["execute.seconds"].n == 1
+
+
+def test_evaluator_metrics_async():
+    metrics = InMemoryMetrics()
+    evaluator = Evaluator(metrics=metrics)
+    assert asyncio.run(evaluator.evaluate_async("x * 2", {"x": 2})) == 4
+    assert metrics.histograms()["execute.seconds"].n == 1
+
+
+def test_evaluator_metrics_with_profiling():
+    metrics = InMemoryMetrics()
+    evaluator = Evaluator(profile=True, metrics=metrics)
+    evaluator.evaluate("x", {"x": 1})
+    assert metrics.histograms()["parse.seconds"].n == 1
+    assert evaluator.profiler.stage_stats()["parse"].calls == 1
+
+
+def test_in_memory_metrics():
+    metrics = InMemoryMetrics(bounds=[1, 2, 4])
+    for value in (1, 1, 3):
+        metrics.observe("size", value)
+    metrics.increment("hits")
+    metrics.increment("hits", 2)
+    assert metrics.histograms() == {"size": HistogramSummary(3, 5, 1, 3, 1, 3, 3)}
+    assert metrics.counters() == {"hits": 3}
+    metrics.reset()
+    assert metrics.histograms() == {}
+    assert metrics.counters() == {}
+
+
+def test_histogram():
+    histogram = Histogram([1, 10, 100])
+    for value in range(1, 101):
+        histogram.observe(value)
+    assert histogram.counts == [1, 9, 90, 0]
+    assert histogram.quantile(0) == 1
+    assert histogram.quantile(0.05) == 10
+    assert histogram.quantile(0.5) == 100
+    assert histogram.quantile(1) == 100
+
+
+def test_histogram_overflow():
+    histogram = Histogram([1])
+    histogram.observe(0.5)
+    histogram.observe(50)
+    assert histogram.counts == [1, 1]
+    assert histogram.quantile(1) == 50
+
+
+def test_histogram_empty():
+    summary = Histogram().summary()
+    assert summary.n == 0
+    assert math.isnan(summary.p50)
+    with pytest.raises(ValueError, match="empty histogram"):
+        Histogram().quantile(0.5)
+
+
+def test_histogram_invalid():
+    with pytest.raises(ValueError, match="ascending order"):
+        Histogram([2, 1])
+    with pytest.raises(ValueError, match="between 0 and 1, got 2"):
+        Histogram().quantile(2)
@@ -0,0 +1,168 @@
+import pytest
+
+from ratus import Evaluator
+from ratus.execer import Executor
+from ratus.optimise import Optimiser, count_nodes
+from ratus.parse import (
+    BinaryOp,
+    BinaryOpType,
+    Float,
+    Function,
+    Integer,
+    String,
+    UnaryOp,
+    UnaryOpType,
+    Variable,
+)
+
+
+@pytest.mark.parametrize(
+    ("expression", "expected", "removed"),
+    (
+        pytest.param(Integer(1), Integer(1), 0, id="literal"),
+        pytest.param(
+            BinaryOp(
+                BinaryOpType.MULTIPLICATION,
+                BinaryOp(
+                    BinaryOpType.MULTIPLICATION,
+                    BinaryOp(BinaryOpType.MULTIPLICATION, Integer(60), Integer(60)),
+                    Integer(24),
+                ),
+                Integer(7),
+            ),
+            Integer(604800),
+            6,
+            id="nested-arithmetic",
+        ),
+        pytest.param(
+            BinaryOp(BinaryOpType.ADDITION, String("a"), String("b")),
+            String("ab"),
+            2,
+            id="string-concatenation",
+        ),
+        pytest.param(
+            BinaryOp(BinaryOpType.DIVISION, Integer(1), Integer(2)),
+            Float(0.5),
+            2,
+            id="division",
+        ),
+        pytest.param(
+            UnaryOp(UnaryOpType.NEGATIVE, Integer(1)), Integer(-1), 1, id="negative"
+        ),
+        pytest.param(
+            Function(
+                "if",
+                [
+                    BinaryOp(BinaryOpType.EQUAL, Integer(1), Integer(1)),
+                    Function("x", []),
+                    Function("y", []),
+                ],
+            ),
+            Function("x", []),
+            5,
+            id="if-constant-condition",
+        ),
+        pytest.param(
+            BinaryOp(BinaryOpType.AND, Integer(0), Function("x", [])),
+            Integer(0),
+            2,
+            id="and-constant-left",
+        ),
+        pytest.param(
+            BinaryOp(BinaryOpType.OR, Integer(0), Function("x", [])),
+            Function("x", []),
+            2,
+            id="or-constant-left",
+        ),
+        pytest.param(
+            BinaryOp(BinaryOpType.MULTIPLICATION, Function("x", []), Integer(1)),
+            Function("x", []),
+            2,
+            id="multiplicative-identity",
+        ),
+        pytest.param(
+            BinaryOp(BinaryOpType.ADDITION, Integer(0), Function("x", [])),
+            Function("x", []),
+            2,
+            id="additive-identity",
+        ),
+        pytest.param(
+            BinaryOp(BinaryOpType.SUBTRACTION, Integer(0), Function("x", [])),
+            BinaryOp(BinaryOpType.SUBTRACTION, Integer(0), Function("x", [])),
+            0,
+            id="subtraction-from-zero",
+        ),
+        pytest.param(
+            BinaryOp(BinaryOpType.MULTIPLICATION, Function("x", []), Float(1.0)),
+            BinaryOp(BinaryOpType.MULTIPLICATION, Function("x", []), Float(1.0)),
+            0,
+            id="float-identity",
+        ),
+        pytest.param(
+            BinaryOp(BinaryOpType.DIVISION, Integer(1), Integer(0)),
+            BinaryOp(BinaryOpType.DIVISION, Integer(1), Integer(0)),
+            0,
+            id="division-by-zero",
+        ),
+        pytest.param(
+            BinaryOp(BinaryOpType.SUBTRACTION, String("a"), Integer(0)),
+            BinaryOp(BinaryOpType.SUBTRACTION, String("a"), Integer(0)),
+            0,
+            id="identity-error",
+        ),
+        pytest.param(
+            Function("x", [BinaryOp(BinaryOpType.ADDITION, Integer(1), Integer(1))]),
+            Function("x", [Integer(2)]),
+            2,
+            id="function-args",
+        ),
+        pytest.param(
+            BinaryOp(
+                BinaryOpType.MULTIPLICATION,
+                Variable("x"),
+                BinaryOp(BinaryOpType.SUBTRACTION, Integer(2), Integer(1)),
+            ),
+            Variable("x"),
+            4,
+            id="variable",
+        ),
+    ),
+)
+def test_optimise(expression, expected, removed):
+    optimiser = Optimiser(Executor())
+    assert optimiser.optimise(expression) == (expected, removed)
+
+
+def test_optimise_respects_overrides():
+    executor = Executor(
+        {"if": lambda c, s, f: s if c else f},
+        binary_ops={BinaryOpType.ADDITION: lambda x, y: x - y},
+        unary_ops={UnaryOpType.NEGATIVE: lambda x: x},
+    )
+    expression = Function(
+        "if",
+        [
+            Integer(1),
+            BinaryOp(BinaryOpType.ADDITION, Integer(1), Integer(1)),
+            UnaryOp(UnaryOpType.NEGATIVE, Integer(1)),
+        ],
+    )
+    optimiser = Optimiser(executor)
+    optimised, removed = optimiser.optimise(expression)
+    assert removed == 0
+    assert optimised == expression
+
+
+def test_optimise_keeps_errors():
+    evaluator = Evaluator(optimise=True)
+    with pytest.raises(TypeError):
+        evaluator.evaluate('"a" - 0')
+    with pytest.raises(TypeError):
+        evaluator.evaluate('1 * "a" + 0')
+
+
+def test_count_nodes():
+    expression = Function(
+        "f", [BinaryOp(BinaryOpType.ADDITION, Integer(1), Integer(2)), Integer(3)]
+    )
+    assert count_nodes(expression) == 5
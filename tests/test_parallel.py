@@ -0,0 +1,109 @@
+import multiprocessing
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import pytest
+
+from ratus import Evaluator, parallel
+from ratus.execer import Executor, ExecutorError, lazy_and, lazy_if, lazy_or
+from ratus.parse import Parser, UnaryOpType
+from ratus.profiling import ProfilingExecutor
+from ratus.token import Tokeniser
+
+RECORDS = [{"x": i, "y": i % 3} for i in range(50)]
+
+
+def parse(source):
+    return Parser().parse(Tokeniser().tokenise(source))
+
+
+@pytest.mark.parametrize("backend", ("closures", "python", "vm"))
+def test_evaluate_many(backend):
+    evaluator = Evaluator({"abs": abs})
+    results = evaluator.evaluate_many(
+        "if(x > 10, abs(y - x), y)", RECORDS, workers=2, chunksize=7, backend=backend
+    )
+    expected = [abs(r["y"] - r["x"]) if r["x"] > 10 else r["y"] for r in RECORDS]
+    assert list(results) == expected
+
+
+def test_evaluate_many_sources():
+    evaluator = Evaluator()
+    results = evaluator.evaluate_many(["x + y", "x > y"], iter(RECORDS), workers=2)
+    assert list(results) == [(r["x"] + r["y"], r["x"] > r["y"]) for r in RECORDS]
+
+
+def test_evaluate_many_no_records():
+    assert list(Evaluator().evaluate_many("x", [], workers=1)) == []
+
+
+def test_evaluate_many_unpicklable_function():
+    evaluator = Evaluator({"f": lambda x: x})
+    with pytest.raises(ExecutorError, match="Cannot send function 'f' to worker"):
+        evaluator.evaluate_many("f(x)", RECORDS)
+
+
+def test_evaluate_many_undefined_function():
+    with pytest.raises(ExecutorError, match="Function 'f' is not defined"):
+        Evaluator().evaluate_many("f(x)", RECORDS)
+
+
+def test_evaluate_many_record_error():
+    results = Evaluator().evaluate_many("x + z", RECORDS, workers=1)
+    with pytest.raises(ExecutorError, match="Variable 'z' is not defined"):
+        list(results)
+
+
+def test_evaluate_many_invalid_chunksize():
+    with pytest.raises(ValueError, match="Chunk size must be positive, got 0"):
+        Evaluator().evaluate_many("x", RECORDS, chunksize=0)
+
+
+def test_evaluate_many_profiling(monkeypatch):
+    # The spawn start method pickles the executor to start the workers
+    context = multiprocessing.get_context("spawn")
+    monkeypatch.setattr(
+        parallel,
+        "ProcessPoolExecutor",
+        partial(ProcessPoolExecutor, mp_context=context),
+    )
+    evaluator = Evaluator(profile=True)
+    results = evaluator.evaluate_many("x * 2", RECORDS, workers=1)
+    assert list(results) == [r["x"] * 2 for r in RECORDS]
+
+
+def test_worker_executor():
+    executor = ProfilingExecutor({"abs": abs}, unary_ops={UnaryOpType.NOT: abs})
+    copy = pickle.loads(pickle.dumps(parallel._worker_executor(executor)))
+    assert type(copy) is Executor
+    assert copy.functions == executor.functions
+    assert copy.unary_ops == executor.unary_ops
+
+
+def test_evaluate_many_single_expression():
+    expressions = [parse("x"), parse("y")]
+    with pytest.raises(ValueError, match="Expected a single expression, got 2"):
+        parallel.evaluate_many(Executor(), expressions, RECORDS)
+
+
+# The worker functions normally only run in worker processes, so they are also
+# called directly here
+
+
+def test_worker_single(monkeypatch):
+    monkeypatch.setattr(parallel, "_evaluate_record", None)
+    parallel._initialise_worker(Executor(), [parse("x * 2")], True, "closures")
+    assert parallel._evaluate_chunk(RECORDS[:3]) == [0, 2, 4]
+
+
+def test_worker_multiple(monkeypatch):
+    monkeypatch.setattr(parallel, "_evaluate_record", None)
+    expressions = [parse("x + y"), parse("x > y")]
+    parallel._initialise_worker(Executor(), expressions, False, "vm")
+    assert parallel._evaluate_chunk(RECORDS[:3]) == [(0, False), (2, False), (4, False)]
+
+
+@pytest.mark.parametrize("function", (lazy_if, lazy_and, lazy_or))
+def test_default_lazy_functions_pickle(function):
+    assert pickle.loads(pickle.dumps(function)) is function
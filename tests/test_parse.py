@@ -1,3 +1,5 @@
+import pickle
+import random
 import re
 
 import pytest
@@ -8,13 +10,15 @@ from ratus.parse import (
     Float,
     Function,
     Integer,
+    Interner,
     Parser,
     ParserError,
     String,
     UnaryOp,
     UnaryOpType,
+    Variable,
 )
-from ratus.token import Token, TokenLiteral, TokenType
+from ratus.token import Token, Tokeniser, TokenLiteral, TokenType
 
 
 @pytest.mark.parametrize(
@@ -150,22 +154,137 @@ from ratus.token import Token, TokenLiteral, TokenType
             Function("f", args=[]),
             id="function-call-no-args",
         ),
+        pytest.param(
+            [
+                TokenLiteral(TokenType.IDENT, "f", "f"),
+                Token(TokenType.LEFT_PAREN, "("),
+                Token(TokenType.RIGHT_PAREN, ")"),
+                Token(TokenType.PLUS, "+"),
+                TokenLiteral(TokenType.INT, "1", 1),
+            ],
+            BinaryOp(BinaryOpType.ADDITION, Function("f", args=[]), Integer(1)),
+            id="function-call-in-binary-op",
+        ),
+        pytest.param(
+            [
+                TokenLiteral(TokenType.INT, "2", 2),
+                Token(TokenType.STAR, "*"),
+                TokenLiteral(TokenType.IDENT, "f", "f"),
+                Token(TokenType.LEFT_PAREN, "("),
+                TokenLiteral(TokenType.STRING, '"a"', "a"),
+                Token(TokenType.COMMA, ","),
+                Token(TokenType.LEFT_PAREN, "("),
+                TokenLiteral(TokenType.INT, "1", 1),
+                Token(TokenType.RIGHT_PAREN, ")"),
+                Token(TokenType.RIGHT_PAREN, ")"),
+            ],
+            BinaryOp(
+                BinaryOpType.MULTIPLICATION,
+                Integer(2),
+                Function("f", args=[String("a"), Integer(1)]),
+            ),
+            id="function-call-in-term",
+        ),
+        pytest.param(
+            [TokenLiteral(TokenType.IDENT, "x", "x")], Variable("x"), id="variable"
+        ),
+        pytest.param(
+            [
+                TokenLiteral(TokenType.IDENT, "f", "f"),
+                Token(TokenType.LEFT_PAREN, "("),
+                TokenLiteral(TokenType.IDENT, "x", "x"),
+                Token(TokenType.COMMA, ","),
+                Token(TokenType.MINUS, "-"),
+                TokenLiteral(TokenType.IDENT, "y", "y"),
+                Token(TokenType.RIGHT_PAREN, ")"),
+                Token(TokenType.STAR, "*"),
+                TokenLiteral(TokenType.IDENT, "x", "x"),
+            ],
+            BinaryOp(
+                BinaryOpType.MULTIPLICATION,
+                Function(
+                    "f",
+                    args=[Variable("x"), UnaryOp(UnaryOpType.NEGATIVE, Variable("y"))],
+                ),
+                Variable("x"),
+            ),
+            id="variables-in-function-call",
+        ),
     ),
 )
-def test_parse(tokens, expected):
-    parser = Parser()
+@pytest.mark.parametrize("engine", ("descent", "iterative", "packrat"))
+def test_parse(tokens, expected, engine):
+    parser = Parser(engine)
     assert parser.parse(tokens) == expected
 
 
+def _comparison(op_type, name, value):
+    return BinaryOp(op_type, Variable(name), Integer(value))
+
+
+@pytest.mark.parametrize(
+    ("source", "expected"),
+    (
+        pytest.param(
+            "x > 1 and y < 3",
+            BinaryOp(
+                BinaryOpType.AND,
+                _comparison(BinaryOpType.GREATER, "x", 1),
+                _comparison(BinaryOpType.LESS, "y", 3),
+            ),
+            id="and",
+        ),
+        pytest.param(
+            "x = 1 or y + 1 = 2",
+            BinaryOp(
+                BinaryOpType.OR,
+                _comparison(BinaryOpType.EQUAL, "x", 1),
+                BinaryOp(
+                    BinaryOpType.EQUAL,
+                    _comparison(BinaryOpType.ADDITION, "y", 1),
+                    Integer(2),
+                ),
+            ),
+            id="or",
+        ),
+        pytest.param(
+            "x or y and z or w",
+            BinaryOp(
+                BinaryOpType.OR,
+                BinaryOp(
+                    BinaryOpType.OR,
+                    Variable("x"),
+                    BinaryOp(BinaryOpType.AND, Variable("y"), Variable("z")),
+                ),
+                Variable("w"),
+            ),
+            id="and-binds-tighter-than-or",
+        ),
+        pytest.param(
+            "(x or y) and -z",
+            BinaryOp(
+                BinaryOpType.AND,
+                BinaryOp(BinaryOpType.OR, Variable("x"), Variable("y")),
+                UnaryOp(UnaryOpType.NEGATIVE, Variable("z")),
+            ),
+            id="grouped",
+        ),
+    ),
+)
+@pytest.mark.parametrize("engine", ("descent", "iterative", "packrat"))
+def test_parse_boolean_precedence(source, expected, engine):
+    assert Parser(engine).parse(Tokeniser().tokenise(source)) == expected
+
+
 @pytest.mark.parametrize(
     ("tokens", "error_msg"),
     (
         pytest.param([], "Expression cannot be empty", id="empty_expression"),
         pytest.param(
-            [TokenLiteral(TokenType.IDENT, "f", "f")],
+            [TokenLiteral(TokenType.IDENT, "f", "f"), Token(TokenType.LEFT_PAREN, "(")],
             re.escape(
-                f"Tokens {[TokenLiteral(TokenType.IDENT, 'f', 'f')]} do not"
-                " form a valid function call"
+                f"Tokens [{TokenLiteral(TokenType.IDENT, 'f', 'f')}, "
+                f"{Token(TokenType.LEFT_PAREN, '(')}] do not form a valid function call"
             ),
             id="invalid_function_call",
         ),
@@ -177,10 +296,9 @@ def test_parse(tokens, expected):
                 Token(TokenType.RIGHT_PAREN, ")"),
             ],
             re.escape(
-                f"Expected left paren ('(') following call to function 'f'. "
-                "Found '1'"
+                f"Unexpected token after term {Variable('f')}. Expected operator"
             ),
-            id="unbalanced_closing_paren",
+            id="variable_followed_by_term",
         ),
         pytest.param(
             [TokenLiteral(TokenType.INT, "1", 1), Token(TokenType.LEFT_PAREN, "("),],
@@ -209,9 +327,201 @@ def test_parse(tokens, expected):
                 " Expected an int or float"
             ),
         ),
+        pytest.param(
+            [Token(TokenType.LEFT_PAREN, "("), TokenLiteral(TokenType.INT, "1", 1)],
+            re.escape("Grouped expression does not have closing paren (')')"),
+            id="unbalanced_opening_paren_in_grouping",
+        ),
+        pytest.param(
+            [TokenLiteral(TokenType.INT, "1", 1), Token(TokenType.RIGHT_PAREN, ")")],
+            re.escape(
+                f"Unexpected token {Token(TokenType.RIGHT_PAREN, ')')} after end "
+                "of expression"
+            ),
+            id="unbalanced_closing_paren_in_grouping",
+        ),
     ),
 )
-def test_parser_error(tokens, error_msg):
-    parser = Parser()
+@pytest.mark.parametrize("engine", ("descent", "iterative"))
+def test_parser_error(tokens, error_msg, engine):
+    parser = Parser(engine)
     with pytest.raises(ParserError, match=error_msg):
         parser.parse(tokens)
+
+
+@pytest.mark.parametrize(
+    ("tokens", "error_msg"),
+    (
+        pytest.param([], "Expression cannot be empty", id="empty_expression"),
+        pytest.param(
+            [TokenLiteral(TokenType.INT, "1", 1), Token(TokenType.PLUS, "+")],
+            re.escape(
+                "Unexpected end of expression. Expected '!', '(', '-', 'float', "
+                "'ident', 'int', 'string'"
+            ),
+            id="missing_right_operand",
+        ),
+        pytest.param(
+            [TokenLiteral(TokenType.INT, "1", 1), TokenLiteral(TokenType.INT, "2", 2)],
+            re.escape(
+                f"Unexpected token {TokenLiteral(TokenType.INT, '2', 2)} at "
+                "position 1. Expected end of expression, operator"
+            ),
+            id="missing_operator",
+        ),
+        pytest.param(
+            [
+                TokenLiteral(TokenType.IDENT, "f", "f"),
+                Token(TokenType.LEFT_PAREN, "("),
+                TokenLiteral(TokenType.INT, "1", 1),
+            ],
+            re.escape("Unexpected end of expression. Expected ')', ','"),
+            id="unbalanced_opening_paren_in_func",
+        ),
+    ),
+)
+def test_packrat_parser_error(tokens, error_msg):
+    parser = Parser("packrat")
+    with pytest.raises(ParserError, match=error_msg):
+        parser.parse(tokens)
+
+
+def test_packrat_nested_function_calls():
+    depth = 50
+    tokens = Tokeniser().tokenise("if(1, " * depth + "0" + ", 1)" * depth)
+    assert Parser("packrat").parse(tokens) == Parser().parse(tokens)
+
+
+def test_packrat_parser_deep_nesting():
+    depth = 5_000
+    tokens = Tokeniser().tokenise_compact("if(1, " * depth + "0" + ", 1)" * depth)
+    expression = Parser("packrat").parse(tokens)
+    for _ in range(depth):
+        assert isinstance(expression, Function)
+        assert expression.args[0] == Integer(1)
+        assert expression.args[2] == Integer(1)
+        expression = expression.args[1]
+    assert expression == Integer(0)
+
+
+def test_unknown_parser_engine():
+    with pytest.raises(ValueError, match="Unknown parser engine 'lalr'"):
+        Parser("lalr")
+
+
+@pytest.mark.parametrize("engine", ("descent", "iterative", "packrat"))
+def test_parse_token_stream(engine):
+    source = "if(f('a', 1.5) >= 2, -1, 2 * (3 + 4))"
+    parser = Parser(engine)
+    tokeniser = Tokeniser()
+    expected = parser.parse(tokeniser.tokenise(source))
+    assert parser.parse(tokeniser.tokenise_compact(source)) == expected
+
+
+def test_expressions_immutable():
+    expression = BinaryOp(BinaryOpType.ADDITION, Integer(1), Integer(2))
+    with pytest.raises(AttributeError):
+        expression.left = Integer(3)
+    assert not hasattr(expression, "__dict__")
+    assert Function("f", [Integer(1)]).args == (Integer(1),)
+
+
+def test_expressions_hashable():
+    first = Function("f", [UnaryOp(UnaryOpType.NEGATIVE, Float(1.0)), String("a")])
+    second = Function("f", (UnaryOp(UnaryOpType.NEGATIVE, Float(1.0)), String("a")))
+    assert first == second
+    assert len({first, second}) == 1
+
+
+def test_expressions_pickle():
+    expression = Function(
+        "f", [BinaryOp(BinaryOpType.ADDITION, Integer(1), Float(2.0)), String("a")]
+    )
+    assert pickle.loads(pickle.dumps(expression)) == expression
+
+
+def test_interner():
+    interner = Interner()
+    tokeniser = Tokeniser()
+    parser = Parser(interner=interner)
+    first = parser.parse(tokeniser.tokenise("f(1 + 2) * 3"))
+    second = parser.parse(tokeniser.tokenise("if(f(1 + 2) > 1, 1, 2.0)"))
+    assert first == Parser().parse(tokeniser.tokenise("f(1 + 2) * 3"))
+    assert first.left is second.args[0].left
+    assert first.left.args[0].left is second.args[1]
+    # Equal literals of different types are kept apart
+    assert second.args[2] == Float(2.0)
+    assert interner.intern(Integer(True)).value is True
+    assert interner.intern(Float(-0.0)).value == -0.0
+    assert interner.intern(Variable("x")) is interner.intern(Variable("x"))
+    assert len(interner) == 12
+    interner.clear()
+    assert len(interner) == 0
+
+
+def test_interner_unary():
+    interner = Interner()
+    tokeniser = Tokeniser()
+    parser = Parser(interner=interner)
+    first = parser.parse(tokeniser.tokenise("-(x + 1)"))
+    second = parser.parse(tokeniser.tokenise("2 * -(x + 1)"))
+    assert second.right is first
+
+
+def test_interner_deep_nesting():
+    depth = 3_000
+    interner = Interner()
+    parser = Parser("iterative", interner=interner)
+    tokens = Tokeniser().tokenise_compact("if(1, " * depth + "0" + ", 2)" * depth)
+    expression = parser.parse(tokens)
+    # A function call per level, sharing the literals 0, 1 and 2
+    assert len(interner) == depth + 3
+    assert interner.intern(expression) is expression
+    for _ in range(depth):
+        assert isinstance(expression, Function)
+        expression = expression.args[1]
+    assert expression == Integer(0)
+
+
+def test_packrat_parser_matches_descent():
+    # The engines report errors differently, but reject the same input
+    rng = random.Random(0)
+    vocabulary = Tokeniser().tokenise("f ( ) , + - * / = > and or ! 1 2.5 'a'")
+    for _ in range(2000):
+        tokens = rng.choices(vocabulary, k=rng.randint(0, 12))
+        results = []
+        for engine in ("descent", "packrat"):
+            try:
+                results.append(Parser(engine).parse(tokens))
+            except ParserError:
+                results.append(ParserError)
+        assert results[0] == results[1], tokens
+
+
+def test_iterative_parser_matches_descent():
+    # Compare the engines on random token sequences, which are mostly invalid
+    rng = random.Random(0)
+    vocabulary = Tokeniser().tokenise("f ( ) , + - * / = > and or ! 1 2.5 'a'")
+    for _ in range(5000):
+        tokens = rng.choices(vocabulary, k=rng.randint(0, 12))
+        results = []
+        for engine in ("descent", "iterative"):
+            try:
+                results.append(Parser(engine).parse(tokens))
+            except ParserError as error:
+                results.append(str(error))
+        assert results[0] == results[1], tokens
+
+
+def test_iterative_parser_deep_nesting():
+    depth = 10_000
+    tokens = Tokeniser().tokenise_compact("f(-(" * depth + "1" + ") * 2)" * depth)
+    expression = Parser("iterative").parse(tokens)
+    for _ in range(depth):
+        assert isinstance(expression, Function)
+        expression = expression.args[0]
+        assert expression.op_type is BinaryOpType.MULTIPLICATION
+        assert expression.right == Integer(2)
+        assert expression.left.op_type is UnaryOpType.NEGATIVE
+        expression = expression.left.operand
+    assert expression == Integer(1)
@@ -0,0 +1,124 @@
+from itertools import count
+
+import pytest
+
+from ratus import Evaluator
+from ratus.execer import Executor
+from ratus.parse import Parser
+from ratus.profiling import Profiler, ProfileStats, ProfilingExecutor, label
+from ratus.token import Tokeniser
+
+
+def ticking_profiler():
+    # Each reading of the clock advances it by a second
+    return Profiler(clock=count().__next__)
+
+
+def parse(source):
+    return Parser().parse(Tokeniser().tokenise(source))
+
+
+@pytest.mark.parametrize("compiled", (False, True))
+def test_profile_nodes(compiled):
+    executor = ProfilingExecutor({"f": abs}, profiler=ticking_profiler())
+    expression = parse("f(x - 3)")
+    if compiled:
+        assert executor.compile(expression)({"x": 1}) == 2
+    else:
+        assert executor.execute(expression, {"x": 1}) == 2
+    profiler = executor.profiler
+    assert profiler.node_stats() == {
+        "f(x - 3)": ProfileStats(1, 3, 2),
+        "x - 3": ProfileStats(1, 1, 1),
+    }
+    assert profiler.function_stats() == {"f": ProfileStats(1, 3, 2)}
+    assert profiler.collapsed_stacks() == "f(x - 3);x - 3 1000000\nf(x - 3) 2000000"
+
+
+def test_profile_aggregates_evaluations():
+    evaluator = Evaluator({"f": abs}, profile=True)
+    for x in range(3):
+        evaluator.evaluate("if(x > 0, f(x), 0)", {"x": x})
+    stats = evaluator.profiler.node_stats()
+    assert stats["if(x > 0, f(x), 0)"].calls == 3
+    assert stats["x > 0"].calls == 3
+    assert stats["f(x)"].calls == 2
+    assert evaluator.profiler.function_stats()["f"].calls == 2
+    # The source is only tokenised and parsed once as it is cached
+    stages = evaluator.profiler.stage_stats()
+    assert stages.keys() == {"tokenise", "parse"}
+    assert stages["parse"].calls == 1
+
+
+def test_profile_optimise_stage():
+    evaluator = Evaluator(optimise=True, profile=True)
+    assert evaluator.evaluate("1 + 2") == 3
+    assert evaluator.profiler.stage_stats().keys() == {"tokenise", "parse", "optimise"}
+
+
+def test_stage():
+    profiler = ticking_profiler()
+    assert profiler.stage("load", max, 1, 2) == 2
+    with pytest.raises(ZeroDivisionError):
+        profiler.stage("load", lambda: 1 / 0)
+    assert profiler.stage_stats() == {"load": ProfileStats(2, 2.0, 2.0)}
+
+
+def test_report():
+    evaluator = Evaluator(profile=True)
+    evaluator.evaluate("(x + 1) * 2", {"x": 1})
+    report = evaluator.profiler.report().splitlines()
+    assert report[0].split() == ["calls", "total", "s", "self", "s", "stage"]
+    assert {line.split("  ")[-1] for line in report[-2:]} == {"(x + 1) * 2", "x + 1"}
+    assert len(evaluator.profiler.report(limit=1).splitlines()) == 5
+
+
+def test_reset():
+    evaluator = Evaluator(profile=True)
+    evaluator.evaluate("x + 1", {"x": 1})
+    evaluator.profiler.reset()
+    assert evaluator.profiler.node_stats() == {}
+    assert evaluator.profiler.report() == ""
+
+
+def test_profile_error():
+    profiler = ticking_profiler()
+    executor = ProfilingExecutor(profiler=profiler)
+    with pytest.raises(ZeroDivisionError):
+        executor.execute(parse("1 / 0"))
+    assert profiler.node_stats() == {"1 / 0": ProfileStats(1, 1, 1)}
+
+
+def test_no_profiling_by_default():
+    evaluator = Evaluator()
+    assert evaluator.profiler is None
+    assert type(evaluator.executor) is Executor
+
+
+@pytest.mark.parametrize("backend", ("python", "vm"))
+def test_other_backends_not_profiled(backend):
+    executor = ProfilingExecutor({"f": abs})
+    compiled = executor.compile(parse("f(x - 3)"), backend)
+    assert type(compiled) is type(Executor({"f": abs}).compile(parse("1"), backend))
+    assert compiled({"x": 1}) == 2
+    assert executor.profiler.node_stats() == {}
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError, match="Unknown compiler backend 'jit'"):
+        ProfilingExecutor().compile(parse("1"), "jit")
+
+
+@pytest.mark.parametrize(
+    "source, expected",
+    [
+        ("(a + b) * -c", "(a + b) * -c"),
+        ("-(a + b)", "-(a + b)"),
+        ("f('x', \"it's\", 1.5)", "f('x', \"it's\", 1.5)"),
+        ("((((a + b) + c) + d) + e)", "(((...) + c) + d) + e"),
+        (" + ".join(["x"] * 30), "(((...) + x) + x) + x"),
+        ("f(" + ", ".join(["arg"] * 20) + ")", "f(" + "arg, " * 11 + "..."),
+    ],
+)
+def test_label(source, expected):
+    assert label(parse(source)) == expected
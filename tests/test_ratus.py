@@ -1,4 +1,10 @@
+import asyncio
+import random
 import re
+import sys
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
 
 import pytest
 
@@ -10,6 +16,7 @@ from ratus.parse import (
     Float,
     Function,
     Integer,
+    Interner,
     Parser,
     ParserError,
     String,
@@ -39,6 +46,8 @@ def test_version():
         pytest.param("1 > 2", False, None, id="greater_than"),
         pytest.param("1 = 1", True, None, id="equals"),
         pytest.param("1 != 2", True, None, id="not_equals"),
+        pytest.param("1 < 2 and 2 < 3", True, None, id="and"),
+        pytest.param("1 > 2 or 2 > 3", False, None, id="or"),
         pytest.param(
             "lookup(12345, 'PG')",
             10,
@@ -57,11 +66,88 @@ def test_version():
             {"add": lambda x, y: x + y},
             id="function_call_in_computation",
         ),
+        pytest.param(
+            "add(1, 2) * 2 + 1",
+            7,
+            {"add": lambda x, y: x + y},
+            id="function_call_not_at_root",
+        ),
     ),
 )
 def test_eval(source, expected, injected_functions):
     evaluator = Evaluator(injected_functions)
     assert evaluator.evaluate(source) == expected
+    for backend in ("closures", "python", "vm"):
+        assert Evaluator(injected_functions).compile(source, backend)() == expected
+
+
+@pytest.mark.parametrize(
+    ("source", "expected", "injected_functions"),
+    (
+        pytest.param("1 + 3 * 2", 7, None, id="precedence"),
+        pytest.param("if(1 > 2, 10, 5)", 5, None, id="false_conditional"),
+        pytest.param(
+            "if(lookup(12345, 'PG') = 10, 5, 4)",
+            5,
+            {"lookup": lambda x, y: 10},
+            id="injected_function_in_conditional",
+        ),
+    ),
+)
+@pytest.mark.parametrize("backend", ("closures", "python", "vm"))
+def test_compile(source, expected, injected_functions, backend):
+    evaluator = Evaluator(injected_functions)
+    compiled = evaluator.compile(source, backend)
+    assert compiled() == expected
+    assert compiled() == expected
+
+
+def test_eval_context():
+    evaluator = Evaluator({"double": lambda x: x * 2})
+    source = "if(age >= 18, double(score), score) + bonus"
+    records = [
+        {"age": 20, "score": 3, "bonus": 1},
+        {"age": 12, "score": 3, "bonus": 0},
+    ]
+    assert [evaluator.evaluate(source, record) for record in records] == [7, 3]
+    for backend in ("closures", "python", "vm"):
+        compiled = evaluator.compile(source, backend)
+        assert [compiled(record) for record in records] == [7, 3]
+
+
+@pytest.mark.parametrize(
+    ("source", "context", "expected"),
+    (
+        # Read as ((x > 1) and y) < 3 these would be True
+        ("x > 1 and y < 3", {"x": 0, "y": 1}, False),
+        # Read as ((x = 1) or y) = 2 and ((((x = 1) or y) = 2) and x) = 3 these
+        # would be False
+        ("x = 1 or y = 2", {"x": 1, "y": 5}, True),
+        ("x = 1 or y = 2 and x = 3", {"x": 1, "y": 2}, True),
+    ),
+)
+def test_eval_boolean_precedence(source, context, expected):
+    evaluator = Evaluator()
+    assert evaluator.evaluate(source, context) == expected
+    for backend in ("closures", "python", "vm"):
+        assert evaluator.compile(source, backend)(context) == expected
+
+
+def test_eval_async():
+    async def double(x):
+        await asyncio.sleep(0)
+        return x * 2
+
+    evaluator = Evaluator({"double": double})
+    source = "if(x > 1, double(x) + double(1), 0)"
+    assert asyncio.run(evaluator.evaluate_async(source, {"x": 2})) == 6
+
+
+def test_eval_columnar():
+    evaluator = Evaluator()
+    columns = {"age": array("q", [20, 12]), "price": array("d", [10.0, 10.0])}
+    source = "if(age >= 18, price, price / 2)"
+    assert evaluator.evaluate_columnar(source, columns) == array("d", [10.0, 5.0])
 
 
 @pytest.mark.parametrize(
@@ -72,3 +158,86 @@ def test_eval_error(source, injected_functions, error_msg):
     evaluator = Evaluator(injected_functions)
     with pytest.raises(ExecutorError, match=error_msg):
         evaluator.evaluate(source)
+    for backend in ("closures", "python", "vm"):
+        with pytest.raises(ExecutorError, match=error_msg):
+            Evaluator(injected_functions).compile(source, backend)
+
+
+@pytest.mark.parametrize(
+    ("source", "expected"),
+    (
+        pytest.param("(60 * 60 * 24) * 7", 604800, id="folded"),
+        pytest.param("if(1 = 1, x(), y())", 1, id="pruned"),
+        pytest.param("x() * 1 + 0", 1, id="simplified"),
+    ),
+)
+def test_eval_optimised(source, expected):
+    evaluator = Evaluator({"x": lambda: 1, "y": lambda: 2}, optimise=True)
+    assert evaluator.evaluate(source) == expected
+
+
+def test_eval_cached():
+    evaluator = Evaluator(cache_size=2)
+    assert evaluator.evaluate("1 + 1") == 2
+    # A cache hit must not need the tokeniser or parser
+    evaluator.tokeniser = None
+    evaluator.parser = None
+    assert evaluator.evaluate("1 + 1") == 2
+    assert evaluator.compile("1 + 1")() == 2
+    assert evaluator.cache.info().hits == 2
+    assert evaluator.cache.info().misses == 1
+
+    evaluator.cache.clear()
+    with pytest.raises(AttributeError):
+        evaluator.evaluate("1 + 1")
+
+
+def test_evaluate_concurrently():
+    sources = [
+        f"if(x > {i % 7}, add(x, {i}) * 2, 'a' + 'b') = {i} or x - {i % 5}"
+        for i in range(32)
+    ]
+    contexts = [{"x": x} for x in range(10)]
+    functions = {"add": lambda x, y: x + y}
+    expected = {
+        (source, context["x"]): Evaluator(functions).evaluate(source, context)
+        for source in sources
+        for context in contexts
+    }
+    # Fewer cache entries than sources so entries are evicted while in use, and
+    # a shared interner so parsing threads add to the same table
+    evaluator = Evaluator(functions, optimise=True, cache_size=8)
+    evaluator.parser = Parser(interner=Interner())
+    n_threads = 16
+    n_evaluations = 300
+    barrier = threading.Barrier(n_threads)
+
+    def evaluate(seed):
+        rng = random.Random(seed)
+        barrier.wait()
+        mismatches = []
+        for _ in range(n_evaluations):
+            source = rng.choice(sources)
+            context = rng.choice(contexts)
+            if rng.random() < 0.2:
+                backend = rng.choice(("closures", "python", "vm"))
+                result = evaluator.compile(source, backend)(context)
+            else:
+                result = evaluator.evaluate(source, context)
+            if result != expected[source, context["x"]]:
+                mismatches.append((source, context, result))
+        return mismatches
+
+    # Switching threads as often as possible makes interleavings which would
+    # corrupt shared state likely to happen
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(n_threads) as pool:
+            results = list(pool.map(evaluate, range(n_threads)))
+    finally:
+        sys.setswitchinterval(switch_interval)
+    assert results == [[]] * n_threads
+    info = evaluator.cache.info()
+    assert info.hits + info.misses == n_threads * n_evaluations
+    assert info.size <= 8
@@ -0,0 +1,195 @@
+import pytest
+
+from ratus import Evaluator
+from ratus.execer import ExecutorError, pure
+from ratus.parse import BinaryOp, BinaryOpType, Integer, Variable
+from ratus.ruleset import RuleSet, children
+
+
+class FakeClock:
+    def __init__(self):
+        self.time = 0
+
+    def __call__(self):
+        return self.time
+
+
+class Counter:
+    def __init__(self, function):
+        self.function = function
+        self.calls = 0
+
+    def __call__(self, *args):
+        self.calls += 1
+        return self.function(*args)
+
+
+def test_compile_rules():
+    rules = Evaluator().compile_rules(
+        {"sum": "x + y", "check": "(x + y > 2) and (y < 3)"}
+    )
+    assert rules.evaluate({"x": 1, "y": 2}) == {"sum": 3, "check": True}
+    assert rules.evaluate({"x": 1, "y": 0}) == {"sum": 1, "check": False}
+
+
+def test_compile_rules_unary_ops():
+    rules = Evaluator().compile_rules({"neg": "-x + 1", "not": "!(x > 1) or -x"})
+    assert rules.evaluate({"x": 2}) == {"neg": -1, "not": -2}
+
+
+def test_shared_pure_function_called_once():
+    score = Counter(lambda x: x * 10)
+    evaluator = Evaluator({"score": pure(score, max_size=0)})
+    rules = evaluator.compile_rules(
+        {
+            "high": "score(x) > 50",
+            "low": "(score(x) <= 50) and (score(x) > 0)",
+            "double": "score(x) * 2",
+        }
+    )
+    assert rules.evaluate({"x": 3}) == {"high": False, "low": True, "double": 60}
+    assert score.calls == 1
+    assert rules.evaluate({"x": 7}) == {"high": True, "low": False, "double": 140}
+    assert score.calls == 2
+
+
+def test_impure_function_not_shared():
+    tick = Counter(lambda: 1)
+    rules = Evaluator({"tick": tick}).compile_rules({"a": "tick()", "b": "tick() + 1"})
+    assert rules.evaluate() == {"a": 1, "b": 2}
+    assert tick.calls == 2
+    assert rules.shared_nodes == 0
+
+
+def test_impure_subexpression_not_shared():
+    tick = Counter(lambda: 1)
+    rules = Evaluator({"tick": tick}).compile_rules(
+        {"a": "(tick() + x) * 2", "b": "(tick() + x) * 3"}
+    )
+    assert rules.evaluate({"x": 1}) == {"a": 4, "b": 6}
+    assert tick.calls == 2
+
+
+def test_shared_nodes_stay_lazy():
+    rules = Evaluator().compile_rules(
+        {"a": "if(x != 0, 10 / x, 0)", "b": "(x != 0) and (10 / x > 1)"}
+    )
+    assert rules.evaluate({"x": 0}) == {"a": 0, "b": False}
+    assert rules.evaluate({"x": 5}) == {"a": 2, "b": True}
+
+
+def test_shared_node_counts():
+    rules = Evaluator().compile_rules({"a": "(x + 1) * (x + 1)", "b": "x + 1"})
+    # x, 1, x + 1 and the product
+    assert rules.distinct_nodes == 4
+    assert rules.shared_nodes == 1
+    assert rules.variables == ("x",)
+
+
+def test_rule_set_of_expressions():
+    rule = BinaryOp(BinaryOpType.ADDITION, Variable("x"), Integer(1))
+    rules = RuleSet(Evaluator().executor, {"a": rule, "b": rule})
+    assert rules.evaluate({"x": 1}) == {"a": 2, "b": 2}
+    assert rules.shared_nodes == 1
+
+
+def test_undefined_variable():
+    rules = Evaluator().compile_rules({"a": "x", "b": "y"})
+    with pytest.raises(ExecutorError, match="Variable 'y' is not defined"):
+        rules.evaluate({"x": 1})
+
+
+def test_undefined_function():
+    with pytest.raises(ExecutorError, match="Function 'f' is not defined"):
+        Evaluator().compile_rules({"a": "f(x)"})
+
+
+def test_children():
+    rule = BinaryOp(BinaryOpType.ADDITION, Variable("x"), Integer(1))
+    assert children(rule) == (Variable("x"), Integer(1))
+    assert children(Variable("x")) == ()
+
+
+def test_reactive_update():
+    rules = Evaluator().compile_reactive_rules(
+        {"total": "price * quantity", "discounted": "price * quantity * (1 - rate)"},
+        {"price": 10, "quantity": 2, "rate": 0.5},
+    )
+    assert rules.results == {"total": 20, "discounted": 10}
+    assert rules.update({"rate": 0.25}) == {"total": 20, "discounted": 15}
+    assert rules.update({"price": 20}) == {"total": 40, "discounted": 30}
+    assert rules.context == {"price": 20, "quantity": 2, "rate": 0.25}
+
+
+def test_reactive_skips_unaffected_nodes():
+    score = Counter(lambda x: x * 10)
+    evaluator = Evaluator({"score": pure(score, max_size=0)})
+    rules = evaluator.compile_reactive_rules(
+        {"high": "score(x) > y", "double": "score(x) * 2"}, {"x": 3, "y": 50}
+    )
+    # score(x), score(x) > y and score(x) * 2
+    assert rules.info() == (0, 3, 0)
+    assert rules.update({"y": 10}) == {"high": True, "double": 60}
+    assert score.calls == 1
+    assert rules.info() == (1, 4, 2)
+    rules.update({"x": 1})
+    assert score.calls == 2
+    assert rules.info() == (2, 7, 2)
+
+
+def test_reactive_impure_function_evaluated_each_update():
+    tick = Counter(lambda: 1)
+    rules = Evaluator({"tick": tick}).compile_reactive_rules(
+        {"a": "tick() + x", "b": "x * 2"}, {"x": 1}
+    )
+    assert rules.update({"y": 3}) == {"a": 2, "b": 2}
+    assert tick.calls == 2
+    assert rules.info().skipped == 1
+
+
+def test_reactive_update_functions():
+    table = {"AU": 0.1}
+    rate = pure(lambda country: table[country])
+    rules = Evaluator({"rate": rate}).compile_reactive_rules(
+        {"tax": "price * rate(country)"}, {"price": 100, "country": "AU"}
+    )
+    assert rules.results == {"tax": 10}
+    table["AU"] = 0.2
+    assert rules.update() == {"tax": 10}
+    assert rules.update(functions=["rate"]) == {"tax": 20}
+
+
+def test_reactive_pure_function_ttl():
+    table = {"AU": 0.1}
+    rate = pure(lambda country: table[country], ttl=60)
+    rate.cache.clock = FakeClock()
+    rules = Evaluator({"rate": rate}).compile_reactive_rules(
+        {"tax": "price * rate(country)", "total": "price * 2"},
+        {"price": 100, "country": "AU"},
+    )
+    table["AU"] = 0.2
+    # Still cached by the function until it expires
+    assert rules.update() == {"tax": 10, "total": 200}
+    rate.cache.clock.time = 60
+    assert rules.update() == {"tax": 20, "total": 200}
+    # Only the nodes calling the function are evaluated again
+    assert rules.info() == (2, 7, 2)
+
+
+def test_reactive_lazy_branches():
+    rules = Evaluator().compile_reactive_rules({"a": "if(x != 0, 10 / x, 0)"}, {"x": 0})
+    assert rules.results == {"a": 0}
+    assert rules.update({"x": 5}) == {"a": 2}
+    assert rules.update({"x": 0}) == {"a": 0}
+
+
+def test_reactive_dependencies():
+    rules = Evaluator({"f": abs}).compile_reactive_rules(
+        {"a": "f(x) + y", "b": "2"}, {"x": 1, "y": 2}
+    )
+    assert rules.dependencies == {"a": {"f", "x", "y"}, "b": set()}
+
+
+def test_reactive_undefined_variable():
+    with pytest.raises(ExecutorError, match="Variable 'y' is not defined"):
+        Evaluator().compile_reactive_rules({"a": "x + y"}, {"x": 1})
@@ -117,11 +117,43 @@ from ratus.token import Token, Tokeniser, TokeniserError, TokenLiteral, TokenTyp
             ],
             id="greater_than_equal_to",
         ),
+        pytest.param(
+            "1 and 2 or 3",
+            [
+                TokenLiteral(TokenType.INT, "1", 1),
+                Token(TokenType.AND, "and"),
+                TokenLiteral(TokenType.INT, "2", 2),
+                Token(TokenType.OR, "or"),
+                TokenLiteral(TokenType.INT, "3", 3),
+            ],
+            id="keywords",
+        ),
+        pytest.param(
+            "android_1",
+            [TokenLiteral(TokenType.IDENT, "android_1", "android_1")],
+            id="identifier_starting_with_keyword",
+        ),
+        pytest.param(
+            "'it\"s'",
+            [TokenLiteral(TokenType.STRING, "'it\"s'", 'it"s')],
+            id="string_containing_other_quote",
+        ),
+        pytest.param(
+            " \t1\n+\r\n2.5 ",
+            [
+                TokenLiteral(TokenType.INT, "1", 1),
+                Token(TokenType.PLUS, "+"),
+                TokenLiteral(TokenType.FLOAT, "2.5", 2.5),
+            ],
+            id="whitespace",
+        ),
+        pytest.param("", [], id="empty"),
     ),
 )
 def test_tokenise(source, expected):
     tokeniser = Tokeniser()
     assert tokeniser.tokenise(source) == expected
+    assert list(tokeniser.tokenise_compact(source)) == expected
 
 
 @pytest.mark.parametrize(
@@ -141,9 +173,47 @@ def test_tokenise(source, expected):
             re.escape("Expected digit after '.', found '+'"),
             id="unfinished_float",
         ),
+        pytest.param(
+            "12.", "Expression cannot finish with '.'", id="terminating_period_long"
+        ),
+        pytest.param(
+            "1 # 1", re.escape("Unexpected character: '#'"), id="unexpected_character"
+        ),
     ),
 )
 def test_tokenise_error(source, error_msg):
     tokeniser = Tokeniser()
     with pytest.raises(TokeniserError, match=error_msg):
         tokeniser.tokenise(source)
+    with pytest.raises(TokeniserError, match=error_msg):
+        tokeniser.tokenise_compact(source)
+
+
+def test_tokenise_fresh_tokens():
+    tokeniser = Tokeniser()
+    first = tokeniser.tokenise("1")
+    assert tokeniser.tokenise("2") == [TokenLiteral(TokenType.INT, "2", 2)]
+    assert first == [TokenLiteral(TokenType.INT, "1", 1)]
+
+
+def test_token_stream():
+    source = "f('abc', 1.5) + 2"
+    stream = Tokeniser().tokenise_compact(source)
+    assert len(stream) == 8
+    assert stream.token_type(0) is TokenType.IDENT
+    assert stream.lexeme(2) == "'abc'"
+    assert stream.literal(2) == "abc"
+    assert stream.literal(4) == 1.5
+    assert stream.literal(7) == 2
+    assert stream[6] == Token(TokenType.PLUS, "+")
+    assert stream[-1] == TokenLiteral(TokenType.INT, "2", 2)
+    assert stream[5:7] == [
+        Token(TokenType.RIGHT_PAREN, ")"),
+        Token(TokenType.PLUS, "+"),
+    ]
+    assert stream.token_types() == [token.token_type for token in stream]
+    assert list(stream.starts) == [0, 1, 2, 7, 9, 12, 14, 16]
+    assert list(stream.ends) == [1, 2, 7, 8, 12, 13, 15, 17]
+    with pytest.raises(TypeError, match="is not a literal"):
+        stream.literal(1)
+    assert repr(stream) == f"TokenStream({list(stream)!r})"
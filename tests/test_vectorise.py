@@ -0,0 +1,137 @@
+import pytest
+
+from ratus import Evaluator
+from ratus.execer import ExecutorError, lazy, vectorised
+from ratus.parse import BinaryOpType
+
+np = pytest.importorskip("numpy")
+
+COLUMNS = {
+    "x": np.array([1, 2, 3, 4]),
+    "y": np.array([0.5, 1.5, 2.5, 3.5]),
+    "name": np.array(["a", "b", "a", "c"]),
+}
+
+
+@pytest.mark.parametrize(
+    "source",
+    (
+        pytest.param("x * 2 + y", id="arithmetic"),
+        pytest.param("x / 2 - -y", id="division"),
+        pytest.param("x >= 2", id="comparison"),
+        pytest.param("x > 1 and y < 3", id="and"),
+        pytest.param("(x > 1) and (y < 3)", id="and-parenthesised"),
+        pytest.param("x < 2 or !(y < 3)", id="or-not"),
+        pytest.param("if(x > 2, x * 10, y)", id="if"),
+        pytest.param("name = 'a'", id="string-comparison"),
+        pytest.param("1 + 2", id="constant"),
+    ),
+)
+def test_evaluate_vectorised(source):
+    evaluator = Evaluator()
+    result = evaluator.evaluate_vectorised(source, COLUMNS)
+    columns = [column.tolist() for column in COLUMNS.values()]
+    rows = [dict(zip(COLUMNS, row)) for row in zip(*columns)]
+    expected = [evaluator.evaluate(source, row) for row in rows]
+    assert result.shape == (4,)
+    assert result.tolist() == expected
+
+
+@pytest.mark.parametrize(
+    ("source", "expected"),
+    (
+        pytest.param("(x - 2) and name", ["a", 0, "a", "c"], id="and"),
+        pytest.param("(x - 2) or name", [-1, "b", 1, 2], id="or"),
+        pytest.param("(x > 1) and (y < 3)", [False, True, True, False], id="bool"),
+        pytest.param("name and x", [1, 2, 3, 4], id="string-condition"),
+        pytest.param("if(x - 2, name, y)", ["a", 1.5, "a", "c"], id="if"),
+    ),
+)
+def test_evaluate_vectorised_operands(source, expected):
+    # Values of different types are selected as they are, not converted to one
+    result = Evaluator().evaluate_vectorised(source, COLUMNS).tolist()
+    assert result == expected
+    assert list(map(type, result)) == list(map(type, expected))
+
+
+def test_vectorised_function():
+    calls = []
+
+    @vectorised
+    def double(values):
+        calls.append(values)
+        return values * 2
+
+    evaluator = Evaluator({"double": double})
+    result = evaluator.evaluate_vectorised("double(x) + 1", COLUMNS)
+    assert result.tolist() == [3, 5, 7, 9]
+    assert len(calls) == 1
+    # Vectorised functions still work outside of vectorised evaluation
+    assert evaluator.evaluate("double(x)", {"x": 2}) == 4
+
+
+def test_per_row_function():
+    calls = []
+
+    def label(value, name):
+        calls.append((value, name))
+        return f"{name}{value}"
+
+    evaluator = Evaluator({"label": label})
+    result = evaluator.evaluate_vectorised("label(x * 2, name)", COLUMNS)
+    assert result.tolist() == ["a2", "b4", "a6", "c8"]
+    assert calls == [(2, "a"), (4, "b"), (6, "a"), (8, "c")]
+
+
+def test_per_row_lazy_function():
+    @lazy
+    def first(*thunks):
+        return thunks[0]()
+
+    evaluator = Evaluator({"first": first, "boom": lambda: 1 / 0})
+    result = evaluator.evaluate_vectorised("first(x + 1, boom()) * 2", COLUMNS)
+    assert result.tolist() == [4, 6, 8, 10]
+
+
+def test_per_row_mixed_types():
+    evaluator = Evaluator({"label": lambda x: "big" if x > 2 else x})
+    result = evaluator.evaluate_vectorised("label(x)", COLUMNS)
+    assert result.dtype == object
+    assert result.tolist() == [1, 2, "big", "big"]
+
+
+def test_per_row_no_arguments():
+    evaluator = Evaluator({"one": lambda: 1})
+    assert evaluator.evaluate_vectorised("one() + x", COLUMNS).tolist() == [2, 3, 4, 5]
+
+
+def test_lazy_binary_op_override():
+    evaluator = Evaluator({"boom": lambda: 1 / 0})
+    evaluator.executor.binary_ops[BinaryOpType.ADDITION] = lazy(
+        lambda left, right: left()
+    )
+    result = evaluator.evaluate_vectorised("x + boom()", COLUMNS)
+    assert result.tolist() == [1, 2, 3, 4]
+
+
+def test_undefined_function():
+    with pytest.raises(ExecutorError, match="Function 'f' is not defined"):
+        Evaluator().evaluate_vectorised("f(x)", COLUMNS)
+
+
+def test_undefined_variable():
+    with pytest.raises(ExecutorError, match="Variable 'z' is not defined"):
+        Evaluator().evaluate_vectorised("x + z", COLUMNS)
+
+
+@pytest.mark.parametrize(
+    "columns",
+    (
+        pytest.param({}, id="no-columns"),
+        pytest.param({"x": [1, 2], "y": [1, 2, 3]}, id="different-lengths"),
+        pytest.param({"x": [[1, 2]], "y": [[1, 2]]}, id="two-dimensional"),
+    ),
+)
+def test_invalid_columns(columns):
+    with pytest.raises(ExecutorError):
+        Evaluator().evaluate_vectorised("1", columns)
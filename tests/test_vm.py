@@ -0,0 +1,116 @@
+import pytest
+
+from ratus.execer import Executor, lazy
+from ratus.parse import (
+    BinaryOp,
+    BinaryOpType,
+    Function,
+    Integer,
+    UnaryOp,
+    UnaryOpType,
+    Variable,
+)
+from ratus.vm import Opcode, compile_program
+
+
+def test_disassemble():
+    executor = Executor({"f": lambda x: x})
+    expression = Function(
+        "if",
+        [
+            BinaryOp(BinaryOpType.AND, Integer(1), Integer(2)),
+            Function("f", [UnaryOp(UnaryOpType.NEGATIVE, Integer(3))]),
+            Integer(4),
+        ],
+    )
+    program = compile_program(executor, expression)
+    assert program.disassemble() == [
+        (Opcode.PUSH_CONST, 1),
+        (Opcode.JUMP_IF_FALSE_OR_POP, 3),
+        (Opcode.PUSH_CONST, 2),
+        (Opcode.JUMP_IF_FALSE, 9),
+        (Opcode.PUSH_CONST, executor.functions["f"]),
+        (Opcode.PUSH_CONST, 3),
+        (Opcode.UNARY_OP, executor.unary_ops[UnaryOpType.NEGATIVE]),
+        (Opcode.CALL, 1),
+        (Opcode.JUMP, 10),
+        (Opcode.PUSH_CONST, 4),
+    ]
+    assert program() == -3
+
+
+def test_deeply_nested_if():
+    depth = 5000
+    expression = Integer(0)
+    for i in range(depth):
+        expression = Function("if", [Integer(i % 2), Integer(i), expression])
+    # Not a multiple of 2, so the innermost taken branch is at depth - 1
+    assert compile_program(Executor(), expression)() == depth - 1
+
+
+def test_deep_addition_chain():
+    depth = 20_000
+    expression = Integer(0)
+    for _ in range(depth):
+        expression = BinaryOp(BinaryOpType.ADDITION, expression, Integer(1))
+    program = compile_program(Executor(), expression)
+    assert len(program) == 2 * depth + 1
+    assert program() == depth
+
+
+def test_lazy_function_thunks():
+    calls = []
+
+    @lazy
+    def first(*thunks):
+        return thunks[0]()
+
+    executor = Executor({"first": first, "f": calls.append})
+    expression = Function(
+        "first", [Integer(1), Function("f", [Integer(2)]), Function("f", [Integer(3)])]
+    )
+    assert compile_program(executor, expression)() == 1
+    assert calls == []
+
+
+def test_variables():
+    @lazy
+    def first(*thunks):
+        return thunks[0]()
+
+    executor = Executor({"first": first})
+    expression = Function(
+        "first",
+        [BinaryOp(BinaryOpType.ADDITION, Variable("y"), Variable("x")), Variable("y")],
+    )
+    program = compile_program(executor, expression)
+    instructions = program.disassemble()
+    assert instructions[0] == (Opcode.PUSH_CONST, first.function)
+    assert [opcode for opcode, _ in instructions] == [
+        Opcode.PUSH_CONST,
+        Opcode.PUSH_THUNK,
+        Opcode.PUSH_THUNK,
+        Opcode.CALL,
+    ]
+    assert instructions[1][1].disassemble() == [
+        (Opcode.LOAD_SLOT, 0),
+        (Opcode.LOAD_SLOT, 1),
+        (Opcode.BINARY_OP, executor.binary_ops[BinaryOpType.ADDITION]),
+    ]
+    assert program.variables == ("y", "x")
+    assert program({"x": 1, "y": 2}) == 3
+    assert program.evaluate_slots([2, 1]) == 3
+
+
+@pytest.mark.parametrize(
+    ("op_type", "left", "right", "expected"),
+    (
+        (BinaryOpType.AND, 0, 2, 0),
+        (BinaryOpType.AND, 1, 2, 2),
+        (BinaryOpType.OR, 0, 2, 2),
+        (BinaryOpType.OR, 1, 2, 1),
+    ),
+)
+def test_short_circuit(op_type, left, right, expected):
+    expression = BinaryOp(op_type, Integer(left), Integer(right))
+    assert compile_program(Executor(), expression)() == expected